@@ -9,7 +9,8 @@ import time
 import json
 import signal
 import logging
-from datetime import datetime
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 
 import psutil
 import requests
@@ -19,6 +20,7 @@ API_URL = os.environ.get("API_URL", "").rstrip("/")
 AGENT_TOKEN = os.environ.get("AGENT_TOKEN", "")
 INTERVAL = int(os.environ.get("INTERVAL", "60"))  # seconds
 LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
+MAX_BACKOFF = 3600  # longest wait (seconds) the API can ask for
 
 # Setup logging
 logging.basicConfig(
@@ -91,8 +93,25 @@ def get_metrics() -> dict:
     }
 
 
-def send_metrics(metrics: dict) -> bool:
-    """Send metrics to API"""
+def parse_retry_after(value: str | None) -> int:
+    """Retry-After header (seconds or HTTP date) -> seconds to wait"""
+    if not value:
+        return INTERVAL
+    try:
+        seconds = int(value)
+    except ValueError:
+        try:
+            seconds = int((parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+        except (TypeError, ValueError):
+            return INTERVAL
+    return min(max(seconds, 1), MAX_BACKOFF)
+
+
+def send_metrics(metrics: dict) -> tuple[bool, int | None]:
+    """
+    Send metrics to API.
+    Returns (success, seconds to wait before the next attempt if the API asked to back off)
+    """
     url = f"{API_URL}/api/metrics/submit"
     headers = {
         "Content-Type": "application/json",
@@ -103,13 +122,17 @@ def send_metrics(metrics: dict) -> bool:
         response = requests.post(url, json=metrics, headers=headers, timeout=10)
         if response.status_code == 201:
             logger.debug(f"Metrics sent successfully: CPU={metrics['cpu_percent']}%, RAM={metrics['memory_percent']}%")
-            return True
+            return True, None
+        elif response.status_code in (429, 503):
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            logger.warning(f"API is overloaded ({response.status_code}), backing off for {retry_after}s")
+            return False, retry_after
         else:
             logger.error(f"Failed to send metrics: {response.status_code} - {response.text}")
-            return False
+            return False, None
     except requests.exceptions.RequestException as e:
         logger.error(f"Failed to connect to API: {e}")
-        return False
+        return False, None
 
 
 def main():
@@ -132,9 +155,12 @@ def main():
     max_failures = 5
 
     while running:
+        wait = INTERVAL
         try:
             metrics = get_metrics()
-            success = send_metrics(metrics)
+            success, retry_after = send_metrics(metrics)
+            if retry_after is not None:
+                wait = max(INTERVAL, retry_after)
 
             if success:
                 consecutive_failures = 0
@@ -147,8 +173,8 @@ def main():
             logger.error(f"Error collecting metrics: {e}")
             consecutive_failures += 1
 
-        # Wait for next interval (check running flag every second)
-        for _ in range(INTERVAL):
+        # Wait for next interval or the requested backoff (check running flag every second)
+        for _ in range(wait):
             if not running:
                 break
             time.sleep(1)
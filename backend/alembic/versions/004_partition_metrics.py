@@ -0,0 +1,121 @@
+"""Partition server_metrics by collected_at
+
+Revision ID: 004
+Revises: 003
+Create Date: 2026-10-17
+
+"""
+from datetime import datetime, timedelta
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.config import settings
+
+
+revision: str = '004'
+down_revision: Union[str, None] = '003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+METRICS_COLUMNS = """
+    server_id integer NOT NULL REFERENCES servers(id) ON DELETE CASCADE,
+    cpu_percent double precision NOT NULL,
+    memory_percent double precision NOT NULL,
+    memory_used_mb integer NOT NULL,
+    memory_total_mb integer NOT NULL,
+    disk_percent double precision NOT NULL,
+    disk_used_gb double precision NOT NULL,
+    disk_total_gb double precision NOT NULL,
+    uptime_seconds integer NOT NULL,
+    load_avg_1 double precision,
+    load_avg_5 double precision,
+    load_avg_15 double precision,
+    collected_at timestamp without time zone NOT NULL DEFAULT now()
+"""
+
+COPY_COLUMNS = (
+    "id, server_id, cpu_percent, memory_percent, memory_used_mb, memory_total_mb, "
+    "disk_percent, disk_used_gb, disk_total_gb, uptime_seconds, "
+    "load_avg_1, load_avg_5, load_avg_15, collected_at"
+)
+
+
+def upgrade() -> None:
+    interval = settings.metrics_partition_interval
+    if interval == "hour":
+        step, fmt = timedelta(hours=1), "%Y%m%d%H"
+    else:
+        step, fmt = timedelta(days=1), "%Y%m%d"
+
+    # Move the plain table out of the way, keeping its id sequence alive
+    op.execute("ALTER TABLE server_metrics RENAME TO server_metrics_legacy")
+    op.execute("ALTER TABLE server_metrics_legacy RENAME CONSTRAINT server_metrics_pkey TO server_metrics_legacy_pkey")
+    op.execute("ALTER TABLE server_metrics_legacy DROP CONSTRAINT server_metrics_server_id_fkey")
+    op.drop_index('ix_server_metrics_server_id', 'server_metrics_legacy')
+    op.drop_index('ix_server_metrics_collected_at', 'server_metrics_legacy')
+    op.execute("ALTER SEQUENCE server_metrics_id_seq OWNED BY NONE")
+
+    # Partitioned table - partition key must be part of the primary key
+    op.execute(f"""
+        CREATE TABLE server_metrics (
+            id integer NOT NULL DEFAULT nextval('server_metrics_id_seq'),
+            {METRICS_COLUMNS},
+            PRIMARY KEY (id, collected_at)
+        ) PARTITION BY RANGE (collected_at)
+    """)
+    op.execute("ALTER SEQUENCE server_metrics_id_seq OWNED BY server_metrics.id")
+    op.create_index('ix_server_metrics_server_id_collected_at', 'server_metrics', ['server_id', 'collected_at'])
+
+    # Safety net for rows outside of pre-created partitions
+    op.execute("CREATE TABLE server_metrics_default PARTITION OF server_metrics DEFAULT")
+
+    # Partitions covering existing data (or the retention window) up to a few intervals ahead
+    now = datetime.utcnow()
+    oldest = op.get_bind().execute(sa.text("SELECT min(collected_at) FROM server_metrics_legacy")).scalar()
+    start = min(oldest or now, now - timedelta(hours=settings.metrics_retention_hours))
+    if interval == "hour":
+        start = start.replace(minute=0, second=0, microsecond=0)
+    else:
+        start = start.replace(hour=0, minute=0, second=0, microsecond=0)
+    end = now + step * settings.metrics_partitions_ahead
+
+    while start <= end:
+        op.execute(
+            f"CREATE TABLE server_metrics_p{start.strftime(fmt)} PARTITION OF server_metrics "
+            f"FOR VALUES FROM ('{start.isoformat(sep=' ')}') TO ('{(start + step).isoformat(sep=' ')}')"
+        )
+        start += step
+
+    op.execute(
+        f"INSERT INTO server_metrics ({COPY_COLUMNS}) "
+        f"SELECT {COPY_COLUMNS} FROM server_metrics_legacy WHERE collected_at IS NOT NULL"
+    )
+    op.drop_table('server_metrics_legacy')
+
+
+def downgrade() -> None:
+    op.execute("ALTER TABLE server_metrics RENAME TO server_metrics_partitioned")
+    op.execute("ALTER TABLE server_metrics_partitioned RENAME CONSTRAINT server_metrics_pkey TO server_metrics_partitioned_pkey")
+    op.execute("ALTER TABLE server_metrics_partitioned DROP CONSTRAINT server_metrics_server_id_fkey")
+    op.drop_index('ix_server_metrics_server_id_collected_at', 'server_metrics_partitioned')
+    op.execute("ALTER SEQUENCE server_metrics_id_seq OWNED BY NONE")
+
+    op.execute(f"""
+        CREATE TABLE server_metrics (
+            id integer PRIMARY KEY DEFAULT nextval('server_metrics_id_seq'),
+            {METRICS_COLUMNS}
+        )
+    """)
+    op.execute("ALTER SEQUENCE server_metrics_id_seq OWNED BY server_metrics.id")
+    op.create_index('ix_server_metrics_server_id', 'server_metrics', ['server_id'])
+    op.create_index('ix_server_metrics_collected_at', 'server_metrics', ['collected_at'])
+
+    op.execute(
+        f"INSERT INTO server_metrics ({COPY_COLUMNS}) "
+        f"SELECT {COPY_COLUMNS} FROM server_metrics_partitioned"
+    )
+    # Dropping the parent drops all partitions
+    op.drop_table('server_metrics_partitioned')
@@ -0,0 +1,63 @@
+"""Add server metrics rollups table
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '005'
+down_revision: Union[str, None] = '004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (field, nullable) of server_metrics, each gets avg/min/max columns
+ROLLUP_FIELDS = [
+    ('cpu_percent', False),
+    ('memory_percent', False),
+    ('memory_used_mb', False),
+    ('memory_total_mb', False),
+    ('disk_percent', False),
+    ('disk_used_gb', False),
+    ('disk_total_gb', False),
+    ('uptime_seconds', False),
+    ('load_avg_1', True),
+    ('load_avg_5', True),
+    ('load_avg_15', True),
+]
+
+
+def upgrade() -> None:
+    aggregate_columns = [
+        sa.Column(f'{field}_{agg}', sa.Float(), nullable=nullable)
+        for field, nullable in ROLLUP_FIELDS
+        for agg in ('avg', 'min', 'max')
+    ]
+
+    op.create_table(
+        'server_metrics_rollups',
+        sa.Column('server_id', sa.Integer(), sa.ForeignKey('servers.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('resolution_seconds', sa.Integer(), nullable=False),
+        sa.Column('bucket_start', sa.DateTime(), nullable=False),
+        sa.Column('sample_count', sa.Integer(), nullable=False),
+        *aggregate_columns,
+        sa.PrimaryKeyConstraint('server_id', 'resolution_seconds', 'bucket_start'),
+    )
+
+    # Tier retention deletes by resolution and age
+    op.create_index(
+        'ix_server_metrics_rollups_resolution_bucket',
+        'server_metrics_rollups',
+        ['resolution_seconds', 'bucket_start'],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_server_metrics_rollups_resolution_bucket', 'server_metrics_rollups')
+    op.drop_table('server_metrics_rollups')
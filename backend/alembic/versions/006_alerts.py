@@ -0,0 +1,61 @@
+"""Add alert rules and alert events tables
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '006'
+down_revision: Union[str, None] = '005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'alert_rules',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('name', sa.String(100), nullable=False),
+        sa.Column('metric', sa.String(32), nullable=False),
+        sa.Column('operator', sa.String(2), nullable=False),
+        sa.Column('threshold', sa.Float(), nullable=False),
+        sa.Column('duration_seconds', sa.Integer(), server_default='0'),
+        sa.Column('server_id', sa.Integer(), sa.ForeignKey('servers.id', ondelete='CASCADE'), nullable=True),
+        sa.Column('folder_id', sa.Integer(), sa.ForeignKey('folders.id', ondelete='CASCADE'), nullable=True),
+        sa.Column('enabled', sa.Boolean(), server_default=sa.true()),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.func.now()),
+    )
+
+    op.create_table(
+        'alert_events',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('rule_id', sa.Integer(), sa.ForeignKey('alert_rules.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('server_id', sa.Integer(), sa.ForeignKey('servers.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('state', sa.String(10), nullable=False),
+        sa.Column('value', sa.Float(), nullable=False),
+        sa.Column('started_at', sa.DateTime(), nullable=False),
+        sa.Column('resolved_at', sa.DateTime(), nullable=True),
+    )
+
+    # At most one open (firing) event per rule and server - deduplicates notifications
+    op.create_index(
+        'ix_alert_events_open',
+        'alert_events',
+        ['rule_id', 'server_id'],
+        unique=True,
+        postgresql_where=sa.text('resolved_at IS NULL'),
+    )
+    op.create_index('ix_alert_events_started_at', 'alert_events', ['started_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_alert_events_started_at', 'alert_events')
+    op.drop_index('ix_alert_events_open', 'alert_events')
+    op.drop_table('alert_events')
+    op.drop_table('alert_rules')
@@ -0,0 +1,37 @@
+"""Add compressed metrics chunks table
+
+Revision ID: 007
+Revises: 006
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '007'
+down_revision: Union[str, None] = '006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'server_metrics_chunks',
+        sa.Column('server_id', sa.Integer(), sa.ForeignKey('servers.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('chunk_start', sa.DateTime(), nullable=False),
+        sa.Column('chunk_end', sa.DateTime(), nullable=False),
+        sa.Column('sample_count', sa.Integer(), nullable=False),
+        sa.Column('data', sa.LargeBinary(), nullable=False),
+        sa.PrimaryKeyConstraint('server_id', 'chunk_start'),
+    )
+
+    # Chunk retention deletes by window end (also used by readers looking for chunks after a time)
+    op.create_index('ix_server_metrics_chunks_chunk_end', 'server_metrics_chunks', ['chunk_end'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_server_metrics_chunks_chunk_end', 'server_metrics_chunks')
+    op.drop_table('server_metrics_chunks')
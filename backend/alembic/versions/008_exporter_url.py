@@ -0,0 +1,25 @@
+"""Add node_exporter URL to servers
+
+Revision ID: 008
+Revises: 007
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '008'
+down_revision: Union[str, None] = '007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('servers', sa.Column('exporter_url', sa.String(255), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('servers', 'exporter_url')
@@ -0,0 +1,52 @@
+"""Add probe results and hourly probe rollups
+
+Revision ID: 009
+Revises: 008
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision: str = '009'
+down_revision: Union[str, None] = '008'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'probe_results',
+        sa.Column('server_id', sa.Integer(), sa.ForeignKey('servers.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('probed_at', sa.DateTime(), nullable=False),
+        sa.Column('online', sa.Boolean(), nullable=False),
+        sa.Column('latency_ms', sa.Integer(), nullable=True),
+        sa.PrimaryKeyConstraint('server_id', 'probed_at'),
+    )
+    # Rollups and retention scan by time
+    op.create_index('ix_probe_results_probed_at', 'probe_results', ['probed_at'])
+
+    op.create_table(
+        'probe_rollups',
+        sa.Column('server_id', sa.Integer(), sa.ForeignKey('servers.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('bucket_start', sa.DateTime(), nullable=False),
+        sa.Column('probes', sa.Integer(), nullable=False),
+        sa.Column('successes', sa.Integer(), nullable=False),
+        sa.Column('latency_sum_ms', sa.Float(), nullable=False),
+        sa.Column('latency_max_ms', sa.Integer(), nullable=True),
+        sa.Column('latency_histogram', postgresql.ARRAY(sa.Integer()), nullable=False),
+        sa.PrimaryKeyConstraint('server_id', 'bucket_start'),
+    )
+    # Fleet-wide window queries
+    op.create_index('ix_probe_rollups_bucket_start', 'probe_rollups', ['bucket_start'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_probe_rollups_bucket_start', 'probe_rollups')
+    op.drop_table('probe_rollups')
+    op.drop_index('ix_probe_results_probed_at', 'probe_results')
+    op.drop_table('probe_results')
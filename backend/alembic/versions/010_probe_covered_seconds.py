@@ -0,0 +1,30 @@
+"""Add time weights to probe results and rollups
+
+Revision ID: 010
+Revises: 009
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '010'
+down_revision: Union[str, None] = '009'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Probes are no longer evenly spaced - uptime is weighted by the time each probe covers
+    op.add_column('probe_results', sa.Column('covered_seconds', sa.Float(), nullable=True))
+    op.add_column('probe_rollups', sa.Column('seconds', sa.Float(), nullable=False, server_default='0'))
+    op.add_column('probe_rollups', sa.Column('seconds_online', sa.Float(), nullable=False, server_default='0'))
+
+
+def downgrade() -> None:
+    op.drop_column('probe_rollups', 'seconds_online')
+    op.drop_column('probe_rollups', 'seconds')
+    op.drop_column('probe_results', 'covered_seconds')
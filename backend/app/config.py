@@ -2,6 +2,8 @@
 Application configuration
 """
 import secrets
+from typing import Literal
+
 from pydantic_settings import BaseSettings
 
 
@@ -17,6 +19,80 @@ class Settings(BaseSettings):
     # Monitoring
     ping_interval_seconds: int = 60  # как часто пинговать серверы
     ping_timeout_seconds: int = 5    # таймаут пинга
+    ping_max_concurrency: int = 100  # servers probed at once
+    ping_max_interval_seconds: int = 300        # probe interval of servers that are stable online
+    ping_stable_after: int = 5                  # straight successes before the interval starts growing
+    ping_confirm_interval_seconds: float = 5.0  # confirmation probes after a status-changing result
+    ping_confirm_failures: int = 3              # straight failures before a server is marked offline
+    ping_confirm_successes: int = 2             # straight successes before it is marked online again
+    ping_flap_window_seconds: int = 3600        # status changes are counted over this window...
+    ping_flap_enter_transitions: int = 4        # ...flapping from this many (confirmations doubled)
+    ping_flap_exit_transitions: int = 2         # ...until it drops to this many
+    ping_last_check_write_seconds: int = 300  # unchanged ping results refresh last_check this often
+    probe_results_retention_hours: int = 48   # raw probe history (source of the hourly rollups)
+    probe_rollups_retention_days: int = 90    # hourly uptime / latency rollups
+    probe_rollup_interval_seconds: int = 60   # how often probe rollups are updated
+
+    # Metrics ingest
+    metrics_batch_max_samples: int = 1000       # max samples per batch submit
+    metrics_max_clock_skew_seconds: int = 300   # how far in the future a sample timestamp may be
+    metrics_queue_max_size: int = 10000         # write-behind queue capacity (rows)
+    metrics_flush_max_rows: int = 500           # flush as soon as this many rows are queued
+    metrics_flush_interval_seconds: float = 2.0 # ...or at least this often
+    agent_token_cache_ttl_seconds: int = 300    # token -> server cache lifetime
+    agent_token_negative_ttl_seconds: int = 60  # how long an unknown token is remembered as invalid
+    agent_rate_limit_per_minute: float = 30.0   # sustained samples per agent token
+    agent_rate_limit_burst: int = 10            # samples an agent token may send back to back
+    ingest_max_inflight: int = 200              # submit requests processed at once (over -> 429)
+    ingest_queue_high_watermark: float = 0.8    # queue fill ratio from which submits get 429
+
+    # Metrics retention
+    metrics_retention_hours: int = 24              # how long to keep raw metrics
+    metrics_retention_interval_seconds: int = 600  # how often the retention job runs
+    metrics_retention_chunk_rows: int = 5000       # rows deleted per transaction
+    metrics_partition_interval: Literal["day", "hour"] = "day"  # server_metrics partition size
+    metrics_partitions_ahead: int = 3              # future partitions kept pre-created
+
+    # Metrics rollups (5 min and 1 hour tiers)
+    metrics_rollup_interval_seconds: int = 60      # how often rollups are updated
+    metrics_rollup_5m_retention_days: int = 7
+    metrics_rollup_1h_retention_days: int = 90
+    metrics_history_target_points: int = 500       # history picks the coarsest tier giving at least this many points
+
+    # Cold storage: closed windows of raw metrics are packed into compressed chunks
+    metrics_compression_enabled: bool = False
+    metrics_compress_after_hours: int = 6          # must be below metrics_retention_hours
+    metrics_chunk_hours: int = 2                   # window packed into one chunk per server
+    metrics_chunk_retention_days: int = 30         # how long compressed raw history is kept
+    metrics_compression_interval_seconds: int = 300
+
+    # Live updates (SSE)
+    events_max_pending: int = 1000         # undelivered events kept per client
+    events_keepalive_seconds: float = 15.0 # keepalive comment interval
+
+    # Alerts
+    alerts_webhook_url: str = ""               # POST alert notifications here (empty = log only)
+    alerts_webhook_timeout_seconds: float = 5.0
+    alerts_queue_max_size: int = 1000          # pending firing/resolved transitions
+
+    # Anomaly detection (EWMA baselines per server and metric)
+    anomaly_ewma_alpha: float = 0.05     # weight of a new sample in mean/variance
+    anomaly_z_threshold: float = 4.0     # deviations (in std) flagged as anomalies
+    anomaly_warmup_samples: int = 30     # samples before a baseline is trusted
+    anomaly_history_size: int = 1000     # recent anomalies kept in memory
+
+    # Disk exhaustion forecast (fitted on 1 hour rollups)
+    disk_forecast_window_hours: int = 7 * 24     # history used for the trend
+    disk_forecast_min_points: int = 12           # hourly points needed for a forecast
+    disk_forecast_interval_seconds: int = 900    # how often forecasts are refreshed
+
+    # Pull-mode collection from node_exporter
+    collector_interval_seconds: float = 30.0     # how often exporter targets are scraped
+    collector_timeout_seconds: float = 10.0      # per-target scrape deadline
+    collector_max_concurrency: int = 20          # targets scraped at once
+
+    # Prometheus exposition
+    prometheus_cache_seconds: float = 5.0        # rendered /metrics text is reused this long
 
     # Exchange rates
     exchange_rate_ttl_seconds: int = 3600  # 1 hour cache
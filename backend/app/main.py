@@ -1,14 +1,26 @@
 """
 VPS Manager - FastAPI Backend
 """
-import asyncio
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from app.routers import auth_router, folders_router, servers_router, backup_router, metrics_router, payments_router, exchange_router
-from app.services import ping_loop
+from app.config import settings
+from app.routers import auth_router, folders_router, servers_router, backup_router, metrics_router, payments_router, exchange_router, events_router, alerts_router, prometheus_router, probes_router
+from app.services import (
+    probe_scheduler,
+    ingest_queue,
+    metrics_retention,
+    metrics_rollups,
+    latest_metrics,
+    event_hub,
+    alert_engine,
+    disk_forecaster,
+    metrics_compressor,
+    node_exporter_collector,
+    probe_rollups,
+)
 
 
 @asynccontextmanager
@@ -17,18 +29,63 @@ async def lifespan(app: FastAPI):
     # Startup
     print("VPS Manager API starting...")
 
-    # Start background ping task
-    ping_task = asyncio.create_task(ping_loop())
+    # Warm latest-sample cache for /metrics/current/all
+    try:
+        loaded = await latest_metrics.warm()
+        print(f"Latest metrics cache warmed: {loaded} servers")
+    except Exception as e:
+        print(f"Latest metrics cache warm-up error: {e}")
+
+    # Partitions for incoming samples must exist before ingest starts
+    try:
+        created = await metrics_retention.ensure_partitions()
+        if created:
+            print(f"Metrics partitions created: {', '.join(created)}")
+    except Exception as e:
+        print(f"Metrics partition creation error: {e}")
+
+    # Load alert rules before samples start arriving
+    try:
+        await alert_engine.reload()
+    except Exception as e:
+        print(f"Alert rules load error: {e}")
+    alert_engine.start()
+
+    # Server -> folder map for folder filters of live event streams
+    try:
+        await event_hub.reload()
+    except Exception as e:
+        print(f"Event stream folders load error: {e}")
+
+    # Start background ping scheduler
+    probe_scheduler.start()
+
+    # Start metrics write-behind flusher, node_exporter collector, retention, rollup and forecast jobs
+    ingest_queue.start()
+    node_exporter_collector.start()
+    metrics_retention.start()
+    metrics_rollups.start()
+    disk_forecaster.start()
+    probe_rollups.start()
+    if settings.metrics_compression_enabled:
+        metrics_compressor.start()
 
     yield
 
     # Shutdown
     print("VPS Manager API shutting down...")
-    ping_task.cancel()
-    try:
-        await ping_task
-    except asyncio.CancelledError:
-        pass
+    event_hub.close()
+    await probe_scheduler.stop()
+    await node_exporter_collector.stop()
+    await metrics_retention.stop()
+    await metrics_rollups.stop()
+    await disk_forecaster.stop()
+    await probe_rollups.stop()
+    await metrics_compressor.stop()
+
+    # Flush queued metrics and pending alert transitions before exit
+    await ingest_queue.stop()
+    await alert_engine.stop()
 
 
 app = FastAPI(
@@ -60,6 +117,10 @@ app.include_router(backup_router, prefix="/api")
 app.include_router(metrics_router, prefix="/api")
 app.include_router(payments_router, prefix="/api")
 app.include_router(exchange_router, prefix="/api")
+app.include_router(events_router, prefix="/api")
+app.include_router(alerts_router, prefix="/api")
+app.include_router(probes_router, prefix="/api")
+app.include_router(prometheus_router)  # /metrics at the root, where Prometheus expects it
 
 
 @app.get("/")
@@ -1,4 +1,17 @@
 # SQLAlchemy models
-from app.models.models import User, Folder, Server, Payment, ExchangeRate, ServerMetrics
+from app.models.models import User, Folder, Server, Payment, ExchangeRate, ServerMetrics, ServerMetricsRollup, ServerMetricsChunk, ProbeResult, ProbeRollup, AlertRule, AlertEvent
 
-__all__ = ["User", "Folder", "Server", "Payment", "ExchangeRate", "ServerMetrics"]
+__all__ = [
+    "User",
+    "Folder",
+    "Server",
+    "Payment",
+    "ExchangeRate",
+    "ServerMetrics",
+    "ServerMetricsRollup",
+    "ServerMetricsChunk",
+    "ProbeResult",
+    "ProbeRollup",
+    "AlertRule",
+    "AlertEvent",
+]
@@ -2,7 +2,8 @@
 SQLAlchemy models for VPS Manager
 """
 from datetime import datetime
-from sqlalchemy import String, Integer, Float, DateTime, ForeignKey
+from sqlalchemy import String, Integer, Float, DateTime, ForeignKey, Boolean, LargeBinary
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.database import Base
@@ -58,6 +59,9 @@ class Server(Base):
     # Agent token for metrics collection
     agent_token: Mapped[str | None] = mapped_column(String(64), nullable=True, unique=True)
 
+    # node_exporter endpoint for pull-mode collection (servers without an agent)
+    exporter_url: Mapped[str | None] = mapped_column(String(255), nullable=True)
+
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
     folder: Mapped["Folder"] = relationship("Folder", back_populates="servers")
@@ -98,10 +102,11 @@ class ExchangeRate(Base):
 
 
 class ServerMetrics(Base):
-    """Server metrics collected by agent"""
+    """Server metrics collected by agent (range-partitioned by collected_at)"""
     __tablename__ = "server_metrics"
 
-    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    # Partition key has to be part of the primary key
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     server_id: Mapped[int] = mapped_column(Integer, ForeignKey("servers.id", ondelete="CASCADE"), nullable=False)
 
     cpu_percent: Mapped[float] = mapped_column(Float, nullable=False)
@@ -118,6 +123,135 @@ class ServerMetrics(Base):
     load_avg_5: Mapped[float] = mapped_column(Float, nullable=True)  # 5 min
     load_avg_15: Mapped[float] = mapped_column(Float, nullable=True)  # 15 min
 
-    collected_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    collected_at: Mapped[datetime] = mapped_column(DateTime, primary_key=True, default=datetime.utcnow)
 
     server: Mapped["Server"] = relationship("Server", back_populates="metrics")
+
+
+class ServerMetricsRollup(Base):
+    """Pre-aggregated metrics for one server and one time bucket (5 min, 1 hour, ...)"""
+    __tablename__ = "server_metrics_rollups"
+
+    server_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("servers.id", ondelete="CASCADE"), primary_key=True
+    )
+    resolution_seconds: Mapped[int] = mapped_column(Integer, primary_key=True)  # bucket size
+    bucket_start: Mapped[datetime] = mapped_column(DateTime, primary_key=True)
+    sample_count: Mapped[int] = mapped_column(Integer, nullable=False)
+
+    # avg/min/max of every ServerMetrics field
+    cpu_percent_avg: Mapped[float] = mapped_column(Float, nullable=False)
+    cpu_percent_min: Mapped[float] = mapped_column(Float, nullable=False)
+    cpu_percent_max: Mapped[float] = mapped_column(Float, nullable=False)
+    memory_percent_avg: Mapped[float] = mapped_column(Float, nullable=False)
+    memory_percent_min: Mapped[float] = mapped_column(Float, nullable=False)
+    memory_percent_max: Mapped[float] = mapped_column(Float, nullable=False)
+    memory_used_mb_avg: Mapped[float] = mapped_column(Float, nullable=False)
+    memory_used_mb_min: Mapped[float] = mapped_column(Float, nullable=False)
+    memory_used_mb_max: Mapped[float] = mapped_column(Float, nullable=False)
+    memory_total_mb_avg: Mapped[float] = mapped_column(Float, nullable=False)
+    memory_total_mb_min: Mapped[float] = mapped_column(Float, nullable=False)
+    memory_total_mb_max: Mapped[float] = mapped_column(Float, nullable=False)
+    disk_percent_avg: Mapped[float] = mapped_column(Float, nullable=False)
+    disk_percent_min: Mapped[float] = mapped_column(Float, nullable=False)
+    disk_percent_max: Mapped[float] = mapped_column(Float, nullable=False)
+    disk_used_gb_avg: Mapped[float] = mapped_column(Float, nullable=False)
+    disk_used_gb_min: Mapped[float] = mapped_column(Float, nullable=False)
+    disk_used_gb_max: Mapped[float] = mapped_column(Float, nullable=False)
+    disk_total_gb_avg: Mapped[float] = mapped_column(Float, nullable=False)
+    disk_total_gb_min: Mapped[float] = mapped_column(Float, nullable=False)
+    disk_total_gb_max: Mapped[float] = mapped_column(Float, nullable=False)
+    uptime_seconds_avg: Mapped[float] = mapped_column(Float, nullable=False)
+    uptime_seconds_min: Mapped[float] = mapped_column(Float, nullable=False)
+    uptime_seconds_max: Mapped[float] = mapped_column(Float, nullable=False)
+    load_avg_1_avg: Mapped[float | None] = mapped_column(Float, nullable=True)
+    load_avg_1_min: Mapped[float | None] = mapped_column(Float, nullable=True)
+    load_avg_1_max: Mapped[float | None] = mapped_column(Float, nullable=True)
+    load_avg_5_avg: Mapped[float | None] = mapped_column(Float, nullable=True)
+    load_avg_5_min: Mapped[float | None] = mapped_column(Float, nullable=True)
+    load_avg_5_max: Mapped[float | None] = mapped_column(Float, nullable=True)
+    load_avg_15_avg: Mapped[float | None] = mapped_column(Float, nullable=True)
+    load_avg_15_min: Mapped[float | None] = mapped_column(Float, nullable=True)
+    load_avg_15_max: Mapped[float | None] = mapped_column(Float, nullable=True)
+
+
+class ServerMetricsChunk(Base):
+    """Raw metrics of one server and one closed time window, Gorilla-compressed (cold storage)"""
+    __tablename__ = "server_metrics_chunks"
+
+    server_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("servers.id", ondelete="CASCADE"), primary_key=True
+    )
+    chunk_start: Mapped[datetime] = mapped_column(DateTime, primary_key=True)
+    chunk_end: Mapped[datetime] = mapped_column(DateTime, nullable=False)  # exclusive
+    sample_count: Mapped[int] = mapped_column(Integer, nullable=False)
+    data: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)  # see services/gorilla.py
+
+
+class ProbeResult(Base):
+    """Single ping probe of a server (short retention, source of probe_rollups)"""
+    __tablename__ = "probe_results"
+
+    server_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("servers.id", ondelete="CASCADE"), primary_key=True
+    )
+    probed_at: Mapped[datetime] = mapped_column(DateTime, primary_key=True)
+    online: Mapped[bool] = mapped_column(Boolean, nullable=False)
+    latency_ms: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    covered_seconds: Mapped[float | None] = mapped_column(Float, nullable=True)  # time since the previous probe
+
+
+class ProbeRollup(Base):
+    """Probe counts and latency histogram of one server and one hour"""
+    __tablename__ = "probe_rollups"
+
+    server_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("servers.id", ondelete="CASCADE"), primary_key=True
+    )
+    bucket_start: Mapped[datetime] = mapped_column(DateTime, primary_key=True)
+    probes: Mapped[int] = mapped_column(Integer, nullable=False)
+    successes: Mapped[int] = mapped_column(Integer, nullable=False)
+    seconds: Mapped[float] = mapped_column(Float, nullable=False, default=0.0)  # time covered by the probes
+    seconds_online: Mapped[float] = mapped_column(Float, nullable=False, default=0.0)
+    latency_sum_ms: Mapped[float] = mapped_column(Float, nullable=False)  # of successful probes
+    latency_max_ms: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    # Successful probes per latency bucket, see LATENCY_HISTOGRAM_BOUNDS_MS in services/uptime.py
+    latency_histogram: Mapped[list[int]] = mapped_column(ARRAY(Integer), nullable=False)
+
+
+class AlertRule(Base):
+    """Threshold alert rule, e.g. cpu_percent > 90 for 300 s (server, folder or all servers)"""
+    __tablename__ = "alert_rules"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    name: Mapped[str] = mapped_column(String(100), nullable=False)
+
+    metric: Mapped[str] = mapped_column(String(32), nullable=False)  # metrics field, "offline" or "last_ping"
+    operator: Mapped[str] = mapped_column(String(2), nullable=False)  # > >= < <=
+    threshold: Mapped[float] = mapped_column(Float, nullable=False)
+    duration_seconds: Mapped[int] = mapped_column(Integer, default=0)  # condition must hold this long
+
+    # Scope: one server, one folder or (both empty) all servers
+    server_id: Mapped[int | None] = mapped_column(
+        Integer, ForeignKey("servers.id", ondelete="CASCADE"), nullable=True
+    )
+    folder_id: Mapped[int | None] = mapped_column(
+        Integer, ForeignKey("folders.id", ondelete="CASCADE"), nullable=True
+    )
+
+    enabled: Mapped[bool] = mapped_column(Boolean, default=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class AlertEvent(Base):
+    """Alert occurrence for one rule and one server (at most one open per pair)"""
+    __tablename__ = "alert_events"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    rule_id: Mapped[int] = mapped_column(Integer, ForeignKey("alert_rules.id", ondelete="CASCADE"), nullable=False)
+    server_id: Mapped[int] = mapped_column(Integer, ForeignKey("servers.id", ondelete="CASCADE"), nullable=False)
+
+    state: Mapped[str] = mapped_column(String(10), nullable=False)  # firing/resolved
+    value: Mapped[float] = mapped_column(Float, nullable=False)  # value that triggered the alert
+    started_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    resolved_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
@@ -6,6 +6,10 @@ from app.routers.backup import router as backup_router
 from app.routers.payments import router as payments_router
 from app.routers.exchange import router as exchange_router
 from app.routers.metrics import router as metrics_router
+from app.routers.events import router as events_router
+from app.routers.alerts import router as alerts_router
+from app.routers.prometheus import router as prometheus_router
+from app.routers.probes import router as probes_router
 
 __all__ = [
     "auth_router",
@@ -15,4 +19,8 @@ __all__ = [
     "payments_router",
     "exchange_router",
     "metrics_router",
+    "events_router",
+    "alerts_router",
+    "prometheus_router",
+    "probes_router",
 ]
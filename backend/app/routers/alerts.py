@@ -0,0 +1,139 @@
+"""
+API routes for alert rules and alert events
+"""
+from datetime import datetime
+from typing import Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import get_db
+from app.models import AlertEvent, AlertRule, Folder, Server
+from app.schemas import AlertRuleCreate, AlertRuleUpdate, AlertRuleResponse, AlertEventResponse
+from app.services.alerts import alert_engine
+
+router = APIRouter(prefix="/alerts", tags=["alerts"])
+
+
+async def check_rule_scope(db: AsyncSession, server_id: int | None, folder_id: int | None) -> None:
+    """A rule targets one server, one folder or all servers"""
+    if server_id is not None and folder_id is not None:
+        raise HTTPException(status_code=400, detail="Set either server_id or folder_id, not both")
+    if server_id is not None:
+        result = await db.execute(select(Server.id).where(Server.id == server_id))
+        if result.scalar_one_or_none() is None:
+            raise HTTPException(status_code=404, detail="Server not found")
+    if folder_id is not None:
+        result = await db.execute(select(Folder.id).where(Folder.id == folder_id))
+        if result.scalar_one_or_none() is None:
+            raise HTTPException(status_code=404, detail="Folder not found")
+
+
+@router.get("/rules", response_model=list[AlertRuleResponse])
+async def get_rules(db: AsyncSession = Depends(get_db)):
+    """Get all alert rules"""
+    result = await db.execute(select(AlertRule).order_by(AlertRule.id))
+    return result.scalars().all()
+
+
+@router.post("/rules", response_model=AlertRuleResponse, status_code=201)
+async def create_rule(rule: AlertRuleCreate, db: AsyncSession = Depends(get_db)):
+    """Create an alert rule"""
+    await check_rule_scope(db, rule.server_id, rule.folder_id)
+
+    db_rule = AlertRule(**rule.model_dump())
+    db.add(db_rule)
+    await db.commit()
+    await db.refresh(db_rule)
+
+    await alert_engine.reload()
+    return db_rule
+
+
+@router.put("/rules/{rule_id}", response_model=AlertRuleResponse)
+async def update_rule(
+    rule_id: int,
+    rule_update: AlertRuleUpdate,
+    db: AsyncSession = Depends(get_db),
+):
+    """Update an alert rule"""
+    result = await db.execute(select(AlertRule).where(AlertRule.id == rule_id))
+    rule = result.scalar_one_or_none()
+    if not rule:
+        raise HTTPException(status_code=404, detail="Alert rule not found")
+
+    update_data = rule_update.model_dump(exclude_unset=True)
+    await check_rule_scope(
+        db,
+        update_data.get("server_id", rule.server_id),
+        update_data.get("folder_id", rule.folder_id),
+    )
+
+    for field, value in update_data.items():
+        setattr(rule, field, value)
+
+    await db.commit()
+    await db.refresh(rule)
+
+    await alert_engine.reload()
+    return rule
+
+
+@router.delete("/rules/{rule_id}", status_code=204)
+async def delete_rule(rule_id: int, db: AsyncSession = Depends(get_db)):
+    """Delete an alert rule and its events"""
+    result = await db.execute(select(AlertRule).where(AlertRule.id == rule_id))
+    rule = result.scalar_one_or_none()
+    if not rule:
+        raise HTTPException(status_code=404, detail="Alert rule not found")
+
+    await db.delete(rule)
+    await db.commit()
+
+    await alert_engine.reload()
+
+
+@router.get("/events", response_model=list[AlertEventResponse])
+async def get_events(
+    state: Literal["firing", "resolved"] | None = None,
+    server_id: int | None = None,
+    rule_id: int | None = None,
+    limit: int = Query(default=100, ge=1, le=1000),
+    db: AsyncSession = Depends(get_db),
+):
+    """Get alert events, newest first"""
+    query = select(AlertEvent)
+    if state is not None:
+        query = query.where(AlertEvent.state == state)
+    if server_id is not None:
+        query = query.where(AlertEvent.server_id == server_id)
+    if rule_id is not None:
+        query = query.where(AlertEvent.rule_id == rule_id)
+    query = query.order_by(AlertEvent.started_at.desc()).limit(limit)
+
+    result = await db.execute(query)
+    return result.scalars().all()
+
+
+@router.post("/test")
+async def test_notifiers():
+    """Send a test notification through all configured notifiers"""
+    errors_before = alert_engine.notify_errors
+    await alert_engine.notify({
+        "state": "test",
+        "rule_id": 0,
+        "rule_name": "Test notification",
+        "server_id": 0,
+        "server_name": "-",
+        "metric": "-",
+        "operator": "-",
+        "threshold": 0,
+        "duration_seconds": 0,
+        "value": 0,
+        "at": datetime.utcnow().isoformat(),
+    })
+    return {
+        "notifiers": [notifier.name for notifier in alert_engine.notifiers],
+        "errors": alert_engine.notify_errors - errors_before,
+    }
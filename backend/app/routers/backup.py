@@ -11,6 +11,11 @@ from sqlalchemy.orm import selectinload
 from app.database import get_db
 from app.models import Folder, Server
 from app.schemas import ExportData, ImportData, FolderExport, ServerExport
+from app.services.alerts import alert_engine
+from app.services.anomaly import anomaly_detector
+from app.services.events import event_hub
+from app.services.latest import latest_metrics
+from app.services.token_cache import agent_token_cache
 
 router = APIRouter(prefix="/backup", tags=["backup"])
 
@@ -35,6 +40,7 @@ async def export_data(db: AsyncSession = Depends(get_db)):
                 price=s.price,
                 currency=s.currency,
                 payment_date=s.payment_date,
+                exporter_url=s.exporter_url,
             )
             for s in folder.servers
         ]
@@ -75,6 +81,9 @@ async def import_data(
         await db.execute(delete(Server))
         await db.execute(delete(Folder))
         await db.commit()
+        agent_token_cache.clear()
+        latest_metrics.clear()
+        anomaly_detector.clear()
 
     # Import folders and servers
     for position, folder_data in enumerate(data.folders):
@@ -95,10 +104,13 @@ async def import_data(
                 price=server_data.price,
                 currency=server_data.currency,
                 payment_date=server_data.payment_date,
+                exporter_url=server_data.exporter_url,
             )
             db.add(db_server)
 
     await db.commit()
+    await alert_engine.reload()
+    await event_hub.reload()
 
     return {
         "status": "ok",
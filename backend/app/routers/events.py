@@ -0,0 +1,28 @@
+"""
+Live updates stream (Server-Sent Events)
+"""
+from fastapi import APIRouter, Query
+from fastapi.responses import StreamingResponse
+
+from app.services.events import event_hub
+
+router = APIRouter(prefix="/events", tags=["events"])
+
+
+@router.get("")
+async def stream_events(
+    server_id: list[int] = Query(default=[], description="Servers to follow"),
+    folder_id: list[int] = Query(default=[], description="Folders to follow (their current servers)"),
+):
+    """
+    Server-Sent Events stream of live updates, all servers if nothing is selected.
+    Events: `metrics` (latest sample, same fields as /metrics/current/all)
+    and `status` (online/offline change from the ping loop).
+    Servers added to or moved into a followed folder are streamed as well.
+    Undelivered events of a slow client are coalesced to the latest per server.
+    """
+    return StreamingResponse(
+        event_hub.stream(set(server_id) or None, set(folder_id) or None),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
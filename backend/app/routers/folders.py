@@ -11,8 +11,12 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
 from app.database import get_db
-from app.models import Folder
+from app.models import Folder, Server
 from app.schemas import FolderCreate, FolderUpdate, FolderResponse
+from app.services.alerts import alert_engine
+from app.services.anomaly import anomaly_detector
+from app.services.latest import latest_metrics
+from app.services.token_cache import agent_token_cache
 
 router = APIRouter(prefix="/folders", tags=["folders"])
 
@@ -180,9 +184,19 @@ async def delete_folder(folder_id: int, db: AsyncSession = Depends(get_db)):
     if not folder:
         raise HTTPException(status_code=404, detail="Folder not found")
 
+    result = await db.execute(select(Server.id).where(Server.folder_id == folder_id))
+    server_ids = result.scalars().all()
+
     await db.delete(folder)
     await db.commit()
 
+    # Servers of the folder are deleted by cascade
+    for server_id in server_ids:
+        agent_token_cache.invalidate_server(server_id)
+        latest_metrics.remove(server_id)
+        anomaly_detector.remove(server_id)
+    await alert_engine.reload()
+
 
 @router.post("/reorder", status_code=200)
 async def reorder_folders(
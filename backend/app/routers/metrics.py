@@ -1,161 +1,505 @@
 """
 API routes for server metrics
 """
+import math
 import secrets
 from datetime import datetime, timedelta
 
-from fastapi import APIRouter, Depends, HTTPException, Header
-from sqlalchemy import select, func, delete
+from typing import Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Header, Query
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy import select, func
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.config import settings
 from app.database import get_db
 from app.models import Server, ServerMetrics
 from app.schemas import (
+    MetricName,
     MetricsSubmit,
+    MetricsBatchSample,
+    MetricsBatchSubmit,
+    MetricsBatchResult,
+    MetricsBatchResponse,
     MetricsResponse,
     MetricsHistoryResponse,
+    MetricsColumnarResponse,
+    MetricStats,
+    MetricStatsBucket,
+    MetricsStatsResponse,
+    MetricAnomalyResponse,
+    MetricsBaselineResponse,
+    DiskForecastResponse,
+    FleetHeatmapFolder,
+    FleetHeatmapResponse,
     AgentTokenResponse,
 )
+from app.services.admission import ingest_limiter
+from app.services.alerts import alert_engine
+from app.services.anomaly import anomaly_detector
+from app.services.events import event_hub
+from app.services.ingest import ingest_queue, publish_ingested
+from app.services.latest import latest_metrics
+from app.services.ping import probe_scheduler
+from app.services.token_cache import agent_token_cache
+from app.services.collector import node_exporter_collector
+from app.services.compression import metrics_compressor
+from app.services.export import stream_metrics
+from app.services.exposition import prometheus_exporter
+from app.services.forecast import disk_forecaster
+from app.services.heatmap import fleet_heatmap
+from app.services.metrics import (
+    METRIC_FIELDS,
+    backfill_mark,
+    build_metrics_row,
+    insert_metrics,
+    mark_servers_online,
+    to_naive_utc,
+)
+from app.services.retention import metrics_retention
+from app.services.history import (
+    downsample_series,
+    fetch_series,
+    pack_series,
+    series_columns,
+    weighted_average,
+)
+from app.services.rollups import RAW_RESOLUTION, metrics_rollups
+from app.services.stats import metric_stats
+from app.services.uptime import probe_rollups
 
 router = APIRouter(prefix="/metrics", tags=["metrics"])
 
-# How long to keep metrics (in hours)
-METRICS_RETENTION_HOURS = 24
 
-
-async def get_server_by_token(
+async def get_server_id_by_token(
     x_agent_token: str = Header(..., alias="X-Agent-Token"),
-    db: AsyncSession = Depends(get_db),
-) -> Server:
-    """Get server by agent token from header"""
-    result = await db.execute(
-        select(Server).where(Server.agent_token == x_agent_token)
+) -> int:
+    """Get server id by agent token from header (served from the token cache)"""
+    server_id = await agent_token_cache.resolve(x_agent_token)
+    if server_id is None:
+        raise HTTPException(status_code=401, detail="Invalid agent token")
+    return server_id
+
+
+def retry_after_header(retry_after: float) -> dict[str, str]:
+    return {"Retry-After": str(max(1, math.ceil(retry_after)))}
+
+
+def rate_limited(retry_after: float) -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail="Too many metrics submissions",
+        headers=retry_after_header(retry_after),
     )
-    server = result.scalar_one_or_none()
-    if not server:
+
+
+async def ingest_admission(
+    x_agent_token: str | None = Header(default=None, alias="X-Agent-Token"),
+):
+    """
+    Admission control for submits: the header token is validated first (401, no
+    limiter state is touched), then 429 with Retry-After when over the global limits.
+    Per-token rate limits are charged by the routes once the sample count is known.
+    """
+    if x_agent_token is not None and await agent_token_cache.resolve(x_agent_token) is None:
         raise HTTPException(status_code=401, detail="Invalid agent token")
-    return server
 
+    retry_after = ingest_limiter.admit(ingest_queue.depth)
+    if retry_after is not None:
+        raise rate_limited(retry_after)
+    try:
+        yield
+    finally:
+        ingest_limiter.release()
 
-@router.post("/submit", status_code=201)
+
+@router.post("/submit", status_code=201, dependencies=[Depends(ingest_admission)])
 async def submit_metrics(
     metrics: MetricsSubmit,
-    server: Server = Depends(get_server_by_token),
-    db: AsyncSession = Depends(get_db),
+    x_agent_token: str = Header(..., alias="X-Agent-Token"),
+    server_id: int = Depends(get_server_id_by_token),
 ):
-    """Submit metrics from agent (called by agent on monitored server)"""
-    # Create metrics record
-    db_metrics = ServerMetrics(
-        server_id=server.id,
-        cpu_percent=metrics.cpu_percent,
-        memory_percent=metrics.memory_percent,
-        memory_used_mb=metrics.memory_used_mb,
-        memory_total_mb=metrics.memory_total_mb,
-        disk_percent=metrics.disk_percent,
-        disk_used_gb=metrics.disk_used_gb,
-        disk_total_gb=metrics.disk_total_gb,
-        uptime_seconds=metrics.uptime_seconds,
-        load_avg_1=metrics.load_avg_1,
-        load_avg_5=metrics.load_avg_5,
-        load_avg_15=metrics.load_avg_15,
-    )
-    db.add(db_metrics)
+    """
+    Submit metrics from agent (called by agent on monitored server).
+    The sample is queued and written in bulk by the background flusher,
+    which also marks the server online.
+    """
+    retry_after = ingest_limiter.take(x_agent_token)
+    if retry_after is not None:
+        raise rate_limited(retry_after)
+
+    row = build_metrics_row(server_id, metrics, datetime.utcnow())
+    if not ingest_queue.enqueue(row):
+        raise HTTPException(
+            status_code=503,
+            detail="Metrics ingest queue is full",
+            headers=retry_after_header(ingest_limiter.queue_retry_after),
+        )
+    publish_ingested([row])
 
-    # Update server status to online (agent is reporting)
-    server.status = "online"
-    server.last_check = datetime.utcnow()
+    return {"status": "ok", "server_id": server_id}
 
-    await db.commit()
 
-    # Cleanup old metrics (older than retention period)
-    cutoff = datetime.utcnow() - timedelta(hours=METRICS_RETENTION_HOURS)
-    await db.execute(
-        delete(ServerMetrics).where(
-            ServerMetrics.server_id == server.id,
-            ServerMetrics.collected_at < cutoff
+@router.post("/submit/batch", response_model=MetricsBatchResponse, dependencies=[Depends(ingest_admission)])
+async def submit_metrics_batch(
+    batch: MetricsBatchSubmit,
+    x_agent_token: str | None = Header(default=None, alias="X-Agent-Token"),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Submit a batch of timestamped samples.
+    Samples without agent_token belong to the server of the X-Agent-Token header,
+    so a relay can forward samples of many servers in one request.
+    Tokens are resolved through the token cache, all accepted samples are
+    written with one multi-row INSERT in one transaction.
+    Rate limits are charged per sample to each sample's own token: the
+    header token's share rejects the whole request with 429, relayed tokens
+    over their limit only get their own samples rejected.
+    """
+    if len(batch.samples) > settings.metrics_batch_max_samples:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Too many samples (max {settings.metrics_batch_max_samples})",
         )
+
+    now = datetime.utcnow()
+    oldest_allowed = now - timedelta(hours=settings.metrics_retention_hours)
+    newest_allowed = now + timedelta(seconds=settings.metrics_max_clock_skew_seconds)
+
+    # Validate every sample on its own
+    results: list[MetricsBatchResult] = []
+    samples: list[tuple[int, str, MetricsBatchSample]] = []
+    for index, raw_sample in enumerate(batch.samples):
+        try:
+            sample = MetricsBatchSample.model_validate(raw_sample)
+        except ValidationError as e:
+            error = "; ".join(
+                f"{'.'.join(str(loc) for loc in err['loc'])}: {err['msg']}" for err in e.errors()
+            )
+            results.append(MetricsBatchResult(index=index, accepted=False, error=error))
+            continue
+
+        token = sample.agent_token or x_agent_token
+        if not token:
+            results.append(MetricsBatchResult(index=index, accepted=False, error="Missing agent token"))
+            continue
+        if sample.collected_at is not None:
+            sample.collected_at = to_naive_utc(sample.collected_at)
+            if not oldest_allowed <= sample.collected_at <= newest_allowed:
+                results.append(MetricsBatchResult(index=index, accepted=False, error="collected_at out of range"))
+                continue
+
+        samples.append((index, token, sample))
+
+    # Resolve every distinct token once through the token cache
+    tokens = {token for _, token, _ in samples}
+    if x_agent_token:
+        tokens.add(x_agent_token)
+    server_ids: dict[str, int | None] = {}
+    for token in tokens:
+        server_ids[token] = await agent_token_cache.resolve(token)
+
+    if x_agent_token and server_ids[x_agent_token] is None:
+        raise HTTPException(status_code=401, detail="Invalid agent token")
+
+    # Charge valid tokens by sample count, the header token first (the request itself costs one)
+    counts: dict[str, int] = {}
+    for _, token, _ in samples:
+        if server_ids[token] is not None:
+            counts[token] = counts.get(token, 0) + 1
+    if x_agent_token:
+        retry_after = ingest_limiter.take(x_agent_token, max(1, counts.pop(x_agent_token, 0)))
+        if retry_after is not None:
+            raise rate_limited(retry_after)
+    rate_limited_tokens = {token for token, count in counts.items() if ingest_limiter.take(token, count) is not None}
+
+    rows = []
+    for index, token, sample in samples:
+        server_id = server_ids.get(token)
+        if server_id is None:
+            results.append(MetricsBatchResult(index=index, accepted=False, error="Invalid agent token"))
+            continue
+        if token in rate_limited_tokens:
+            results.append(MetricsBatchResult(index=index, accepted=False, error="Rate limited"))
+            continue
+
+        rows.append(build_metrics_row(server_id, sample, sample.collected_at or now))
+        results.append(MetricsBatchResult(index=index, accepted=True, server_id=server_id))
+
+    if rows:
+        reporting_ids = {row["server_id"] for row in rows}
+        await insert_metrics(db, rows)
+        await mark_servers_online(db, reporting_ids, now)
+        await db.commit()
+        backfill_mark.note(rows)
+        publish_ingested(rows)
+
+    results.sort(key=lambda r: r.index)
+    return MetricsBatchResponse(
+        accepted=len(rows),
+        rejected=len(results) - len(rows),
+        results=results,
     )
-    await db.commit()
 
-    return {"status": "ok", "server_id": server.id}
+
+@router.get("/internal/stats")
+async def get_internal_stats():
+    """Backend internals: ingest queue, token cache, retention and rollup job counters"""
+    return {
+        "ingest": ingest_queue.stats(),
+        "admission": ingest_limiter.stats(),
+        "agent_tokens": agent_token_cache.stats(),
+        "retention": metrics_retention.stats(),
+        "rollups": metrics_rollups.stats(),
+        "compression": metrics_compressor.stats(),
+        "latest": latest_metrics.stats(),
+        "events": event_hub.stats(),
+        "alerts": alert_engine.stats(),
+        "anomalies": anomaly_detector.stats(),
+        "disk_forecast": disk_forecaster.stats(),
+        "prometheus": prometheus_exporter.stats(),
+        "collector": node_exporter_collector.stats(),
+        "probes": probe_scheduler.stats(),
+        "probe_rollups": probe_rollups.stats(),
+    }
 
 
 @router.get("/current/all")
-async def get_all_current_metrics(
-    db: AsyncSession = Depends(get_db),
+async def get_all_current_metrics():
+    """Get current (latest) metrics for all servers (served from memory)"""
+    return latest_metrics.current_all()
+
+
+@router.get("/anomalies", response_model=list[MetricAnomalyResponse])
+async def get_anomalies(
+    server_id: int | None = None,
+    metric: MetricName | None = None,
+    since: datetime | None = None,
+    limit: int = Query(default=100, ge=1, le=1000),
 ):
-    """Get current (latest) metrics for all servers"""
-    # Subquery to get the latest metric for each server
-    from sqlalchemy import and_
-
-    # Get all servers
-    servers_result = await db.execute(select(Server))
-    servers = servers_result.scalars().all()
-
-    result = {}
-    for server in servers:
-        # Get latest metric for this server
-        metric_result = await db.execute(
-            select(ServerMetrics)
-            .where(ServerMetrics.server_id == server.id)
-            .order_by(ServerMetrics.collected_at.desc())
-            .limit(1)
-        )
-        metric = metric_result.scalar_one_or_none()
+    """Recent anomalies (deviations from a server's own EWMA baseline), newest first"""
+    return anomaly_detector.anomalies(
+        server_id=server_id,
+        metric=metric,
+        since=to_naive_utc(since) if since else None,
+        limit=limit,
+    )
 
-        if metric:
-            result[str(server.id)] = {
-                "cpu_percent": metric.cpu_percent,
-                "memory_percent": metric.memory_percent,
-                "memory_used_mb": metric.memory_used_mb,
-                "memory_total_mb": metric.memory_total_mb,
-                "disk_percent": metric.disk_percent,
-                "collected_at": metric.collected_at.isoformat(),
-            }
 
-    return result
+@router.get("/forecast/disk", response_model=list[DiskForecastResponse])
+async def get_disk_forecast(
+    server_id: int | None = None,
+    max_days: float | None = Query(default=None, ge=0, description="Only servers filling up within this many days"),
+):
+    """Projected disk exhaustion per server, soonest first (refreshed by a background job)"""
+    return disk_forecaster.forecasts(server_id=server_id, max_days=max_days)
+
+
+# Heatmap columns when bucket_seconds is not given, and the upper bound
+HEATMAP_TARGET_BUCKETS = 96
+MAX_HEATMAP_BUCKETS = 1000
 
 
-@router.get("/{server_id}", response_model=MetricsHistoryResponse)
+@router.get("/fleet/heatmap", response_model=FleetHeatmapResponse)
+async def get_fleet_heatmap(
+    metric: MetricName = Query(default="cpu_percent"),
+    aggregate: Literal["avg", "min", "max"] = Query(default="avg"),
+    hours: int = Query(default=24, ge=1),
+    bucket_seconds: int | None = Query(default=None, ge=60),
+    folder_id: int | None = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    One metric of every server (or of one folder) as a servers x time buckets matrix.
+    Computed with a single bucketed query, from rollups whenever a tier fits the
+    bucket size. Rows are ordered by folder; `folders` maps folder blocks to rows.
+    """
+    if bucket_seconds is None:
+        bucket_seconds = max(60, hours * 3600 // HEATMAP_TARGET_BUCKETS)
+    if hours * 3600 / bucket_seconds > MAX_HEATMAP_BUCKETS:
+        raise HTTPException(status_code=400, detail=f"Too many buckets (max {MAX_HEATMAP_BUCKETS})")
+
+    resolution = metrics_rollups.select_resolution(hours, bucket_seconds, read_chunks=False)  # fleet-wide, raw SQL only
+    if resolution != RAW_RESOLUTION:
+        bucket_seconds = -(-bucket_seconds // resolution) * resolution  # whole rollup buckets
+
+    heatmap = await fleet_heatmap(db, metric, aggregate, hours, bucket_seconds, resolution, folder_id)
+    heatmap["folders"] = [FleetHeatmapFolder(**folder) for folder in heatmap["folders"]]
+
+    # Built without validating every cell
+    return JSONResponse(FleetHeatmapResponse.model_construct(**heatmap).model_dump())
+
+
+@router.get("/export")
+async def export_metrics(
+    server_id: int | None = Query(default=None, description="Export one server, all servers if omitted"),
+    start: datetime | None = Query(default=None, description="Inclusive, defaults to retention start"),
+    end: datetime | None = Query(default=None, description="Exclusive, defaults to now"),
+    format: Literal["ndjson", "csv"] = Query(default="ndjson"),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Stream raw metrics for offline analysis.
+    Rows are read through a server-side cursor and written as they arrive,
+    so memory use doesn't depend on the size of the range.
+    """
+    if server_id is not None:
+        result = await db.execute(select(Server.id).where(Server.id == server_id))
+        if result.scalar_one_or_none() is None:
+            raise HTTPException(status_code=404, detail="Server not found")
+
+    now = datetime.utcnow()
+    start = to_naive_utc(start) if start else now - timedelta(hours=settings.metrics_retention_hours)
+    end = to_naive_utc(end) if end else now
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    filename = f"metrics-{server_id if server_id is not None else 'all'}.{format}"
+    return StreamingResponse(
+        stream_metrics(server_id, start, end, format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.get(
+    "/{server_id}",
+    response_model=MetricsHistoryResponse,
+    responses={200: {"content": {"application/octet-stream": {}}}},
+)
 async def get_server_metrics(
     server_id: int,
-    hours: int = 12,
+    hours: int = Query(default=12, ge=1),
+    resolution_seconds: int | None = Query(default=None, ge=0, description="Max spacing between points"),
+    max_points: int | None = Query(default=None, ge=3, description="Downsample history to this many points"),
+    downsample_metric: MetricName = Query(default="cpu_percent", description="Series whose shape LTTB preserves"),
+    format: Literal["objects", "columnar", "binary"] = Query(default="objects"),
     db: AsyncSession = Depends(get_db),
 ):
-    """Get metrics history for a server"""
+    """
+    Get metrics history for a server.
+    Served from the cheapest rollup tier that covers the window with the requested
+    resolution, raw samples are used for short windows.
+    With max_points the series is downsampled with LTTB on downsample_metric.
+    format=columnar returns one timestamp array plus one array per metric,
+    format=binary returns them packed (see pack_series), both oldest first.
+    """
     # Get server
     result = await db.execute(select(Server).where(Server.id == server_id))
     server = result.scalar_one_or_none()
     if not server:
         raise HTTPException(status_code=404, detail="Server not found")
 
-    # Get metrics for last N hours
+    resolution = metrics_rollups.select_resolution(hours, resolution_seconds)
     cutoff = datetime.utcnow() - timedelta(hours=hours)
-    result = await db.execute(
-        select(ServerMetrics)
-        .where(ServerMetrics.server_id == server_id)
-        .where(ServerMetrics.collected_at >= cutoff)
-        .order_by(ServerMetrics.collected_at.desc())
-    )
-    metrics_list = result.scalars().all()
 
-    # Current metrics (most recent)
-    current = metrics_list[0] if metrics_list else None
+    series = await fetch_series(db, server_id, resolution, cutoff)
+
+    # Averages over the whole window, before downsampling
+    avg_cpu_12h = weighted_average(series, "cpu_percent")
+    avg_memory_12h = weighted_average(series, "memory_percent")
 
-    # Calculate averages
-    avg_cpu_12h = None
-    avg_memory_12h = None
-    if metrics_list:
-        avg_cpu_12h = sum(m.cpu_percent for m in metrics_list) / len(metrics_list)
-        avg_memory_12h = sum(m.memory_percent for m in metrics_list) / len(metrics_list)
+    if max_points is not None:
+        series = downsample_series(series, max_points, downsample_metric)
+
+    avg_cpu_12h = round(avg_cpu_12h, 1) if avg_cpu_12h else None
+    avg_memory_12h = round(avg_memory_12h, 1) if avg_memory_12h else None
+
+    if format == "columnar":
+        # Built without per-row models or validation
+        columnar = MetricsColumnarResponse.model_construct(
+            server_id=server.id,
+            server_name=server.name,
+            resolution_seconds=resolution,
+            avg_cpu_12h=avg_cpu_12h,
+            avg_memory_12h=avg_memory_12h,
+            **series_columns(series),
+        )
+        return JSONResponse(columnar.model_dump())
+
+    if format == "binary":
+        return Response(
+            content=pack_series(series),
+            media_type="application/octet-stream",
+            headers={
+                "X-Metrics-Count": str(len(series["collected_at"])),
+                "X-Metrics-Columns": ",".join(METRIC_FIELDS),
+                "X-Metrics-Resolution": str(resolution),
+            },
+        )
+
+    # Newest first
+    fields = ["collected_at", *METRIC_FIELDS]
+    history = [
+        MetricsResponse(**{field: series[field][i] for field in fields})
+        for i in reversed(range(len(series["collected_at"])))
+    ]
+
+    # Current metrics (most recent sample)
+    latest = latest_metrics.get(server_id)
+    current = MetricsResponse(**latest) if latest else None
 
     return MetricsHistoryResponse(
         server_id=server.id,
         server_name=server.name,
-        current=MetricsResponse.model_validate(current) if current else None,
-        history=[MetricsResponse.model_validate(m) for m in metrics_list],
-        avg_cpu_12h=round(avg_cpu_12h, 1) if avg_cpu_12h else None,
-        avg_memory_12h=round(avg_memory_12h, 1) if avg_memory_12h else None,
+        current=current,
+        history=history,
+        avg_cpu_12h=avg_cpu_12h,
+        avg_memory_12h=avg_memory_12h,
+        resolution_seconds=resolution,
+    )
+
+
+@router.get("/{server_id}/baseline", response_model=MetricsBaselineResponse)
+async def get_server_baseline(server_id: int):
+    """Anomaly detector baselines (EWMA mean/std) of a server's metrics"""
+    baseline = anomaly_detector.baseline(server_id)
+    if baseline is None:
+        raise HTTPException(status_code=404, detail="No samples from this server yet")
+    return MetricsBaselineResponse(server_id=server_id, metrics=baseline)
+
+
+# Upper bound of buckets per stats request
+MAX_STATS_BUCKETS = 2000
+
+
+@router.get("/{server_id}/stats", response_model=MetricsStatsResponse)
+async def get_server_metric_stats(
+    server_id: int,
+    metric: MetricName = Query(default="cpu_percent"),
+    start: datetime | None = Query(default=None, description="Inclusive, defaults to 12 hours before end"),
+    end: datetime | None = Query(default=None, description="Exclusive, defaults to now"),
+    bucket_seconds: int | None = Query(default=None, ge=60, description="Also return stats per time bucket"),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    avg/min/max/p50/p95/p99 of a metric over a window of raw samples,
+    optionally split into time buckets. Aggregated by Postgres.
+    """
+    result = await db.execute(select(Server.id).where(Server.id == server_id))
+    if result.scalar_one_or_none() is None:
+        raise HTTPException(status_code=404, detail="Server not found")
+
+    end = to_naive_utc(end) if end else datetime.utcnow()
+    start = to_naive_utc(start) if start else end - timedelta(hours=12)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    if bucket_seconds is not None and (end - start).total_seconds() / bucket_seconds > MAX_STATS_BUCKETS:
+        raise HTTPException(status_code=400, detail=f"Too many buckets (max {MAX_STATS_BUCKETS})")
+
+    overall, buckets = await metric_stats(db, server_id, metric, start, end, bucket_seconds)
+
+    return MetricsStatsResponse(
+        server_id=server_id,
+        metric=metric,
+        start=start,
+        end=end,
+        bucket_seconds=bucket_seconds,
+        overall=MetricStats(**overall),
+        buckets=[MetricStatsBucket(**bucket) for bucket in buckets],
     )
 
 
@@ -175,6 +519,10 @@ async def generate_agent_token(
     await db.commit()
     await db.refresh(server)
 
+    # Old token must stop working right away
+    agent_token_cache.invalidate_server(server.id)
+    agent_token_cache.invalidate_token(server.agent_token)
+
     return AgentTokenResponse(
         agent_token=server.agent_token,
         server_id=server.id,
@@ -216,3 +564,5 @@ async def revoke_agent_token(
 
     server.agent_token = None
     await db.commit()
+
+    agent_token_cache.invalidate_server(server.id)
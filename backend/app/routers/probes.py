@@ -0,0 +1,42 @@
+"""
+API routes for ping probe history: uptime and latency percentiles
+"""
+from typing import Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import get_db
+from app.models import Server
+from app.schemas import ProbeStatsResponse
+from app.services.uptime import UPTIME_WINDOWS, probe_stats
+
+router = APIRouter(prefix="/probes", tags=["probes"])
+
+UptimeWindow = Literal["24h", "7d", "30d"]
+
+
+@router.get("/uptime", response_model=list[ProbeStatsResponse])
+async def get_fleet_uptime(
+    window: UptimeWindow = Query(default="24h"),
+    folder_id: int | None = Query(default=None),
+    db: AsyncSession = Depends(get_db),
+):
+    """Uptime % and ping latency of every server (servers without probes in the window are omitted)"""
+    stats = await probe_stats(db, UPTIME_WINDOWS[window], folder_id=folder_id)
+    return [ProbeStatsResponse(window=window, **item) for item in stats]
+
+
+@router.get("/{server_id}/uptime", response_model=list[ProbeStatsResponse])
+async def get_server_uptime(server_id: int, db: AsyncSession = Depends(get_db)):
+    """Uptime % and ping latency of one server over 24h, 7d and 30d"""
+    result = await db.execute(select(Server.id).where(Server.id == server_id))
+    if result.scalar_one_or_none() is None:
+        raise HTTPException(status_code=404, detail="Server not found")
+
+    response = []
+    for window, hours in UPTIME_WINDOWS.items():
+        for item in await probe_stats(db, hours, server_id=server_id):
+            response.append(ProbeStatsResponse(window=window, **item))
+    return response
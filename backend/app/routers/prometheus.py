@@ -0,0 +1,22 @@
+"""
+Prometheus scrape endpoint
+"""
+from fastapi import APIRouter, Request
+from fastapi.responses import Response
+
+from app.services.exposition import OPENMETRICS_CONTENT_TYPE, PROMETHEUS_CONTENT_TYPE, prometheus_exporter
+
+router = APIRouter(tags=["prometheus"])
+
+
+@router.get("/metrics")
+async def prometheus_metrics(request: Request):
+    """
+    Fleet state in Prometheus text format (OpenMetrics if the scraper asks for it).
+    Rendered from in-memory state only, no database queries.
+    """
+    openmetrics = "application/openmetrics-text" in request.headers.get("accept", "")
+    return Response(
+        content=prometheus_exporter.render(openmetrics),
+        media_type=OPENMETRICS_CONTENT_TYPE if openmetrics else PROMETHEUS_CONTENT_TYPE,
+    )
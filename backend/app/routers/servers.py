@@ -8,6 +8,11 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import get_db
 from app.models import Server, Folder
 from app.schemas import ServerCreate, ServerUpdate, ServerResponse
+from app.services.alerts import alert_engine
+from app.services.anomaly import anomaly_detector
+from app.services.events import event_hub
+from app.services.latest import latest_metrics
+from app.services.token_cache import agent_token_cache
 
 router = APIRouter(prefix="/servers", tags=["servers"])
 
@@ -44,10 +49,14 @@ async def create_server(server: ServerCreate, db: AsyncSession = Depends(get_db)
         price=server.price,
         currency=server.currency,
         payment_date=server.payment_date,
+        exporter_url=server.exporter_url,
     )
     db.add(db_server)
     await db.commit()
     await db.refresh(db_server)
+
+    await alert_engine.reload()  # folder and global rules apply to the new server
+    await event_hub.reload()
     return db_server
 
 
@@ -88,6 +97,11 @@ async def update_server(
 
     await db.commit()
     await db.refresh(server)
+
+    if "folder_id" in update_data or "name" in update_data:
+        await alert_engine.reload()
+    if "folder_id" in update_data:
+        await event_hub.reload()
     return server
 
 
@@ -101,3 +115,8 @@ async def delete_server(server_id: int, db: AsyncSession = Depends(get_db)):
 
     await db.delete(server)
     await db.commit()
+
+    agent_token_cache.invalidate_server(server_id)
+    latest_metrics.remove(server_id)
+    anomaly_detector.remove(server_id)
+    await alert_engine.reload()
@@ -16,10 +16,30 @@ from app.schemas.schemas import (
     PaymentResponse,
     PaymentSummary,
     ExchangeRatesResponse,
+    MetricName,
     MetricsSubmit,
+    MetricsBatchSample,
+    MetricsBatchSubmit,
+    MetricsBatchResult,
+    MetricsBatchResponse,
     MetricsResponse,
     MetricsHistoryResponse,
+    MetricsColumnarResponse,
+    MetricStats,
+    MetricStatsBucket,
+    MetricsStatsResponse,
+    MetricAnomalyResponse,
+    MetricsBaselineResponse,
+    DiskForecastResponse,
+    ProbeStatsResponse,
+    FleetHeatmapFolder,
+    FleetHeatmapResponse,
     AgentTokenResponse,
+    AlertMetric,
+    AlertRuleCreate,
+    AlertRuleUpdate,
+    AlertRuleResponse,
+    AlertEventResponse,
 )
 
 __all__ = [
@@ -39,8 +59,28 @@ __all__ = [
     "PaymentResponse",
     "PaymentSummary",
     "ExchangeRatesResponse",
+    "MetricName",
     "MetricsSubmit",
+    "MetricsBatchSample",
+    "MetricsBatchSubmit",
+    "MetricsBatchResult",
+    "MetricsBatchResponse",
     "MetricsResponse",
     "MetricsHistoryResponse",
+    "MetricsColumnarResponse",
+    "MetricStats",
+    "MetricStatsBucket",
+    "MetricsStatsResponse",
+    "MetricAnomalyResponse",
+    "MetricsBaselineResponse",
+    "DiskForecastResponse",
+    "ProbeStatsResponse",
+    "FleetHeatmapFolder",
+    "FleetHeatmapResponse",
     "AgentTokenResponse",
+    "AlertMetric",
+    "AlertRuleCreate",
+    "AlertRuleUpdate",
+    "AlertRuleResponse",
+    "AlertEventResponse",
 ]
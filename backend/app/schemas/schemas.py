@@ -2,8 +2,9 @@
 Pydantic schemas for API validation
 """
 from datetime import datetime
-from typing import Literal
-from pydantic import BaseModel, Field
+from typing import Annotated, Literal
+from urllib.parse import urlsplit
+from pydantic import AfterValidator, BaseModel, Field
 
 
 # ============ Auth ============
@@ -22,6 +23,21 @@ class TokenResponse(BaseModel):
 ServerStatus = Literal["online", "offline", "unknown"]
 
 
+def _check_exporter_url(url: str) -> str:
+    """Parse the URL for real, a prefix check lets through URLs the HTTP client rejects"""
+    try:
+        parts = urlsplit(url)
+        parts.port  # raises on an invalid port
+    except ValueError as e:
+        raise ValueError(f"Invalid URL: {e}")
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise ValueError("URL must be http(s)://host[:port]/path")
+    return url
+
+
+ExporterUrl = Annotated[str, Field(max_length=255), AfterValidator(_check_exporter_url)]  # node_exporter /metrics
+
+
 class ServerBase(BaseModel):
     name: str = Field(..., min_length=1, max_length=100)
     ip: str = Field(..., min_length=1, max_length=45)
@@ -29,6 +45,7 @@ class ServerBase(BaseModel):
     price: float = Field(default=0.0, ge=0)
     currency: str = Field(default="USD", max_length=3)
     payment_date: str = Field(default="-", max_length=10)
+    exporter_url: ExporterUrl | None = None
 
 
 class ServerCreate(ServerBase):
@@ -42,12 +59,14 @@ class ServerUpdate(BaseModel):
     price: float | None = Field(default=None, ge=0)
     currency: str | None = Field(default=None, max_length=3)
     payment_date: str | None = Field(default=None, max_length=10)
+    exporter_url: ExporterUrl | None = None
     folder_id: int | None = None
 
 
 class ServerResponse(ServerBase):
     id: int
     folder_id: int
+    exporter_url: str | None = None  # stored value, not re-validated
     status: ServerStatus = "unknown"
     last_ping: int | None = None
     last_check: datetime | None = None
@@ -102,6 +121,7 @@ class ServerExport(BaseModel):
     price: float
     currency: str
     payment_date: str
+    exporter_url: ExporterUrl | None = None
 
 
 class FolderExport(BaseModel):
@@ -164,6 +184,21 @@ class ExchangeRatesResponse(BaseModel):
 
 # ============ Server Metrics ============
 
+MetricName = Literal[
+    "cpu_percent",
+    "memory_percent",
+    "memory_used_mb",
+    "memory_total_mb",
+    "disk_percent",
+    "disk_used_gb",
+    "disk_total_gb",
+    "uptime_seconds",
+    "load_avg_1",
+    "load_avg_5",
+    "load_avg_15",
+]
+
+
 class MetricsSubmit(BaseModel):
     """Metrics submitted by agent"""
     cpu_percent: float = Field(..., ge=0, le=100)
@@ -179,6 +214,32 @@ class MetricsSubmit(BaseModel):
     load_avg_15: float | None = None
 
 
+class MetricsBatchSample(MetricsSubmit):
+    """Single timestamped sample inside a batch"""
+    collected_at: datetime | None = None  # defaults to time of receipt
+    agent_token: str | None = Field(default=None, max_length=64)  # relay mode: token of the sample's server
+
+
+class MetricsBatchSubmit(BaseModel):
+    """Batch of samples from one agent or from a relay for many servers"""
+    samples: list[dict] = Field(..., min_length=1)  # validated per sample, so one bad sample doesn't fail the batch
+
+
+class MetricsBatchResult(BaseModel):
+    """Outcome for one sample of a batch"""
+    index: int
+    accepted: bool
+    server_id: int | None = None
+    error: str | None = None
+
+
+class MetricsBatchResponse(BaseModel):
+    """Batch submit summary"""
+    accepted: int
+    rejected: int
+    results: list[MetricsBatchResult]
+
+
 class MetricsResponse(BaseModel):
     """Single metrics record"""
     cpu_percent: float
@@ -206,6 +267,172 @@ class MetricsHistoryResponse(BaseModel):
     history: list[MetricsResponse]
     avg_cpu_12h: float | None
     avg_memory_12h: float | None
+    resolution_seconds: int = 0  # 0 = raw samples, otherwise rollup bucket size
+
+
+class MetricsColumnarResponse(BaseModel):
+    """Metrics history as columns (format=columnar), oldest first"""
+    server_id: int
+    server_name: str
+    resolution_seconds: int
+    avg_cpu_12h: float | None
+    avg_memory_12h: float | None
+    timestamps: list[float]  # epoch seconds (UTC)
+    sample_count: list[int]  # samples behind each point (1 for raw samples)
+    metrics: dict[str, list[float | None]]  # metric name -> values
+
+
+class MetricStats(BaseModel):
+    """Aggregate statistics of a metric (None when there are no samples)"""
+    count: int
+    avg: float | None
+    min: float | None
+    max: float | None
+    p50: float | None
+    p95: float | None
+    p99: float | None
+
+
+class MetricStatsBucket(MetricStats):
+    """Statistics of one time bucket"""
+    bucket_start: datetime
+
+
+class MetricsStatsResponse(BaseModel):
+    """Windowed statistics of one metric of a server"""
+    server_id: int
+    metric: str
+    start: datetime
+    end: datetime
+    bucket_seconds: int | None
+    overall: MetricStats
+    buckets: list[MetricStatsBucket]
+
+
+class MetricAnomalyResponse(BaseModel):
+    """Sample that deviated from the server's own baseline"""
+    server_id: int
+    metric: str
+    value: float
+    baseline_mean: float
+    baseline_std: float
+    z_score: float
+    detected_at: datetime
+
+
+class MetricBaseline(BaseModel):
+    """EWMA baseline of one metric"""
+    mean: float
+    std: float
+    samples: int
+    anomalous: bool
+
+
+class MetricsBaselineResponse(BaseModel):
+    """Anomaly detector baselines of a server"""
+    server_id: int
+    metrics: dict[str, MetricBaseline]
+
+
+class DiskForecastResponse(BaseModel):
+    """Disk usage trend and projected exhaustion of a server"""
+    server_id: int
+    disk_used_gb: float
+    disk_total_gb: float
+    growth_gb_per_day: float | None  # None = not enough history
+    days_until_full: float | None  # None = not growing
+    full_at: datetime | None
+    points: int  # hourly rollups used for the fit
+    computed_at: datetime
+
+
+class ProbeStatsResponse(BaseModel):
+    """Uptime and ping latency of a server over a window (from hourly probe rollups)"""
+    server_id: int
+    window: str  # 24h / 7d / 30d
+    probes: int
+    successes: int
+    uptime_percent: float | None
+    latency_avg_ms: float | None  # of successful probes
+    latency_p50_ms: float | None  # estimated from the latency histogram
+    latency_p95_ms: float | None
+    latency_p99_ms: float | None
+    latency_max_ms: int | None
+
+
+class FleetHeatmapFolder(BaseModel):
+    """Folder block of heatmap rows"""
+    id: int
+    name: str
+    color: str
+    row_offset: int  # first row of the folder's servers
+    row_count: int
+
+
+class FleetHeatmapResponse(BaseModel):
+    """Servers x time buckets matrix of one metric (rows grouped by folder)"""
+    metric: str
+    aggregate: str
+    bucket_seconds: int
+    source_resolution_seconds: int  # 0 = raw samples, otherwise rollup tier
+    timestamps: list[float]  # bucket starts, epoch seconds (UTC)
+    server_ids: list[int]  # one per row
+    server_names: list[str]
+    folders: list[FleetHeatmapFolder]
+    values: list[list[float | None]]  # [row][bucket], None = no samples
+
+
+# ============ Alerts ============
+
+AlertMetric = Literal[MetricName, "offline", "last_ping"]  # offline: 1/0 from ping, last_ping: latency ms
+AlertOperator = Literal[">", ">=", "<", "<="]
+
+
+class AlertRuleBase(BaseModel):
+    name: str = Field(..., min_length=1, max_length=100)
+    metric: AlertMetric
+    operator: AlertOperator
+    threshold: float
+    duration_seconds: int = Field(default=0, ge=0)  # condition must hold this long
+    server_id: int | None = None  # scope: one server,
+    folder_id: int | None = None  # one folder, or all servers if both are empty
+    enabled: bool = True
+
+
+class AlertRuleCreate(AlertRuleBase):
+    pass
+
+
+class AlertRuleUpdate(BaseModel):
+    name: str | None = Field(default=None, min_length=1, max_length=100)
+    metric: AlertMetric | None = None
+    operator: AlertOperator | None = None
+    threshold: float | None = None
+    duration_seconds: int | None = Field(default=None, ge=0)
+    server_id: int | None = None
+    folder_id: int | None = None
+    enabled: bool | None = None
+
+
+class AlertRuleResponse(AlertRuleBase):
+    id: int
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class AlertEventResponse(BaseModel):
+    id: int
+    rule_id: int
+    server_id: int
+    state: Literal["firing", "resolved"]
+    value: float
+    started_at: datetime
+    resolved_at: datetime | None
+
+    class Config:
+        from_attributes = True
 
 
 class AgentTokenResponse(BaseModel):
@@ -1,4 +1,33 @@
 # Business logic
-from app.services.ping import ping_server, ping_all_servers, ping_loop
+from app.services.ping import ping_server, probe_scheduler
+from app.services.ingest import ingest_queue
+from app.services.admission import ingest_limiter
+from app.services.retention import metrics_retention
+from app.services.rollups import metrics_rollups
+from app.services.latest import latest_metrics
+from app.services.events import event_hub
+from app.services.alerts import alert_engine
+from app.services.anomaly import anomaly_detector
+from app.services.forecast import disk_forecaster
+from app.services.compression import metrics_compressor
+from app.services.exposition import prometheus_exporter
+from app.services.collector import node_exporter_collector
+from app.services.uptime import probe_rollups
 
-__all__ = ["ping_server", "ping_all_servers", "ping_loop"]
+__all__ = [
+    "ping_server",
+    "probe_scheduler",
+    "ingest_queue",
+    "ingest_limiter",
+    "metrics_retention",
+    "metrics_rollups",
+    "latest_metrics",
+    "event_hub",
+    "alert_engine",
+    "anomaly_detector",
+    "disk_forecaster",
+    "metrics_compressor",
+    "prometheus_exporter",
+    "node_exporter_collector",
+    "probe_rollups",
+]
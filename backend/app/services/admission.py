@@ -0,0 +1,110 @@
+"""
+Admission control for metrics ingest - per-token rate limits and global overload limits
+"""
+import time
+
+from app.config import settings
+
+
+# Idle buckets are dropped once this many tokens are tracked
+MAX_TRACKED_TOKENS = 10000
+
+
+class IngestLimiter:
+    """
+    Decides whether ingest is admitted.
+    Global limits per request (requests in flight, write-behind queue depth),
+    then a token bucket per agent token charged by sample count (rate_per_minute
+    refill, burst capacity). Returns how long the client should wait instead of
+    admitting it.
+    """
+
+    def __init__(self, rate_per_minute: float, burst: int, max_inflight: int, max_queue_depth: int, queue_retry_after: float):
+        self.rate = rate_per_minute / 60  # samples per second
+        self.burst = burst
+        self.max_inflight = max_inflight
+        self.max_queue_depth = max_queue_depth
+        self.queue_retry_after = queue_retry_after
+        self._buckets: dict[str, list[float]] = {}  # token -> [available, updated_at]
+        self.inflight = 0
+
+        # Counters
+        self.admitted_total = 0
+        self.rejected_rate = 0
+        self.rejected_inflight = 0
+        self.rejected_queue = 0
+
+    def take(self, token: str, samples: int = 1, now: float | None = None) -> float | None:
+        """
+        Charge samples to a token's bucket. Returns seconds to wait if it can't pay.
+        A batch larger than the burst is admitted from a full bucket and leaves it
+        in debt, so the long-run rate still holds.
+        """
+        if now is None:
+            now = time.monotonic()
+
+        bucket = self._buckets.get(token)
+        if bucket is None:
+            if len(self._buckets) >= MAX_TRACKED_TOKENS:
+                self._evict_idle(now)
+            bucket = self._buckets[token] = [float(self.burst), now]
+
+        available = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+        bucket[1] = now
+        needed = min(samples, self.burst)
+        if available < needed:
+            bucket[0] = available
+            self.rejected_rate += 1
+            return (needed - available) / self.rate
+
+        bucket[0] = available - samples
+        return None
+
+    def _evict_idle(self, now: float) -> None:
+        """Forget buckets that have refilled completely (equivalent to a new bucket)"""
+        self._buckets = {
+            token: bucket for token, bucket in self._buckets.items()
+            if bucket[0] + (now - bucket[1]) * self.rate < self.burst
+        }
+
+    def admit(self, queue_depth: int) -> float | None:
+        """
+        Admit a request against the global limits (counts it in flight until release()).
+        Returns seconds to wait if the request is rejected.
+        """
+        if self.inflight >= self.max_inflight:
+            self.rejected_inflight += 1
+            return 1.0
+        if queue_depth >= self.max_queue_depth:
+            self.rejected_queue += 1
+            return self.queue_retry_after
+
+        self.inflight += 1
+        self.admitted_total += 1
+        return None
+
+    def release(self) -> None:
+        self.inflight -= 1
+
+    def stats(self) -> dict:
+        return {
+            "rate_per_minute": round(self.rate * 60, 2),
+            "burst": self.burst,
+            "inflight": self.inflight,
+            "max_inflight": self.max_inflight,
+            "max_queue_depth": self.max_queue_depth,
+            "tracked_tokens": len(self._buckets),
+            "admitted_total": self.admitted_total,
+            "rejected_rate": self.rejected_rate,
+            "rejected_inflight": self.rejected_inflight,
+            "rejected_queue": self.rejected_queue,
+        }
+
+
+ingest_limiter = IngestLimiter(
+    rate_per_minute=settings.agent_rate_limit_per_minute,
+    burst=settings.agent_rate_limit_burst,
+    max_inflight=settings.ingest_max_inflight,
+    max_queue_depth=int(settings.metrics_queue_max_size * settings.ingest_queue_high_watermark),
+    queue_retry_after=settings.metrics_flush_interval_seconds,
+)
@@ -0,0 +1,299 @@
+"""
+Streaming threshold alerts - rules evaluated on every metrics sample and ping result
+"""
+import asyncio
+import operator
+from abc import ABC, abstractmethod
+from datetime import datetime
+
+import httpx
+from sqlalchemy import select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.config import settings
+from app.database import async_session
+from app.models import AlertEvent, AlertRule, Server
+from app.services.metrics import METRIC_FIELDS
+
+
+# Values fed to the engine by the ping loop
+PING_FIELDS = ("offline", "last_ping")
+
+# Everything a rule can watch
+ALERT_METRICS = (*METRIC_FIELDS, *PING_FIELDS)
+
+OPERATORS = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+}
+
+
+# ============ Notifiers ============
+
+class Notifier(ABC):
+    """Base class for alert notification channels"""
+    name = "notifier"
+
+    @abstractmethod
+    async def send(self, notification: dict) -> None:
+        """Deliver one firing/resolved notification, raises on failure"""
+
+
+class LogNotifier(Notifier):
+    """Print alerts to the backend log"""
+    name = "log"
+
+    async def send(self, notification: dict) -> None:
+        print(
+            f"Alert {notification['state']}: {notification['rule_name']} on {notification['server_name']} "
+            f"({notification['metric']} {notification['operator']} {notification['threshold']}, "
+            f"value {notification['value']})"
+        )
+
+
+class WebhookNotifier(Notifier):
+    """POST alerts as JSON to a URL"""
+    name = "webhook"
+
+    def __init__(self, url: str, timeout: float, transport: httpx.AsyncBaseTransport | None = None):
+        self.url = url
+        self.timeout = timeout
+        self.transport = transport  # injectable for tests (httpx.MockTransport)
+
+    async def send(self, notification: dict) -> None:
+        async with httpx.AsyncClient(transport=self.transport, timeout=self.timeout) as client:
+            response = await client.post(self.url, json=notification)
+            response.raise_for_status()
+
+
+def build_notifiers() -> list[Notifier]:
+    """Notifiers enabled in settings"""
+    notifiers: list[Notifier] = [LogNotifier()]
+    if settings.alerts_webhook_url:
+        notifiers.append(WebhookNotifier(settings.alerts_webhook_url, settings.alerts_webhook_timeout_seconds))
+    return notifiers
+
+
+# ============ Engine ============
+
+class CompiledRule:
+    """Enabled rule in the form the hot path needs"""
+    __slots__ = ("id", "name", "metric", "operator", "compare", "threshold", "duration_seconds")
+
+    def __init__(self, rule: AlertRule):
+        self.id = rule.id
+        self.name = rule.name
+        self.metric = rule.metric
+        self.operator = rule.operator
+        self.compare = OPERATORS[rule.operator]
+        self.threshold = rule.threshold
+        self.duration_seconds = rule.duration_seconds
+
+
+class AlertState:
+    """Evaluation state of one rule for one server"""
+    __slots__ = ("pending_since", "firing", "last_at")
+
+    def __init__(self, firing: bool = False):
+        self.pending_since: datetime | None = None  # condition true since
+        self.firing = firing
+        self.last_at: datetime | None = None  # last evaluated sample, older ones are ignored
+
+
+class AlertEngine:
+    """
+    Incremental rule evaluation.
+    observe() runs inline in the submit path and the ping loop: it only compares
+    values against the rules of the server and updates O(1) state per (rule, server).
+    Firing/resolved transitions are queued and persisted + notified by a background
+    worker. The partial unique index on open events makes persisting idempotent.
+    """
+
+    def __init__(self, notifiers: list[Notifier], queue_max_size: int):
+        self.notifiers = notifiers
+        self._rules_by_server: dict[int, list[CompiledRule]] = {}
+        self._server_names: dict[int, str] = {}
+        self._state: dict[tuple[int, int], AlertState] = {}
+        self._transitions: asyncio.Queue[tuple] = asyncio.Queue(maxsize=queue_max_size)
+        self._task: asyncio.Task | None = None
+
+        # Counters
+        self.rules = 0
+        self.evaluations = 0
+        self.fired_total = 0
+        self.resolved_total = 0
+        self.dropped_transitions = 0
+        self.notify_errors = 0
+
+    async def reload(self) -> None:
+        """Load enabled rules, resolve their scope to servers and restore firing state"""
+        async with async_session() as db:
+            rules = (await db.execute(select(AlertRule).where(AlertRule.enabled.is_(True)))).scalars().all()
+            servers = (await db.execute(select(Server.id, Server.folder_id, Server.name))).all()
+            open_events = (
+                await db.execute(
+                    select(AlertEvent.rule_id, AlertEvent.server_id).where(AlertEvent.resolved_at.is_(None))
+                )
+            ).all()
+
+        rules_by_server: dict[int, list[CompiledRule]] = {}
+        for server_id, folder_id, _ in servers:
+            rules_by_server[server_id] = [
+                CompiledRule(rule)
+                for rule in rules
+                if (rule.server_id is None or rule.server_id == server_id)
+                and (rule.folder_id is None or rule.folder_id == folder_id)
+            ]
+
+        # Keep state of (rule, server) pairs that still apply
+        applicable = {(rule.id, server_id) for server_id, compiled in rules_by_server.items() for rule in compiled}
+        state = {key: value for key, value in self._state.items() if key in applicable}
+        for key in open_events:
+            key = tuple(key)
+            if key in applicable:
+                state.setdefault(key, AlertState()).firing = True
+
+        self._rules_by_server = rules_by_server
+        self._server_names = {server_id: name for server_id, _, name in servers}
+        self._state = state
+        self.rules = len(rules)
+
+    def observe(self, server_id: int, sample: dict, at: datetime) -> None:
+        """Evaluate the server's rules against a sample (metrics row or ping result). Never blocks."""
+        for rule in self._rules_by_server.get(server_id, ()):
+            value = sample.get(rule.metric)
+            if value is None:
+                continue
+
+            key = (rule.id, server_id)
+            state = self._state.get(key)
+            if state is None:
+                state = self._state[key] = AlertState()
+            if state.last_at is not None and at < state.last_at:
+                continue
+            state.last_at = at
+            self.evaluations += 1
+
+            if rule.compare(value, rule.threshold):
+                if state.pending_since is None:
+                    state.pending_since = at
+                if not state.firing and (at - state.pending_since).total_seconds() >= rule.duration_seconds:
+                    state.firing = True
+                    self._emit("firing", rule, server_id, value, at)
+            else:
+                state.pending_since = None
+                if state.firing:
+                    state.firing = False
+                    self._emit("resolved", rule, server_id, value, at)
+
+    def _emit(self, state: str, rule: CompiledRule, server_id: int, value: float, at: datetime) -> None:
+        try:
+            self._transitions.put_nowait((state, rule, server_id, float(value), at))
+        except asyncio.QueueFull:
+            self.dropped_transitions += 1
+
+    async def _persist(self, state: str, rule: CompiledRule, server_id: int, value: float, at: datetime) -> bool:
+        """Store a transition. Returns False if it was a duplicate (nothing to notify)."""
+        async with async_session() as db:
+            if state == "firing":
+                stmt = (
+                    pg_insert(AlertEvent)
+                    .values(rule_id=rule.id, server_id=server_id, state=state, value=value, started_at=at)
+                    .on_conflict_do_nothing(
+                        index_elements=["rule_id", "server_id"],
+                        index_where=AlertEvent.resolved_at.is_(None),
+                    )
+                    .returning(AlertEvent.id)
+                )
+            else:
+                stmt = (
+                    update(AlertEvent)
+                    .where(
+                        AlertEvent.rule_id == rule.id,
+                        AlertEvent.server_id == server_id,
+                        AlertEvent.resolved_at.is_(None),
+                    )
+                    .values(state=state, resolved_at=at)
+                    .returning(AlertEvent.id)
+                )
+            event_id = (await db.execute(stmt)).scalar_one_or_none()
+            await db.commit()
+        return event_id is not None
+
+    async def notify(self, notification: dict) -> None:
+        """Send a notification through every notifier, failures are counted and logged"""
+        for notifier in self.notifiers:
+            try:
+                await notifier.send(notification)
+            except Exception as e:
+                self.notify_errors += 1
+                print(f"Alert notifier {notifier.name} error: {e}")
+
+    async def run(self) -> None:
+        """Transition worker: persist, deduplicate and notify"""
+        print(f"Starting alert engine ({self.rules} rules, notifiers: {', '.join(n.name for n in self.notifiers)})")
+        while True:
+            state, rule, server_id, value, at = await self._transitions.get()
+            try:
+                if await self._persist(state, rule, server_id, value, at):
+                    if state == "firing":
+                        self.fired_total += 1
+                    else:
+                        self.resolved_total += 1
+                    await self.notify({
+                        "state": state,
+                        "rule_id": rule.id,
+                        "rule_name": rule.name,
+                        "server_id": server_id,
+                        "server_name": self._server_names.get(server_id, str(server_id)),
+                        "metric": rule.metric,
+                        "operator": rule.operator,
+                        "threshold": rule.threshold,
+                        "duration_seconds": rule.duration_seconds,
+                        "value": value,
+                        "at": at.isoformat(),
+                    })
+            except Exception as e:
+                print(f"Alert engine error: {e}")
+            finally:
+                self._transitions.task_done()
+
+    def start(self) -> None:
+        """Start the transition worker"""
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self, timeout: float = 5.0) -> None:
+        """Let the worker finish queued transitions (up to timeout) and stop it"""
+        if self._task is None:
+            return
+        try:
+            await asyncio.wait_for(self._transitions.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "rules": self.rules,
+            "tracked": len(self._state),
+            "firing": sum(1 for state in self._state.values() if state.firing),
+            "evaluations": self.evaluations,
+            "fired_total": self.fired_total,
+            "resolved_total": self.resolved_total,
+            "pending_transitions": self._transitions.qsize(),
+            "dropped_transitions": self.dropped_transitions,
+            "notify_errors": self.notify_errors,
+        }
+
+
+alert_engine = AlertEngine(
+    notifiers=build_notifiers(),
+    queue_max_size=settings.alerts_queue_max_size,
+)
@@ -0,0 +1,190 @@
+"""
+Online anomaly detection on metric streams (EWMA mean/variance per server and metric)
+"""
+from collections import deque
+from datetime import datetime
+
+import numpy as np
+
+from app.config import settings
+
+
+# Metrics watched by the detector (totals and uptime only change on reboot/resize)
+DETECTED_FIELDS = (
+    "cpu_percent",
+    "memory_percent",
+    "memory_used_mb",
+    "disk_percent",
+    "disk_used_gb",
+    "load_avg_1",
+    "load_avg_5",
+    "load_avg_15",
+)
+
+# Std floor relative to the mean, so flat series don't flag tiny changes
+RELATIVE_STD_FLOOR = 0.01
+ABSOLUTE_STD_FLOOR = 0.1
+
+
+class AnomalyDetector:
+    """
+    Exponentially weighted mean and variance of every (server, metric).
+    State lives in a few NumPy arrays with one row per server, so a sample
+    is an O(metrics) vector update and memory is ~170 bytes per server.
+    A sample deviating more than z_threshold standard deviations from the
+    server's own baseline opens an anomaly; it is recorded once per excursion.
+    """
+
+    def __init__(self, alpha: float, z_threshold: float, warmup_samples: int, history_size: int):
+        self.alpha = alpha
+        self.z_threshold = z_threshold
+        self.warmup_samples = warmup_samples
+
+        self._rows: dict[int, int] = {}  # server_id -> row
+        self._free_rows: list[int] = []
+        self._allocate(64)
+
+        self._anomalies: deque[dict] = deque(maxlen=history_size)
+
+        # Counters
+        self.samples_total = 0
+        self.anomalies_total = 0
+
+    def _allocate(self, capacity: int, used: int = 0) -> None:
+        """(Re)allocate state arrays for capacity servers, keeping the first `used` rows"""
+        width = len(DETECTED_FIELDS)
+
+        mean = np.zeros((capacity, width))
+        var = np.zeros((capacity, width))
+        count = np.zeros((capacity, width), dtype=np.int32)
+        active = np.zeros((capacity, width), dtype=bool)
+        if used:
+            mean[:used], var[:used], count[:used], active[:used] = self._mean, self._var, self._count, self._active
+        self._mean, self._var, self._count, self._active = mean, var, count, active
+
+    def _row(self, server_id: int) -> int:
+        row = self._rows.get(server_id)
+        if row is not None:
+            return row
+
+        if self._free_rows:
+            row = self._free_rows.pop()
+        else:
+            row = len(self._rows)
+            if row >= len(self._count):
+                self._allocate(len(self._count) * 2, used=row)
+        self._rows[server_id] = row
+        return row
+
+    def observe(self, row: dict) -> None:
+        """Update the server's baselines with a metrics row and record new anomalies"""
+        values = np.array(
+            [np.nan if row.get(field) is None else row[field] for field in DETECTED_FIELDS],
+            dtype=np.float64,
+        )
+        present = ~np.isnan(values)
+        i = self._row(row["server_id"])
+        mean, var, count = self._mean[i], self._var[i], self._count[i]
+
+        # Score against the baseline before it absorbs this sample
+        baseline_mean = mean.copy()
+        diff = np.where(present, values - mean, 0.0)
+        std = np.maximum(np.sqrt(var), np.maximum(RELATIVE_STD_FLOOR * np.abs(mean), ABSOLUTE_STD_FLOOR))
+        z = diff / std
+        anomalous = present & (count >= self.warmup_samples) & (np.abs(z) > self.z_threshold)
+
+        # First sample seeds the mean, later ones are EWMA updates
+        first = present & (count == 0)
+        update = present & ~first
+        mean[first] = values[first]
+        mean[update] += self.alpha * diff[update]
+        var[update] = (1 - self.alpha) * (var[update] + self.alpha * diff[update] ** 2)
+        count[present] += 1
+
+        opened = anomalous & ~self._active[i]
+        self._active[i] = np.where(present, anomalous, self._active[i])
+        self.samples_total += 1
+
+        for j in np.flatnonzero(opened):
+            self.anomalies_total += 1
+            self._anomalies.append({
+                "server_id": row["server_id"],
+                "metric": DETECTED_FIELDS[j],
+                "value": float(values[j]),
+                "baseline_mean": round(float(baseline_mean[j]), 4),
+                "baseline_std": round(float(std[j]), 4),
+                "z_score": round(float(z[j]), 2),
+                "detected_at": row["collected_at"],
+            })
+
+    def baseline(self, server_id: int) -> dict[str, dict] | None:
+        """Current mean/std/sample count of every metric of a server"""
+        i = self._rows.get(server_id)
+        if i is None:
+            return None
+        return {
+            field: {
+                "mean": round(float(self._mean[i, j]), 4),
+                "std": round(float(np.sqrt(self._var[i, j])), 4),
+                "samples": int(self._count[i, j]),
+                "anomalous": bool(self._active[i, j]),
+            }
+            for j, field in enumerate(DETECTED_FIELDS)
+        }
+
+    def anomalies(
+        self,
+        server_id: int | None = None,
+        metric: str | None = None,
+        since: datetime | None = None,
+        limit: int = 100,
+    ) -> list[dict]:
+        """Recent anomalies, newest first"""
+        result = []
+        for anomaly in reversed(self._anomalies):
+            if since is not None and anomaly["detected_at"] < since:
+                continue
+            if server_id is not None and anomaly["server_id"] != server_id:
+                continue
+            if metric is not None and anomaly["metric"] != metric:
+                continue
+            result.append(anomaly)
+            if len(result) >= limit:
+                break
+        return result
+
+    def remove(self, server_id: int) -> None:
+        """Forget a server's baselines and anomalies"""
+        i = self._rows.pop(server_id, None)
+        if i is not None:
+            self._mean[i] = self._var[i] = self._count[i] = self._active[i] = 0
+            self._free_rows.append(i)
+        self._anomalies = deque(
+            (anomaly for anomaly in self._anomalies if anomaly["server_id"] != server_id),
+            maxlen=self._anomalies.maxlen,
+        )
+
+    def clear(self) -> None:
+        self._rows.clear()
+        self._free_rows.clear()
+        for state in (self._mean, self._var, self._count, self._active):
+            state[:] = 0
+        self._anomalies.clear()
+
+    def stats(self) -> dict:
+        return {
+            "servers": len(self._rows),
+            "capacity": len(self._count),
+            "state_bytes": self._mean.nbytes + self._var.nbytes + self._count.nbytes + self._active.nbytes,
+            "samples_total": self.samples_total,
+            "anomalies_total": self.anomalies_total,
+            "active": int(self._active.sum()),
+        }
+
+
+anomaly_detector = AnomalyDetector(
+    alpha=settings.anomaly_ewma_alpha,
+    z_threshold=settings.anomaly_z_threshold,
+    warmup_samples=settings.anomaly_warmup_samples,
+    history_size=settings.anomaly_history_size,
+)
@@ -0,0 +1,288 @@
+"""
+Pull-mode metrics collection - scrapes node_exporter endpoints of servers without an agent
+"""
+import asyncio
+import re
+import time
+from datetime import datetime
+
+import httpx
+from sqlalchemy import select
+
+from app.config import settings
+from app.database import async_session
+from app.models import Server
+from app.services.ingest import ingest_queue, publish_ingested
+
+
+# node_exporter families we read, everything else is skipped by name
+NODE_FAMILIES = frozenset((
+    "node_cpu_seconds_total",
+    "node_memory_MemTotal_bytes",
+    "node_memory_MemAvailable_bytes",
+    "node_filesystem_size_bytes",
+    "node_filesystem_free_bytes",
+    "node_filesystem_avail_bytes",
+    "node_load1",
+    "node_load5",
+    "node_load15",
+    "node_boot_time_seconds",
+    "node_time_seconds",
+))
+
+# CPU modes counted as not busy
+IDLE_CPU_MODES = ("idle", "iowait")
+
+ROOT_MOUNTPOINT = "/"
+
+_LABEL_RE = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+class NodeExporterParser:
+    """
+    Incremental parser of the Prometheus text format.
+    Lines are fed one at a time as they arrive, only the values needed for a
+    metrics row are kept (CPU counters are summed over all CPUs on the fly).
+    """
+
+    def __init__(self):
+        self.cpu_total = 0.0
+        self.cpu_idle = 0.0
+        self.cpu_seen = False
+        self.values: dict[str, float] = {}
+        self.lines = 0
+
+    def feed(self, line: str) -> None:
+        self.lines += 1
+        if not line or line[0] == "#":
+            return
+
+        brace = line.find("{")
+        space = line.find(" ")
+        if brace == -1 or (space != -1 and space < brace):
+            name = line[:space]
+            labels, rest = "", line[space + 1:]
+        else:
+            name = line[:brace]
+            close = line.rfind("}")
+            labels, rest = line[brace + 1:close], line[close + 1:]
+        if name not in NODE_FAMILIES:
+            return
+
+        try:
+            value = float(rest.split()[0])  # optional timestamp after the value is ignored
+        except (IndexError, ValueError):
+            return
+
+        if name == "node_cpu_seconds_total":
+            self.cpu_total += value
+            if dict(_LABEL_RE.findall(labels)).get("mode") in IDLE_CPU_MODES:
+                self.cpu_idle += value
+            self.cpu_seen = True
+        elif name.startswith("node_filesystem_"):
+            if dict(_LABEL_RE.findall(labels)).get("mountpoint") == ROOT_MOUNTPOINT:
+                self.values[name] = value
+        else:
+            self.values[name] = value
+
+
+def build_exporter_row(
+    server_id: int,
+    parser: NodeExporterParser,
+    previous_cpu: tuple[float, float] | None,
+    collected_at: datetime,
+) -> dict | None:
+    """
+    server_metrics row from a parsed scrape, in the units the agent reports.
+    CPU usage is the busy share of the CPU counters since the previous scrape,
+    so the first scrape of a target only sets the baseline (returns None).
+    Returns None if the exporter lacks a required family.
+    """
+    v = parser.values
+    required = (
+        "node_memory_MemTotal_bytes",
+        "node_memory_MemAvailable_bytes",
+        "node_filesystem_size_bytes",
+        "node_filesystem_free_bytes",
+        "node_filesystem_avail_bytes",
+        "node_boot_time_seconds",
+        "node_time_seconds",
+    )
+    if previous_cpu is None or not parser.cpu_seen or any(key not in v for key in required):
+        return None
+
+    total_delta = parser.cpu_total - previous_cpu[0]
+    idle_delta = parser.cpu_idle - previous_cpu[1]
+    if total_delta <= 0:
+        return None  # counters reset (reboot) - next scrape has a fresh baseline
+    cpu_percent = min(100.0, max(0.0, 100 * (1 - idle_delta / total_delta)))
+
+    memory_total = v["node_memory_MemTotal_bytes"]
+    memory_used = memory_total - v["node_memory_MemAvailable_bytes"]
+
+    # Same definitions as psutil.disk_usage (reserved blocks count as neither used nor free)
+    disk_total = v["node_filesystem_size_bytes"]
+    disk_used = disk_total - v["node_filesystem_free_bytes"]
+    disk_usable = disk_used + v["node_filesystem_avail_bytes"]
+
+    load = {key: v.get(key) for key in ("node_load1", "node_load5", "node_load15")}
+
+    return {
+        "server_id": server_id,
+        "collected_at": collected_at,
+        "cpu_percent": round(cpu_percent, 1),
+        "memory_percent": round(100 * memory_used / memory_total, 1) if memory_total else 0.0,
+        "memory_used_mb": int(memory_used // (1024 * 1024)),
+        "memory_total_mb": int(memory_total // (1024 * 1024)),
+        "disk_percent": round(100 * disk_used / disk_usable, 1) if disk_usable else 0.0,
+        "disk_used_gb": round(disk_used / (1024 ** 3), 2),
+        "disk_total_gb": round(disk_total / (1024 ** 3), 2),
+        "uptime_seconds": max(0, int(v["node_time_seconds"] - v["node_boot_time_seconds"])),
+        "load_avg_1": round(load["node_load1"], 2) if load["node_load1"] is not None else None,
+        "load_avg_5": round(load["node_load5"], 2) if load["node_load5"] is not None else None,
+        "load_avg_15": round(load["node_load15"], 2) if load["node_load15"] is not None else None,
+    }
+
+
+class NodeExporterCollector:
+    """
+    Background job that scrapes the exporter_url of every server that has one.
+    Targets are scraped concurrently (at most max_concurrency at a time, each
+    within timeout seconds), responses are parsed while they stream in and the
+    resulting rows take the same path as agent submits (write-behind queue,
+    latest cache, live events, alerts, anomaly detection).
+    """
+
+    def __init__(self, interval: float, timeout: float, max_concurrency: int, transport: httpx.AsyncBaseTransport | None = None):
+        self.interval = interval
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.transport = transport  # injectable for tests (httpx.MockTransport)
+        self._cpu: dict[int, tuple[float, float]] = {}  # server_id -> (cpu total, cpu idle) of the last scrape
+        self._task: asyncio.Task | None = None
+
+        # Stats
+        self.runs = 0
+        self.errors = 0
+        self.targets = 0
+        self.scrapes_total = 0
+        self.scrape_errors = 0
+        self.timeouts = 0
+        self.rows_total = 0
+        self.last_errors: dict[int, str] = {}
+        self.last_run_at: datetime | None = None
+        self.last_run_seconds = 0.0
+
+    async def scrape(self, client: httpx.AsyncClient, server_id: int, url: str) -> dict | None:
+        """Scrape one target and return its metrics row (None while there is no CPU baseline)"""
+        parser = NodeExporterParser()
+        async with client.stream("GET", url) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                parser.feed(line)
+
+        row = build_exporter_row(server_id, parser, self._cpu.get(server_id), datetime.utcnow())
+        if parser.cpu_seen:
+            self._cpu[server_id] = (parser.cpu_total, parser.cpu_idle)
+        return row
+
+    async def _scrape_target(self, client: httpx.AsyncClient, semaphore: asyncio.Semaphore, server_id: int, url: str) -> dict | None:
+        async with semaphore:
+            self.scrapes_total += 1
+            try:
+                row = await asyncio.wait_for(self.scrape(client, server_id, url), timeout=self.timeout)
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                self.last_errors[server_id] = "timeout"
+                return None
+            except Exception as e:  # HTTP errors, httpx.InvalidURL, bad encoding - one target never fails the run
+                self.scrape_errors += 1
+                self.last_errors[server_id] = str(e) or type(e).__name__
+                return None
+
+            self.last_errors.pop(server_id, None)
+            return row
+
+    async def run_once(self) -> dict:
+        """Scrape every configured target once"""
+        start_time = time.perf_counter()
+
+        async with async_session() as db:
+            result = await db.execute(
+                select(Server.id, Server.exporter_url).where(Server.exporter_url.is_not(None), Server.exporter_url != "")
+            )
+            targets = result.all()
+
+        # Forget state of servers that were deleted or stopped using an exporter
+        target_ids = {server_id for server_id, _ in targets}
+        self._cpu = {server_id: cpu for server_id, cpu in self._cpu.items() if server_id in target_ids}
+        self.last_errors = {server_id: error for server_id, error in self.last_errors.items() if server_id in target_ids}
+
+        rows = []
+        if targets:
+            semaphore = asyncio.Semaphore(self.max_concurrency)
+            async with httpx.AsyncClient(transport=self.transport, timeout=self.timeout) as client:
+                results = await asyncio.gather(*(
+                    self._scrape_target(client, semaphore, server_id, url) for server_id, url in targets
+                ))
+            rows = [row for row in results if row is not None]
+
+        publish_ingested([row for row in rows if ingest_queue.enqueue(row)])
+
+        self.runs += 1
+        self.targets = len(targets)
+        self.rows_total += len(rows)
+        self.last_run_at = datetime.utcnow()
+        self.last_run_seconds = time.perf_counter() - start_time
+        return {"targets": len(targets), "rows": len(rows), "seconds": round(self.last_run_seconds, 3)}
+
+    async def run(self) -> None:
+        """Collection loop"""
+        print(
+            f"Starting node_exporter collector (interval: {self.interval}s, "
+            f"timeout: {self.timeout}s, concurrency: {self.max_concurrency})"
+        )
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                self.errors += 1
+                print(f"node_exporter collector error: {e}")
+
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        """Start the background collection job"""
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        """Cancel the background collection job"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "targets": self.targets,
+            "runs": self.runs,
+            "errors": self.errors,
+            "scrapes_total": self.scrapes_total,
+            "scrape_errors": self.scrape_errors,
+            "timeouts": self.timeouts,
+            "rows_total": self.rows_total,
+            "failing_targets": {str(server_id): error for server_id, error in self.last_errors.items()},
+            "last_run_at": self.last_run_at.isoformat() if self.last_run_at else None,
+            "last_run_seconds": round(self.last_run_seconds, 3),
+        }
+
+
+node_exporter_collector = NodeExporterCollector(
+    interval=settings.collector_interval_seconds,
+    timeout=settings.collector_timeout_seconds,
+    max_concurrency=settings.collector_max_concurrency,
+)
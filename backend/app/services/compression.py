@@ -0,0 +1,256 @@
+"""
+Cold storage of raw metrics - closed windows packed into Gorilla-compressed chunks
+"""
+import asyncio
+import time
+from datetime import datetime, timedelta
+from itertools import groupby
+
+from sqlalchemy import Integer, any_, bindparam, delete, func, select
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import async_session
+from app.models import ServerMetrics, ServerMetricsChunk
+from app.services.gorilla import decode_chunk, encode_chunk
+from app.services.metrics import METRIC_FIELDS
+from app.services.rollups import INTEGER_FIELDS, floor_to_resolution
+
+
+# Size of an uncompressed sample (timestamp + every metric as 8 bytes), for the ratio in stats
+RAW_SAMPLE_BYTES = 8 * (1 + len(METRIC_FIELDS))
+
+# Windows packed per run, so a large backlog is worked off in steps
+MAX_WINDOWS_PER_RUN = 12
+
+_INTEGER_COLUMNS = [i for i, field in enumerate(METRIC_FIELDS) if field in INTEGER_FIELDS]
+
+
+def pack_rows(rows: list[tuple]) -> bytes:
+    """(collected_at, *METRIC_FIELDS) rows sorted by time -> chunk"""
+    timestamps = [row[0] for row in rows]
+    columns = [[row[i] for row in rows] for i in range(1, len(METRIC_FIELDS) + 1)]
+    return encode_chunk(timestamps, columns)
+
+
+def unpack_rows(data: bytes) -> list[tuple]:
+    """Chunk -> (collected_at, *METRIC_FIELDS) rows, integer metrics restored as int"""
+    timestamps, columns = decode_chunk(data)
+    for i in _INTEGER_COLUMNS:
+        columns[i] = [int(value) if value is not None else None for value in columns[i]]
+    return list(zip(timestamps, *columns))
+
+
+async def read_chunk_rows(
+    db: AsyncSession,
+    server_id: int,
+    since: datetime,
+    until: datetime | None = None,
+) -> list[tuple]:
+    """Decoded (collected_at, *METRIC_FIELDS) rows of a server's chunks within [since, until), oldest first"""
+    stmt = (
+        select(ServerMetricsChunk.data)
+        .where(ServerMetricsChunk.server_id == server_id, ServerMetricsChunk.chunk_end > since)
+        .order_by(ServerMetricsChunk.chunk_start)
+    )
+    if until is not None:
+        stmt = stmt.where(ServerMetricsChunk.chunk_start < until)
+
+    rows = []
+    for data in (await db.execute(stmt)).scalars():
+        rows.extend(
+            row for row in unpack_rows(data)
+            if row[0] >= since and (until is None or row[0] < until)
+        )
+    return rows
+
+
+async def read_latest_chunk_rows(db: AsyncSession, since: datetime) -> dict[int, tuple]:
+    """Newest decoded (collected_at, *METRIC_FIELDS) row per server from chunks, if not older than since"""
+    result = await db.execute(
+        select(ServerMetricsChunk.server_id, ServerMetricsChunk.data)
+        .where(ServerMetricsChunk.chunk_end > since)
+        .distinct(ServerMetricsChunk.server_id)
+        .order_by(ServerMetricsChunk.server_id, ServerMetricsChunk.chunk_start.desc())
+    )
+    latest = {}
+    for server_id, data in result.all():
+        rows = unpack_rows(data)
+        if rows and rows[-1][0] >= since:
+            latest[server_id] = rows[-1]
+    return latest
+
+
+class MetricsCompressor:
+    """
+    Background job that moves raw samples older than compress_after_hours into
+    one compressed chunk per server and window of chunk_hours, then deletes the
+    raw rows. Late samples for an already packed window are merged into its chunk.
+    Chunks older than chunk_retention_days are removed.
+    """
+
+    def __init__(self, compress_after_hours: int, chunk_hours: int, chunk_retention_days: int, interval: float):
+        self.compress_after_hours = compress_after_hours
+        self.chunk_seconds = chunk_hours * 3600
+        self.chunk_retention_days = chunk_retention_days
+        self.interval = interval
+        self._task: asyncio.Task | None = None
+
+        # Stats
+        self.runs = 0
+        self.errors = 0
+        self.windows_total = 0
+        self.rows_packed_total = 0
+        self.bytes_written_total = 0
+        self.chunks_purged_total = 0
+        self.last_run_at: datetime | None = None
+        self.last_run_seconds = 0.0
+
+    async def pack_window(self, db: AsyncSession, start: datetime) -> int:
+        """
+        Pack all raw rows of [start, start + chunk) into chunks and delete them. Does not commit.
+        Only the packed rows are deleted (by id): a late sample committed after the
+        SELECT stays raw and is merged into the chunk by a later run.
+        """
+        end = start + timedelta(seconds=self.chunk_seconds)
+        columns = [getattr(ServerMetrics, field) for field in METRIC_FIELDS]
+        result = await db.execute(
+            select(ServerMetrics.id, ServerMetrics.server_id, ServerMetrics.collected_at, *columns)
+            .where(ServerMetrics.collected_at >= start, ServerMetrics.collected_at < end)
+            .order_by(ServerMetrics.server_id, ServerMetrics.collected_at)
+        )
+        rows = result.all()
+        packed_ids = [row[0] for row in rows]
+        rows = [tuple(row[1:]) for row in rows]
+
+        # Chunks already written for this window (late samples)
+        result = await db.execute(
+            select(ServerMetricsChunk.server_id, ServerMetricsChunk.data)
+            .where(ServerMetricsChunk.chunk_start == start)
+        )
+        existing = dict(result.all())
+
+        values = []
+        for server_id, server_rows in groupby(rows, key=lambda row: row[0]):
+            samples = [tuple(row[1:]) for row in server_rows]
+            if server_id in existing:
+                samples = sorted(unpack_rows(existing[server_id]) + samples, key=lambda row: row[0])
+            data = pack_rows(samples)
+            self.bytes_written_total += len(data)
+            values.append({
+                "server_id": server_id,
+                "chunk_start": start,
+                "chunk_end": end,
+                "sample_count": len(samples),
+                "data": data,
+            })
+
+        if values:
+            stmt = pg_insert(ServerMetricsChunk).values(values)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["server_id", "chunk_start"],
+                set_={"sample_count": stmt.excluded.sample_count, "data": stmt.excluded.data},
+            )
+            await db.execute(stmt)
+
+        if packed_ids:
+            await db.execute(
+                delete(ServerMetrics).where(
+                    ServerMetrics.collected_at >= start,  # keeps partition pruning
+                    ServerMetrics.collected_at < end,
+                    ServerMetrics.id == any_(bindparam("packed_ids", packed_ids, type_=ARRAY(Integer))),
+                )
+            )
+        return len(rows)
+
+    async def run_once(self) -> dict:
+        """Pack closed windows (oldest first) and apply chunk retention"""
+        start_time = time.perf_counter()
+        now = datetime.utcnow()
+        cutoff = floor_to_resolution(now - timedelta(hours=self.compress_after_hours), self.chunk_seconds)
+
+        windows = rows_packed = 0
+        async with async_session() as db:
+            for _ in range(MAX_WINDOWS_PER_RUN):
+                result = await db.execute(
+                    select(func.min(ServerMetrics.collected_at)).where(ServerMetrics.collected_at < cutoff)
+                )
+                oldest = result.scalar_one_or_none()
+                if oldest is None:
+                    break
+
+                rows_packed += await self.pack_window(db, floor_to_resolution(oldest, self.chunk_seconds))
+                await db.commit()
+                windows += 1
+
+            result = await db.execute(
+                delete(ServerMetricsChunk).where(
+                    ServerMetricsChunk.chunk_end <= now - timedelta(days=self.chunk_retention_days)
+                )
+            )
+            await db.commit()
+            self.chunks_purged_total += result.rowcount
+
+        self.runs += 1
+        self.windows_total += windows
+        self.rows_packed_total += rows_packed
+        self.last_run_at = datetime.utcnow()
+        self.last_run_seconds = time.perf_counter() - start_time
+        return {"windows": windows, "rows": rows_packed, "seconds": round(self.last_run_seconds, 3)}
+
+    async def run(self) -> None:
+        """Compression loop"""
+        print(
+            f"Starting metrics compression (after {self.compress_after_hours}h, "
+            f"chunks of {self.chunk_seconds // 3600}h kept {self.chunk_retention_days}d)"
+        )
+        while True:
+            try:
+                result = await self.run_once()
+                if result["windows"]:
+                    print(f"Metrics compression: packed {result['rows']} rows in {result['windows']} windows")
+            except Exception as e:
+                self.errors += 1
+                print(f"Metrics compression error: {e}")
+
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        """Start the background compression job"""
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        """Cancel the background compression job"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def stats(self) -> dict:
+        raw_bytes = self.rows_packed_total * RAW_SAMPLE_BYTES
+        return {
+            "enabled": self._task is not None,
+            "runs": self.runs,
+            "errors": self.errors,
+            "windows_total": self.windows_total,
+            "rows_packed_total": self.rows_packed_total,
+            "bytes_written_total": self.bytes_written_total,
+            "compression_ratio": round(raw_bytes / self.bytes_written_total, 2) if self.bytes_written_total else None,
+            "chunks_purged_total": self.chunks_purged_total,
+            "last_run_at": self.last_run_at.isoformat() if self.last_run_at else None,
+            "last_run_seconds": round(self.last_run_seconds, 3),
+        }
+
+
+metrics_compressor = MetricsCompressor(
+    compress_after_hours=settings.metrics_compress_after_hours,
+    chunk_hours=settings.metrics_chunk_hours,
+    chunk_retention_days=settings.metrics_chunk_retention_days,
+    interval=settings.metrics_compression_interval_seconds,
+)
@@ -0,0 +1,52 @@
+"""
+Shape-preserving downsampling of metric series (Largest-Triangle-Three-Buckets)
+"""
+import numpy as np
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Pick `threshold` points of the (x, y) series with LTTB.
+    x must be ascending. Returns indices of selected points (first and last always kept).
+    Bucket averages are computed for all buckets at once from cumulative sums,
+    only the per-bucket triangle selection walks the buckets.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    y = np.nan_to_num(np.asarray(y, dtype=np.float64))
+    x = np.asarray(x, dtype=np.float64)
+
+    # threshold - 2 buckets over points 1..n-2 (each at least one point wide)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+
+    # Average point of every bucket
+    cum_x = np.concatenate(([0.0], np.cumsum(x)))
+    cum_y = np.concatenate(([0.0], np.cumsum(y)))
+    counts = edges[1:] - edges[:-1]
+    avg_x = (cum_x[edges[1:]] - cum_x[edges[:-1]]) / counts
+    avg_y = (cum_y[edges[1:]] - cum_y[edges[:-1]]) / counts
+
+    # Third triangle vertex: average of the next bucket, last point for the last bucket
+    next_x = np.append(avg_x[1:], x[-1])
+    next_y = np.append(avg_y[1:], y[-1])
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        bucket_x = x[lo:hi]
+        bucket_y = y[lo:hi]
+        # Twice the triangle area (a, candidate, next bucket average)
+        areas = np.abs(
+            (x[a] - next_x[i]) * (bucket_y - y[a])
+            - (x[a] - bucket_x) * (next_y[i] - y[a])
+        )
+        a = lo + int(np.argmax(areas))
+        selected[i + 1] = a
+
+    return selected
@@ -0,0 +1,173 @@
+"""
+In-process pub/sub hub for live dashboard updates (metrics and server status)
+"""
+import asyncio
+import json
+
+from sqlalchemy import select
+
+from app.config import settings
+from app.database import async_session
+from app.models import Server
+from app.services.latest import CURRENT_FIELDS
+
+
+class Subscription:
+    """
+    One connected client.
+    Pending events are coalesced per (event, server): a newer event replaces the
+    undelivered older one, so a slow client gets the latest state instead of a
+    growing backlog. Pending events are also capped at max_pending.
+    """
+
+    def __init__(self, server_ids: set[int] | None, folder_ids: set[int] | None, max_pending: int):
+        self.server_ids = server_ids
+        self.folder_ids = folder_ids  # matched against the server's folder at publish time
+        self.max_pending = max_pending
+        self._pending: dict[tuple[str, int], str] = {}
+        self._ready = asyncio.Event()
+        self.closed = False
+
+        # Counters
+        self.delivered = 0
+        self.coalesced = 0
+        self.dropped = 0
+
+    def follows(self, server_id: int, folder_id: int | None) -> bool:
+        """Whether events of a server are wanted (no filter = all servers)"""
+        if self.server_ids is None and self.folder_ids is None:
+            return True
+        return (self.server_ids is not None and server_id in self.server_ids) or (
+            self.folder_ids is not None and folder_id in self.folder_ids
+        )
+
+    def offer(self, event: str, server_id: int, folder_id: int | None, data: str) -> None:
+        """Queue an event for delivery (never blocks)"""
+        if not self.follows(server_id, folder_id):
+            return
+
+        key = (event, server_id)
+        if key in self._pending:
+            del self._pending[key]  # re-insert so it moves to the end
+            self.coalesced += 1
+        elif len(self._pending) >= self.max_pending:
+            del self._pending[next(iter(self._pending))]  # oldest
+            self.dropped += 1
+
+        self._pending[key] = data
+        self._ready.set()
+
+    def close(self) -> None:
+        self.closed = True
+        self._ready.set()
+
+    async def next_batch(self, timeout: float) -> list[tuple[str, str]]:
+        """Wait up to timeout for events and take everything pending as (event, data)"""
+        if not self._pending and not self.closed:
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+        self._ready.clear()
+
+        batch = [(event, data) for (event, _), data in self._pending.items()]
+        self._pending = {}
+        self.delivered += len(batch)
+        return batch
+
+
+class EventHub:
+    """
+    Fan-out of events to subscriptions.
+    publish() serializes an event once and hands it to every subscription
+    without awaiting, so ingest and the ping loop never wait for clients.
+    Folder filters are matched against the server -> folder map, reloaded
+    whenever servers are added or moved, so a folder stream follows its
+    current servers.
+    """
+
+    def __init__(self, max_pending: int, keepalive: float):
+        self.max_pending = max_pending
+        self.keepalive = keepalive
+        self._subscriptions: set[Subscription] = set()
+        self._server_folders: dict[int, int] = {}
+
+        # Counters
+        self.published_total = 0
+        self.subscriptions_total = 0
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscriptions)
+
+    async def reload(self) -> None:
+        """Load the folder of every server"""
+        async with async_session() as db:
+            result = await db.execute(select(Server.id, Server.folder_id))
+            self._server_folders = dict(result.all())
+
+    def subscribe(self, server_ids: set[int] | None = None, folder_ids: set[int] | None = None) -> Subscription:
+        subscription = Subscription(server_ids, folder_ids, self.max_pending)
+        self._subscriptions.add(subscription)
+        self.subscriptions_total += 1
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self._subscriptions.discard(subscription)
+
+    def publish(self, event: str, server_id: int, payload: dict) -> None:
+        """Send an event about a server to every interested subscription"""
+        self.published_total += 1
+        if not self._subscriptions:
+            return
+        data = json.dumps({"server_id": server_id, **payload}, default=str)
+        folder_id = self._server_folders.get(server_id)
+        for subscription in self._subscriptions:
+            subscription.offer(event, server_id, folder_id, data)
+
+    def publish_metrics(self, row: dict) -> None:
+        """Publish a metrics row in /metrics/current/all format"""
+        payload = {field: row[field] for field in CURRENT_FIELDS}
+        payload["collected_at"] = row["collected_at"].isoformat()
+        self.publish("metrics", row["server_id"], payload)
+
+    def close(self) -> None:
+        """End all streams (shutdown)"""
+        for subscription in self._subscriptions:
+            subscription.close()
+
+    async def stream(self, server_ids: set[int] | None = None, folder_ids: set[int] | None = None):
+        """
+        Server-Sent Events stream with keepalive comments.
+        The subscription lives only while the generator runs, so a client that
+        disconnects before the body starts never leaves one behind.
+        """
+        subscription = self.subscribe(server_ids, folder_ids)
+        try:
+            yield f"retry: {int(self.keepalive * 1000)}\n\n"
+            while not subscription.closed:
+                batch = await subscription.next_batch(self.keepalive)
+                if not batch:
+                    yield ": keepalive\n\n"
+                    continue
+                yield "".join(f"event: {event}\ndata: {data}\n\n" for event, data in batch)
+        finally:
+            self.unsubscribe(subscription)
+
+    def stats(self) -> dict:
+        subscriptions = list(self._subscriptions)
+        return {
+            "subscriptions": len(subscriptions),
+            "subscriptions_total": self.subscriptions_total,
+            "published_total": self.published_total,
+            "pending": sum(len(s._pending) for s in subscriptions),
+            "delivered": sum(s.delivered for s in subscriptions),
+            "coalesced": sum(s.coalesced for s in subscriptions),
+            "dropped": sum(s.dropped for s in subscriptions),
+        }
+
+
+event_hub = EventHub(
+    max_pending=settings.events_max_pending,
+    keepalive=settings.events_keepalive_seconds,
+)
@@ -0,0 +1,141 @@
+"""
+Streaming export of raw metrics (NDJSON / CSV)
+"""
+import csv
+import io
+import json
+from datetime import datetime
+from typing import AsyncIterator
+
+from sqlalchemy import exists, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import async_session
+from app.models import Server, ServerMetrics, ServerMetricsChunk
+from app.services.compression import read_chunk_rows
+from app.services.metrics import METRIC_FIELDS
+
+
+# Rows fetched from the server-side cursor per round trip
+EXPORT_CHUNK_ROWS = 5000
+
+EXPORT_COLUMNS = ("server_id", "collected_at", *METRIC_FIELDS)
+
+
+def _ndjson_chunk(rows) -> str:
+    lines = []
+    for row in rows:
+        record = dict(zip(EXPORT_COLUMNS, row))
+        record["collected_at"] = record["collected_at"].isoformat()
+        lines.append(json.dumps(record))
+    return "\n".join(lines) + "\n"
+
+
+def _csv_chunk(rows) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([value.isoformat() if isinstance(value, datetime) else value for value in row])
+    return buffer.getvalue()
+
+
+async def stream_metrics(
+    server_id: int | None,
+    start: datetime,
+    end: datetime,
+    format: str,
+) -> AsyncIterator[str]:
+    """
+    Yield metrics in [start, end) as NDJSON lines or CSV rows.
+    Rows come from a server-side cursor EXPORT_CHUNK_ROWS at a time, so memory
+    stays flat regardless of the range size. Ordered by server, then time
+    (matches the (server_id, collected_at) index, no sort needed).
+    If part of the range is in compressed chunks, servers are exported one at
+    a time, decoding one chunk window at a time (memory bounded by one chunk).
+    """
+    if format == "csv":
+        yield ",".join(EXPORT_COLUMNS) + "\r\n"
+        encode = _csv_chunk
+    else:
+        encode = _ndjson_chunk
+
+    # Own session: the request's dependency session is closed before the body is streamed
+    async with async_session() as db:
+        chunks = exists().where(ServerMetricsChunk.chunk_end > start, ServerMetricsChunk.chunk_start < end)
+        if server_id is not None:
+            chunks = chunks.where(ServerMetricsChunk.server_id == server_id)
+
+        if not (await db.execute(select(chunks))).scalar():
+            stmt = (
+                select(*(getattr(ServerMetrics, column) for column in EXPORT_COLUMNS))
+                .where(ServerMetrics.collected_at >= start, ServerMetrics.collected_at < end)
+                .order_by(ServerMetrics.server_id, ServerMetrics.collected_at)
+                .execution_options(yield_per=EXPORT_CHUNK_ROWS)
+            )
+            if server_id is not None:
+                stmt = stmt.where(ServerMetrics.server_id == server_id)
+
+            result = await db.stream(stmt)
+            async for rows in result.partitions():
+                yield encode(rows)
+            return
+
+        server_ids = [server_id] if server_id is not None else (
+            await db.execute(select(Server.id).order_by(Server.id))
+        ).scalars().all()
+        for sid in server_ids:
+            async for rows in _server_rows_with_chunks(db, sid, start, end):
+                yield encode((sid, *row) for row in rows)
+
+
+async def _server_rows_with_chunks(db: AsyncSession, server_id: int, start: datetime, end: datetime) -> AsyncIterator[list]:
+    """
+    (collected_at, *METRIC_FIELDS) rows of one server in [start, end) in time order,
+    one chunk window at a time: each decoded chunk is merged with the raw rows of
+    its window (late samples not packed yet), the raw ranges between chunks are
+    streamed from a server-side cursor.
+    """
+    columns = [getattr(ServerMetrics, column) for column in EXPORT_COLUMNS[1:]]
+
+    def raw_rows(window_start: datetime, window_end: datetime):
+        return (
+            select(*columns)
+            .where(
+                ServerMetrics.server_id == server_id,
+                ServerMetrics.collected_at >= window_start,
+                ServerMetrics.collected_at < window_end,
+            )
+            .order_by(ServerMetrics.collected_at)
+        )
+
+    windows = (
+        await db.execute(
+            select(ServerMetricsChunk.chunk_start, ServerMetricsChunk.chunk_end)
+            .where(
+                ServerMetricsChunk.server_id == server_id,
+                ServerMetricsChunk.chunk_end > start,
+                ServerMetricsChunk.chunk_start < end,
+            )
+            .order_by(ServerMetricsChunk.chunk_start)
+        )
+    ).all()
+
+    cursor = start
+    for chunk_start, chunk_end in [*windows, (end, end)]:  # the sentinel flushes the raw tail
+        window_start = max(chunk_start, start)
+        if cursor < window_start:
+            result = await db.stream(raw_rows(cursor, window_start).execution_options(yield_per=EXPORT_CHUNK_ROWS))
+            async for rows in result.partitions():
+                yield rows
+        if window_start >= end:
+            break
+
+        window_end = min(chunk_end, end)
+        raw = (await db.execute(raw_rows(window_start, window_end))).all()
+        rows = sorted(
+            await read_chunk_rows(db, server_id, window_start, window_end) + [tuple(row) for row in raw],
+            key=lambda row: row[0],
+        )
+        for i in range(0, len(rows), EXPORT_CHUNK_ROWS):
+            yield rows[i:i + EXPORT_CHUNK_ROWS]
+        cursor = window_end
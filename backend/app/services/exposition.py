@@ -0,0 +1,177 @@
+"""
+Prometheus / OpenMetrics exposition of fleet state, rendered from memory
+"""
+import time
+from datetime import datetime
+
+from app.config import settings
+from app.services.admission import ingest_limiter
+from app.services.alerts import alert_engine
+from app.services.anomaly import anomaly_detector
+from app.services.events import event_hub
+from app.services.ingest import ingest_queue
+from app.services.latest import latest_metrics
+from app.services.token_cache import agent_token_cache
+
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+OPENMETRICS_CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+EPOCH = datetime(1970, 1, 1)
+
+# Host metrics: field -> (metric name, help, multiplier to base units)
+HOST_METRICS = {
+    "cpu_percent": ("vps_cpu_usage_percent", "CPU usage", 1),
+    "memory_percent": ("vps_memory_usage_percent", "Memory usage", 1),
+    "memory_used_mb": ("vps_memory_used_bytes", "Memory used", 1024 ** 2),
+    "memory_total_mb": ("vps_memory_total_bytes", "Memory total", 1024 ** 2),
+    "disk_percent": ("vps_disk_usage_percent", "Disk usage", 1),
+    "disk_used_gb": ("vps_disk_used_bytes", "Disk used", 1024 ** 3),
+    "disk_total_gb": ("vps_disk_total_bytes", "Disk total", 1024 ** 3),
+    "uptime_seconds": ("vps_uptime_seconds", "Host uptime", 1),
+    "load_avg_1": ("vps_load1", "1 minute load average", 1),
+    "load_avg_5": ("vps_load5", "5 minute load average", 1),
+    "load_avg_15": ("vps_load15", "15 minute load average", 1),
+}
+
+# Backend internals: (metric name, type, help, value getter)
+INTERNAL_METRICS = (
+    ("vps_ingest_queue_depth", "gauge", "Rows waiting in the write-behind queue", lambda: ingest_queue.depth),
+    ("vps_ingest_enqueued", "counter", "Rows queued for writing", lambda: ingest_queue.enqueued_total),
+    ("vps_ingest_flushed", "counter", "Rows written to the database", lambda: ingest_queue.flushed_total),
+    ("vps_ingest_dropped", "counter", "Rows rejected because the queue was full", lambda: ingest_queue.dropped_total),
+    ("vps_ingest_flush_errors", "counter", "Failed queue flushes", lambda: ingest_queue.flush_errors),
+    ("vps_ingest_inflight", "gauge", "Submit requests being processed", lambda: ingest_limiter.inflight),
+    ("vps_ingest_rate_limited", "counter", "Submits rejected by per-token rate limits", lambda: ingest_limiter.rejected_rate),
+    ("vps_ingest_overloaded", "counter", "Submits rejected by global limits",
+     lambda: ingest_limiter.rejected_inflight + ingest_limiter.rejected_queue),
+    ("vps_agent_token_cache_misses", "counter", "Agent token lookups that hit the database", lambda: agent_token_cache.misses),
+    ("vps_event_subscriptions", "gauge", "Open live event streams", lambda: event_hub.subscriber_count),
+    ("vps_alerts_firing", "gauge", "Alert rule/server pairs currently firing",
+     lambda: alert_engine.stats()["firing"]),
+    ("vps_alerts_fired", "counter", "Alerts fired", lambda: alert_engine.fired_total),
+    ("vps_anomalies_active", "gauge", "Metrics currently flagged as anomalous", lambda: anomaly_detector.stats()["active"]),
+    ("vps_anomalies", "counter", "Anomalies detected", lambda: anomaly_detector.anomalies_total),
+)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_value(value) -> str:
+    if isinstance(value, int):
+        return str(value)
+    return repr(float(value))
+
+
+def _timestamp(ts: datetime) -> float:
+    return (ts - EPOCH).total_seconds()
+
+
+class PrometheusExporter:
+    """
+    Renders /metrics for Prometheus scrapes without touching the database.
+    Server names are handed over by the probe scheduler once per cycle and ping
+    results as they are stored, host metrics come from the latest-sample cache.
+    The rendered text is cached for cache_seconds, so concurrent or frequent
+    scrapes cost a dict lookup.
+    """
+
+    def __init__(self, cache_seconds: float):
+        self.cache_seconds = cache_seconds
+        self._servers: dict[int, tuple[str, str, int | None, datetime | None]] = {}  # name, status, last_ping, last_check
+        self._cache: dict[bool, tuple[float, bytes]] = {}  # openmetrics -> (rendered_at, body)
+
+        # Stats
+        self.scrapes = 0
+        self.renders = 0
+        self.last_render_seconds = 0.0
+
+    def update_servers(self, servers) -> None:
+        """Replace the server registry (all Server rows)"""
+        self._servers = {
+            server.id: (server.name, server.status, server.last_ping, server.last_check)
+            for server in servers
+        }
+
+    def update_status(self, server_id: int, status: str, last_ping: int | None, last_check: datetime | None) -> None:
+        """Update one server's ping result (servers not in the registry yet are skipped)"""
+        current = self._servers.get(server_id)
+        if current is not None:
+            self._servers[server_id] = (current[0], status, last_ping, last_check)
+
+    def render(self, openmetrics: bool = False) -> bytes:
+        """Exposition text, re-rendered at most every cache_seconds"""
+        self.scrapes += 1
+        now = time.monotonic()
+        cached = self._cache.get(openmetrics)
+        if cached is not None and now - cached[0] < self.cache_seconds:
+            return cached[1]
+
+        body = self._render(openmetrics).encode()
+        self._cache[openmetrics] = (now, body)
+        self.renders += 1
+        self.last_render_seconds = time.monotonic() - now
+        return body
+
+    def _render(self, openmetrics: bool) -> str:
+        lines = []
+
+        def family(name: str, kind: str, help_text: str) -> str:
+            """Write HELP/TYPE lines, returns the sample name"""
+            sample = f"{name}_total" if kind == "counter" else name
+            declared = name if openmetrics else sample
+            lines.append(f"# HELP {declared} {help_text}")
+            lines.append(f"# TYPE {declared} {kind}")
+            return sample
+
+        servers = sorted(self._servers.items())
+        labels = {server_id: f'server_id="{server_id}",server="{_escape(name)}"' for server_id, (name, *_) in servers}
+
+        sample = family("vps_server_up", "gauge", "Whether the last ping succeeded (1 online, 0 offline)")
+        for server_id, (_, status, _, _) in servers:
+            if status in ("online", "offline"):
+                lines.append(f"{sample}{{{labels[server_id]}}} {int(status == 'online')}")
+
+        sample = family("vps_server_ping_latency_seconds", "gauge", "Latency of the last successful ping")
+        for server_id, (_, _, last_ping, _) in servers:
+            if last_ping is not None:
+                lines.append(f"{sample}{{{labels[server_id]}}} {_format_value(last_ping / 1000)}")
+
+        sample = family("vps_server_last_check_timestamp_seconds", "gauge", "Time of the last ping")
+        for server_id, (_, _, _, last_check) in servers:
+            if last_check is not None:
+                lines.append(f"{sample}{{{labels[server_id]}}} {_format_value(_timestamp(last_check))}")
+
+        # Host metrics of servers in the registry (labels need the name)
+        rows = sorted((server_id, row) for server_id, row in latest_metrics.items() if server_id in labels)
+        sample = family("vps_metrics_timestamp_seconds", "gauge", "Collection time of the latest agent sample")
+        for server_id, row in rows:
+            lines.append(f"{sample}{{{labels[server_id]}}} {_format_value(_timestamp(row['collected_at']))}")
+        for field, (name, help_text, multiplier) in HOST_METRICS.items():
+            sample = family(name, "gauge", help_text)
+            for server_id, row in rows:
+                value = row.get(field)
+                if value is not None:
+                    lines.append(f"{sample}{{{labels[server_id]}}} {_format_value(value * multiplier)}")
+
+        for name, kind, help_text, getter in INTERNAL_METRICS:
+            sample = family(name, kind, help_text)
+            lines.append(f"{sample} {_format_value(getter())}")
+
+        if openmetrics:
+            lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def stats(self) -> dict:
+        return {
+            "servers": len(self._servers),
+            "scrapes": self.scrapes,
+            "renders": self.renders,
+            "cache_seconds": self.cache_seconds,
+            "last_render_seconds": round(self.last_render_seconds, 5),
+        }
+
+
+prometheus_exporter = PrometheusExporter(cache_seconds=settings.prometheus_cache_seconds)
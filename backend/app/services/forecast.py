@@ -0,0 +1,219 @@
+"""
+Disk exhaustion forecast - robust linear trend of disk usage for the whole fleet at once
+"""
+import asyncio
+import time
+import warnings
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import Float, cast, func, select
+
+from app.config import settings
+from app.database import async_session
+from app.models import ServerMetricsRollup
+
+
+# Huber loss tuning constant (95% efficiency for normal residuals)
+HUBER_C = 1.345
+
+# Reweighting iterations of the robust fit
+IRLS_ITERATIONS = 10
+
+# Slower growth is treated as flat (no exhaustion date)
+MIN_GROWTH_GB_PER_DAY = 0.01
+
+
+def huber_trend(x: np.ndarray, y: np.ndarray, mask: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Robust (Huber, IRLS) linear fit y = intercept + slope * x of every row at once.
+    x, y: (series, points) padded matrices, mask marks real points.
+    Returns (slope, intercept) per row, NaN for rows that can't be fitted.
+    """
+    x = np.where(mask, x, 0.0)
+    y = np.where(mask, y, 0.0)
+    weights = mask.astype(np.float64)
+
+    with np.errstate(invalid="ignore", divide="ignore"), warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN residuals of rows that can't be fitted
+        limit = None
+        for _ in range(IRLS_ITERATIONS):
+            # Weighted least squares, closed form per row
+            sw = weights.sum(axis=1)
+            sx = (weights * x).sum(axis=1)
+            sy = (weights * y).sum(axis=1)
+            sxx = (weights * x * x).sum(axis=1)
+            sxy = (weights * x * y).sum(axis=1)
+            denominator = sw * sxx - sx * sx
+            slope = (sw * sxy - sx * sy) / denominator
+            intercept = (sy - slope * sx) / sw
+
+            # Downweight points with large residuals. Residual scale (MAD of each row)
+            # is estimated once from the least squares fit and kept fixed.
+            residuals = np.abs(y - (intercept[:, None] + slope[:, None] * x))
+            if limit is None:
+                scale = 1.4826 * np.nanmedian(np.where(mask, residuals, np.nan), axis=1)
+                limit = HUBER_C * np.maximum(scale, 1e-9)[:, None]
+            weights = np.where(mask, np.minimum(1.0, limit / np.maximum(residuals, 1e-12)), 0.0)
+
+    return slope, intercept
+
+
+class DiskForecaster:
+    """
+    Background job that projects when each server runs out of disk.
+    Loads hourly rollups of the whole fleet in one query, fits all trends as
+    one NumPy batch and keeps the latest forecast per server in memory.
+    """
+
+    def __init__(self, resolution: int, window_hours: int, min_points: int, interval: float):
+        self.resolution = resolution
+        self.window_hours = window_hours
+        self.min_points = min_points
+        self.interval = interval
+        self._forecasts: dict[int, dict] = {}
+        self._task: asyncio.Task | None = None
+
+        # Stats
+        self.runs = 0
+        self.errors = 0
+        self.last_run_at: datetime | None = None
+        self.last_run_seconds = 0.0
+        self.last_fit_seconds = 0.0
+        self.last_points = 0
+
+    async def run_once(self) -> dict:
+        """Refit every server's disk trend"""
+        start_time = time.perf_counter()
+        now = datetime.utcnow()
+
+        async with async_session() as db:
+            result = await db.execute(
+                select(
+                    ServerMetricsRollup.server_id,
+                    cast(func.extract("epoch", ServerMetricsRollup.bucket_start), Float),
+                    ServerMetricsRollup.disk_used_gb_avg,
+                    ServerMetricsRollup.disk_total_gb_max,
+                )
+                .where(
+                    ServerMetricsRollup.resolution_seconds == self.resolution,
+                    ServerMetricsRollup.bucket_start >= now - timedelta(hours=self.window_hours),
+                )
+                .order_by(ServerMetricsRollup.server_id, ServerMetricsRollup.bucket_start)
+            )
+            rows = result.all()
+
+        fit_start = time.perf_counter()
+        self._forecasts = self.fit(rows, now) if rows else {}
+        self.last_fit_seconds = time.perf_counter() - fit_start
+
+        self.runs += 1
+        self.last_run_at = datetime.utcnow()
+        self.last_run_seconds = time.perf_counter() - start_time
+        self.last_points = len(rows)
+        return {"servers": len(self._forecasts), "points": len(rows), "seconds": round(self.last_run_seconds, 3)}
+
+    def fit(self, rows: list, now: datetime) -> dict[int, dict]:
+        """Forecasts from (server_id, bucket epoch seconds, used_gb, total_gb) rows sorted by server and time"""
+        data = np.array(rows, dtype=np.float64)
+        server_ids = data[:, 0].astype(np.int64)
+        hours = (data[:, 1] - (now - datetime(1970, 1, 1)).total_seconds()) / 3600  # <= 0, now = 0
+        used = data[:, 2]
+        total = data[:, 3]
+
+        # Scatter rows into a (servers, max points) matrix
+        servers, starts, counts = np.unique(server_ids, return_index=True, return_counts=True)
+        group = np.repeat(np.arange(len(servers)), counts)
+        column = np.arange(len(rows)) - starts[group]
+        shape = (len(servers), counts.max())
+
+        x = np.zeros(shape)
+        y = np.zeros(shape)
+        mask = np.zeros(shape, dtype=bool)
+        x[group, column] = hours
+        y[group, column] = used
+        mask[group, column] = True
+
+        slope, intercept = huber_trend(x, y, mask)  # GB per hour, GB at now
+
+        last = starts + counts - 1
+        current_used = used[last]
+        current_total = total[last]
+        fitted = (counts >= self.min_points) & np.isfinite(slope)
+        growing = fitted & (slope * 24 >= MIN_GROWTH_GB_PER_DAY)
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            hours_left = np.where(growing, (current_total - intercept) / slope, np.nan)
+        hours_left = np.maximum(hours_left, 0.0)
+
+        forecasts = {}
+        for i, server_id in enumerate(servers.tolist()):
+            days = float(hours_left[i]) / 24 if growing[i] else None
+            forecasts[server_id] = {
+                "server_id": server_id,
+                "disk_used_gb": round(float(current_used[i]), 2),
+                "disk_total_gb": round(float(current_total[i]), 2),
+                "growth_gb_per_day": round(float(slope[i]) * 24, 3) if fitted[i] else None,
+                "days_until_full": round(days, 1) if days is not None else None,
+                "full_at": now + timedelta(days=days) if days is not None else None,
+                "points": int(counts[i]),
+                "computed_at": now,
+            }
+        return forecasts
+
+    def forecasts(self, server_id: int | None = None, max_days: float | None = None) -> list[dict]:
+        """Latest forecasts, soonest exhaustion first (servers without growth last)"""
+        result = [
+            forecast
+            for forecast in self._forecasts.values()
+            if (server_id is None or forecast["server_id"] == server_id)
+            and (max_days is None or (forecast["days_until_full"] is not None and forecast["days_until_full"] <= max_days))
+        ]
+        result.sort(key=lambda f: (f["days_until_full"] is None, f["days_until_full"] or 0, f["server_id"]))
+        return result
+
+    async def run(self) -> None:
+        """Forecast loop"""
+        print(f"Starting disk forecast (window: {self.window_hours}h, interval: {self.interval}s)")
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                self.errors += 1
+                print(f"Disk forecast error: {e}")
+
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        """Start the background forecast job"""
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        """Cancel the background forecast job"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "servers": len(self._forecasts),
+            "runs": self.runs,
+            "errors": self.errors,
+            "last_run_at": self.last_run_at.isoformat() if self.last_run_at else None,
+            "last_run_seconds": round(self.last_run_seconds, 3),
+            "last_fit_seconds": round(self.last_fit_seconds, 4),
+            "last_points": self.last_points,
+        }
+
+
+disk_forecaster = DiskForecaster(
+    resolution=3600,
+    window_hours=settings.disk_forecast_window_hours,
+    min_points=settings.disk_forecast_min_points,
+    interval=settings.disk_forecast_interval_seconds,
+)
@@ -0,0 +1,222 @@
+"""
+Gorilla-style compression of metric series: delta-of-delta timestamps, XOR-encoded floats
+"""
+from datetime import datetime, timedelta
+
+import numpy as np
+
+
+# Chunk format version (first byte of every chunk)
+FORMAT_VERSION = 1
+
+EPOCH = datetime(1970, 1, 1)
+
+# Delta-of-delta buckets: (prefix, prefix bits, value bits), tried in order
+DOD_BUCKETS = (
+    (0b10, 2, 7),
+    (0b110, 3, 9),
+    (0b1110, 4, 12),
+    (0b11110, 5, 32),
+)
+DOD_FALLBACK = (0b11111, 5, 64)
+
+
+class BitWriter:
+    """Append-only bit stream (MSB first)"""
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._acc = 0
+        self._bits = 0
+
+    def write(self, value: int, nbits: int) -> None:
+        self._acc = (self._acc << nbits) | (value & ((1 << nbits) - 1))
+        self._bits += nbits
+        while self._bits >= 8:
+            self._bits -= 8
+            self._buffer.append((self._acc >> self._bits) & 0xFF)
+        self._acc &= (1 << self._bits) - 1
+
+    def getvalue(self) -> bytes:
+        if self._bits:
+            return bytes(self._buffer) + bytes([(self._acc << (8 - self._bits)) & 0xFF])
+        return bytes(self._buffer)
+
+
+class BitReader:
+    """Reads a BitWriter stream"""
+
+    def __init__(self, data: bytes):
+        self._data = data
+        self._pos = 0
+
+    def read(self, nbits: int) -> int:
+        if nbits == 0:
+            return 0
+        start = self._pos >> 3
+        end = (self._pos + nbits + 7) >> 3
+        window = int.from_bytes(self._data[start:end], "big")
+        shift = (end << 3) - self._pos - nbits
+        self._pos += nbits
+        return (window >> shift) & ((1 << nbits) - 1)
+
+
+def to_millis(ts: datetime) -> int:
+    """Naive UTC datetime -> epoch milliseconds"""
+    return (ts - EPOCH) // timedelta(milliseconds=1)
+
+
+def from_millis(ms: int) -> datetime:
+    return EPOCH + timedelta(milliseconds=ms)
+
+
+def _write_signed(writer: BitWriter, value: int, nbits: int) -> None:
+    writer.write(value & ((1 << nbits) - 1), nbits)
+
+
+def _read_signed(reader: BitReader, nbits: int) -> int:
+    value = reader.read(nbits)
+    return value - (1 << nbits) if value >> (nbits - 1) else value
+
+
+def _encode_timestamps(writer: BitWriter, timestamps: list[int]) -> None:
+    writer.write(timestamps[0], 64)
+    prev, prev_delta = timestamps[0], 0
+    for ts in timestamps[1:]:
+        delta = ts - prev
+        dod = delta - prev_delta
+        prev, prev_delta = ts, delta
+
+        if dod == 0:
+            writer.write(0, 1)
+            continue
+        for prefix, prefix_bits, value_bits in DOD_BUCKETS:
+            if -(1 << (value_bits - 1)) <= dod < (1 << (value_bits - 1)):
+                break
+        else:
+            prefix, prefix_bits, value_bits = DOD_FALLBACK
+        writer.write(prefix, prefix_bits)
+        _write_signed(writer, dod, value_bits)
+
+
+def _decode_timestamps(reader: BitReader, count: int) -> list[int]:
+    timestamps = [reader.read(64)]
+    prev, prev_delta = timestamps[0], 0
+    for _ in range(count - 1):
+        # Bucket = number of leading ones of the prefix (0 -> dod is 0)
+        ones = 0
+        while ones < DOD_FALLBACK[1] and reader.read(1):
+            ones += 1
+        if ones == 0:
+            dod = 0
+        else:
+            value_bits = DOD_BUCKETS[ones - 1][2] if ones <= len(DOD_BUCKETS) else DOD_FALLBACK[2]
+            dod = _read_signed(reader, value_bits)
+        prev_delta += dod
+        prev += prev_delta
+        timestamps.append(prev)
+    return timestamps
+
+
+def _encode_floats(writer: BitWriter, values: list[int]) -> None:
+    """XOR encoding of float64 bit patterns"""
+    prev = values[0]
+    writer.write(prev, 64)
+    prev_lead = prev_trail = -1
+    for value in values[1:]:
+        xor = prev ^ value
+        prev = value
+        if xor == 0:
+            writer.write(0, 1)
+            continue
+
+        lead = min(64 - xor.bit_length(), 31)
+        trail = (xor & -xor).bit_length() - 1
+        if prev_lead >= 0 and lead >= prev_lead and trail >= prev_trail:
+            # Meaningful bits fit into the previous window
+            writer.write(0b10, 2)
+            writer.write(xor >> prev_trail, 64 - prev_lead - prev_trail)
+        else:
+            meaningful = 64 - lead - trail
+            writer.write(0b11, 2)
+            writer.write(lead, 5)
+            writer.write(meaningful - 1, 6)
+            writer.write(xor >> trail, meaningful)
+            prev_lead, prev_trail = lead, trail
+
+
+def _decode_floats(reader: BitReader, count: int) -> list[int]:
+    prev = reader.read(64)
+    values = [prev]
+    lead = trail = 0
+    for _ in range(count - 1):
+        if reader.read(1):
+            if reader.read(1):
+                lead = reader.read(5)
+                meaningful = reader.read(6) + 1
+                trail = 64 - lead - meaningful
+            prev ^= reader.read(64 - lead - trail) << trail
+        values.append(prev)
+    return values
+
+
+def encode_chunk(timestamps: list[datetime], columns: list[list[float | None]]) -> bytes:
+    """
+    Pack a series (ascending timestamps, one list per column, None = missing).
+    Timestamps are stored with millisecond precision.
+    """
+    count = len(timestamps)
+    writer = BitWriter()
+    writer.write(FORMAT_VERSION, 8)
+    writer.write(count, 32)
+    writer.write(len(columns), 8)
+    if not count:
+        return writer.getvalue()
+
+    _encode_timestamps(writer, [to_millis(ts) for ts in timestamps])
+
+    for column in columns:
+        present = [value is not None for value in column]
+        has_nulls = not all(present)
+        writer.write(int(has_nulls), 1)
+        if has_nulls:
+            for flag in present:
+                writer.write(int(flag), 1)
+
+        values = [value for value in column if value is not None]
+        if values:
+            _encode_floats(writer, np.array(values, dtype=np.float64).view(np.uint64).tolist())
+
+    return writer.getvalue()
+
+
+def decode_chunk(data: bytes) -> tuple[list[datetime], list[list[float | None]]]:
+    """Unpack a chunk into (timestamps, columns)"""
+    reader = BitReader(data)
+    version = reader.read(8)
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported chunk format version: {version}")
+    count = reader.read(32)
+    column_count = reader.read(8)
+    if not count:
+        return [], [[] for _ in range(column_count)]
+
+    timestamps = [from_millis(ms) for ms in _decode_timestamps(reader, count)]
+
+    columns = []
+    for _ in range(column_count):
+        has_nulls = reader.read(1)
+        present = [bool(reader.read(1)) for _ in range(count)] if has_nulls else None
+        present_count = sum(present) if present is not None else count
+
+        values = []
+        if present_count:
+            values = np.array(_decode_floats(reader, present_count), dtype=np.uint64).view(np.float64).tolist()
+
+        if present is None:
+            columns.append(values)
+        else:
+            it = iter(values)
+            columns.append([next(it) if flag else None for flag in present])
+
+    return timestamps, columns
@@ -0,0 +1,121 @@
+"""
+Fleet heatmap - one metric for every server in time buckets, one SQL query
+"""
+import math
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import Float, Integer, cast, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Folder, Server, ServerMetrics, ServerMetricsRollup
+from app.services.rollups import RAW_RESOLUTION, bucket_expression, floor_to_resolution
+
+
+def _bucketed_query(metric: str, aggregate: str, resolution: int, bucket_seconds: int, start: datetime):
+    """(server_id, bucket, value) per server and bucket, from raw samples or a rollup tier"""
+    if resolution == RAW_RESOLUTION:
+        bucket = bucket_expression(ServerMetrics.collected_at, bucket_seconds)
+        column = getattr(ServerMetrics, metric)
+        value = {"avg": func.avg, "min": func.min, "max": func.max}[aggregate](column)
+        return (
+            select(ServerMetrics.server_id, bucket.label("bucket"), value.label("value"))
+            .where(ServerMetrics.collected_at >= start)
+            .group_by(ServerMetrics.server_id, bucket)
+        )
+
+    bucket = bucket_expression(ServerMetricsRollup.bucket_start, bucket_seconds)
+    if aggregate == "avg":
+        # Rollup averages weighted by their sample counts (buckets without the metric don't count)
+        column = getattr(ServerMetricsRollup, f"{metric}_avg")
+        value = (
+            func.sum(column * ServerMetricsRollup.sample_count)
+            / func.sum(ServerMetricsRollup.sample_count).filter(column.is_not(None))
+        )
+    else:
+        column = getattr(ServerMetricsRollup, f"{metric}_{aggregate}")
+        value = {"min": func.min, "max": func.max}[aggregate](column)
+    return (
+        select(ServerMetricsRollup.server_id, bucket.label("bucket"), value.label("value"))
+        .where(
+            ServerMetricsRollup.resolution_seconds == resolution,
+            ServerMetricsRollup.bucket_start >= start,
+        )
+        .group_by(ServerMetricsRollup.server_id, bucket)
+    )
+
+
+async def fleet_heatmap(
+    db: AsyncSession,
+    metric: str,
+    aggregate: str,
+    hours: int,
+    bucket_seconds: int,
+    resolution: int,
+    folder_id: int | None = None,
+) -> dict:
+    """
+    Servers x buckets matrix of a metric, rows grouped by folder (folder order, then server id).
+    resolution is the source tier (RAW_RESOLUTION or a rollup resolution dividing bucket_seconds).
+    """
+    now = datetime.utcnow()
+    start = floor_to_resolution(now - timedelta(hours=hours), bucket_seconds)
+    bucket_count = math.ceil((now - start).total_seconds() / bucket_seconds)
+
+    servers_query = (
+        select(Server.id, Server.name, Folder.id, Folder.name, Folder.color)
+        .join(Folder, Server.folder_id == Folder.id)
+        .order_by(Folder.position, Folder.id, Server.id)
+    )
+    stmt = _bucketed_query(metric, aggregate, resolution, bucket_seconds, start)
+    if folder_id is not None:
+        servers_query = servers_query.where(Folder.id == folder_id)
+        in_folder = select(Server.id).where(Server.folder_id == folder_id)
+        server_column = ServerMetrics.server_id if resolution == RAW_RESOLUTION else ServerMetricsRollup.server_id
+        stmt = stmt.where(server_column.in_(in_folder))
+
+    # One row per server with its bucket indexes and values as arrays (cheap to decode)
+    cells = stmt.subquery()
+    bucket_index = cast(
+        func.floor(func.extract("epoch", cells.c.bucket - start) / bucket_seconds), Integer
+    )
+    per_server = select(
+        cells.c.server_id,
+        func.array_agg(bucket_index),
+        func.array_agg(cast(cells.c.value, Float)),
+    ).group_by(cells.c.server_id)
+
+    servers = (await db.execute(servers_query)).all()
+    result = await db.execute(per_server)
+
+    # Scatter cells into the matrix
+    rows = {server[0]: i for i, server in enumerate(servers)}
+    values = np.full((len(servers), bucket_count), np.nan)
+    for server_id, columns, cell_values in result:
+        row = rows.get(server_id)
+        if row is None:
+            continue
+        columns = np.array(columns, dtype=np.int64)
+        cell_values = np.array(cell_values, dtype=np.float64)  # None -> nan
+        keep = (columns >= 0) & (columns < bucket_count)
+        values[row, columns[keep]] = cell_values[keep]
+
+    folders = []
+    for i, (_, _, folder_id_, folder_name, folder_color) in enumerate(servers):
+        if not folders or folders[-1]["id"] != folder_id_:
+            folders.append({"id": folder_id_, "name": folder_name, "color": folder_color, "row_offset": i, "row_count": 0})
+        folders[-1]["row_count"] += 1
+
+    start_epoch = (start - datetime(1970, 1, 1)).total_seconds()
+    rounded = np.round(values, 2)
+    return {
+        "metric": metric,
+        "aggregate": aggregate,
+        "bucket_seconds": bucket_seconds,
+        "source_resolution_seconds": resolution,
+        "timestamps": [start_epoch + i * bucket_seconds for i in range(bucket_count)],
+        "server_ids": [server[0] for server in servers],
+        "server_names": [server[1] for server in servers],
+        "folders": folders,
+        "values": [[None if math.isnan(v) else v for v in row] for row in rounded.tolist()],
+    }
@@ -0,0 +1,110 @@
+"""
+Metrics history series - column-projected reads of raw samples and rollups
+"""
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import Integer, cast, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import ServerMetrics, ServerMetricsRollup
+from app.services.compression import read_chunk_rows
+from app.services.downsample import lttb_indices
+from app.services.metrics import METRIC_FIELDS
+from app.services.rollups import INTEGER_FIELDS, RAW_RESOLUTION
+
+
+# Column order of a history series
+SERIES_COLUMNS = ("collected_at", "sample_count", *METRIC_FIELDS)
+
+
+async def fetch_series(db: AsyncSession, server_id: int, resolution: int, since: datetime) -> dict[str, list]:
+    """
+    Load a server's history as columns (oldest first) without hydrating ORM objects.
+    Raw samples for RAW_RESOLUTION (including compressed chunks), rollup averages otherwise
+    (sample_count = samples per bucket).
+    """
+    if resolution == RAW_RESOLUTION:
+        stmt = (
+            select(ServerMetrics.collected_at, *(getattr(ServerMetrics, f) for f in METRIC_FIELDS))
+            .where(ServerMetrics.server_id == server_id, ServerMetrics.collected_at >= since)
+            .order_by(ServerMetrics.collected_at)
+        )
+    else:
+        averages = []
+        for field in METRIC_FIELDS:
+            column = getattr(ServerMetricsRollup, f"{field}_avg")
+            averages.append(cast(func.round(column), Integer) if field in INTEGER_FIELDS else column)
+
+        stmt = (
+            select(ServerMetricsRollup.bucket_start, ServerMetricsRollup.sample_count, *averages)
+            .where(
+                ServerMetricsRollup.server_id == server_id,
+                ServerMetricsRollup.resolution_seconds == resolution,
+                ServerMetricsRollup.bucket_start >= since,
+            )
+            .order_by(ServerMetricsRollup.bucket_start)
+        )
+
+    rows = (await db.execute(stmt)).all()
+    if resolution == RAW_RESOLUTION:
+        chunk_rows = await read_chunk_rows(db, server_id, since)
+        if chunk_rows:
+            rows = sorted(chunk_rows + [tuple(row) for row in rows], key=lambda row: row[0])
+    if not rows:
+        return {name: [] for name in SERIES_COLUMNS}
+
+    columns = [list(column) for column in zip(*rows)]
+    if resolution == RAW_RESOLUTION:
+        columns.insert(1, [1] * len(rows))  # every raw sample counts once
+    return dict(zip(SERIES_COLUMNS, columns))
+
+
+def epoch_seconds(timestamps: list[datetime]) -> np.ndarray:
+    """Naive UTC datetimes -> float epoch seconds"""
+    return np.array(timestamps, dtype="datetime64[us]").astype(np.int64) / 1e6
+
+
+def weighted_average(series: dict[str, list], field: str) -> float | None:
+    """Average of a field, rollup buckets weighted by their sample count"""
+    if not series["collected_at"]:
+        return None
+    values = np.array(series[field], dtype=np.float64)
+    weights = np.array(series["sample_count"], dtype=np.float64)
+    mask = ~np.isnan(values)
+    if not mask.any():
+        return None
+    return float(np.average(values[mask], weights=weights[mask]))
+
+
+def series_columns(series: dict[str, list]) -> dict:
+    """Series as one epoch-seconds timestamp array plus one array per metric (oldest first)"""
+    return {
+        "timestamps": epoch_seconds(series["collected_at"]).tolist(),
+        "sample_count": series["sample_count"],
+        "metrics": {field: series[field] for field in METRIC_FIELDS},
+    }
+
+
+def pack_series(series: dict[str, list]) -> bytes:
+    """
+    Packed little-endian binary series:
+    uint32 epoch seconds[n], then float32[n] per metric in METRIC_FIELDS order (NaN = missing).
+    """
+    parts = [epoch_seconds(series["collected_at"]).astype("<u4").tobytes()]
+    for field in METRIC_FIELDS:
+        parts.append(np.array(series[field], dtype=np.float64).astype("<f4").tobytes())
+    return b"".join(parts)
+
+
+def downsample_series(series: dict[str, list], max_points: int, metric: str) -> dict[str, list]:
+    """Reduce a series to max_points with LTTB on one metric, keeping rows aligned"""
+    if len(series["collected_at"]) <= max_points:
+        return series
+
+    indices = lttb_indices(
+        epoch_seconds(series["collected_at"]),
+        np.array(series[metric], dtype=np.float64),
+        max_points,
+    )
+    return {name: [values[i] for i in indices] for name, values in series.items()}
@@ -0,0 +1,182 @@
+"""
+Write-behind ingestion queue for agent metrics
+"""
+import asyncio
+import time
+from datetime import datetime
+
+from app.config import settings
+from app.database import async_session
+from app.services.alerts import alert_engine
+from app.services.anomaly import anomaly_detector
+from app.services.events import event_hub
+from app.services.latest import latest_metrics
+from app.services.metrics import backfill_mark, insert_metrics, mark_servers_online
+
+
+class MetricsIngestQueue:
+    """
+    Bounded in-process queue of metrics rows.
+    Submit handlers enqueue rows and return immediately, a background flusher
+    writes them in bulk when the queue reaches flush_max_rows or every
+    flush_interval seconds, whichever comes first.
+    """
+
+    def __init__(self, max_size: int, flush_max_rows: int, flush_interval: float):
+        self.flush_max_rows = flush_max_rows
+        self.flush_interval = flush_interval
+        self._queue: asyncio.Queue[dict] = asyncio.Queue(maxsize=max_size)
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._task: asyncio.Task | None = None
+
+        # Counters
+        self.enqueued_total = 0
+        self.flushed_total = 0
+        self.dropped_total = 0
+        self.flush_count = 0
+        self.flush_errors = 0
+        self.last_flush_rows = 0
+        self.last_flush_seconds = 0.0
+        self.max_flush_seconds = 0.0
+        self._flush_seconds_total = 0.0
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def enqueue(self, row: dict) -> bool:
+        """Add a row to the queue. Returns False (and counts a drop) if the queue is full."""
+        try:
+            self._queue.put_nowait(row)
+        except asyncio.QueueFull:
+            self.dropped_total += 1
+            return False
+
+        self.enqueued_total += 1
+        if self._queue.qsize() >= self.flush_max_rows:
+            self._wakeup.set()
+        return True
+
+    async def run(self) -> None:
+        """Flusher loop - runs until stop() is called, then drains the queue"""
+        print(
+            f"Starting metrics flusher (max rows: {self.flush_max_rows}, "
+            f"interval: {self.flush_interval}s)"
+        )
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            await self._flush_pending()
+
+            if self._stopping:
+                break
+
+    def start(self) -> None:
+        """Start the background flusher"""
+        self._stopping = False
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        """Stop the flusher and wait until everything queued is written"""
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        await self._task
+        self._task = None
+
+    async def _flush_pending(self) -> None:
+        """Drain the queue in chunks of flush_max_rows"""
+        while not self._queue.empty():
+            rows = []
+            while len(rows) < self.flush_max_rows and not self._queue.empty():
+                rows.append(self._queue.get_nowait())
+            await self._flush(rows)
+
+    async def _write(self, rows: list[dict], now: datetime) -> None:
+        """Insert rows and mark their servers online in a single transaction"""
+        async with async_session() as db:
+            await insert_metrics(db, rows)
+            await mark_servers_online(db, {row["server_id"] for row in rows}, now)
+            await db.commit()
+        backfill_mark.note(rows)
+
+    async def _flush(self, rows: list[dict]) -> None:
+        """
+        Write one chunk of rows in a single transaction.
+        If it fails, the rows are retried per server so that one bad server
+        (e.g. deleted while its rows were queued) only loses its own rows.
+        """
+        start_time = time.perf_counter()
+        now = datetime.utcnow()
+
+        try:
+            await self._write(rows, now)
+            written = len(rows)
+        except Exception as e:
+            print(f"Metrics flush error ({len(rows)} rows, retrying per server): {e}")
+            self.flush_errors += 1
+            by_server: dict[int, list[dict]] = {}
+            for row in rows:
+                by_server.setdefault(row["server_id"], []).append(row)
+
+            written = 0
+            for server_id, server_rows in by_server.items():
+                try:
+                    await self._write(server_rows, now)
+                except Exception as e:
+                    print(f"Metrics flush error (server {server_id}, {len(server_rows)} rows dropped): {e}")
+                    self.dropped_total += len(server_rows)
+                    continue
+                written += len(server_rows)
+
+        elapsed = time.perf_counter() - start_time
+        self.flush_count += 1
+        self.flushed_total += written
+        self.last_flush_rows = written
+        self.last_flush_seconds = elapsed
+        self.max_flush_seconds = max(self.max_flush_seconds, elapsed)
+        self._flush_seconds_total += elapsed
+
+    def stats(self) -> dict:
+        """Queue depth, throughput and flush latency counters"""
+        return {
+            "queue_depth": self.depth,
+            "queue_capacity": self._queue.maxsize,
+            "enqueued_total": self.enqueued_total,
+            "flushed_total": self.flushed_total,
+            "dropped_total": self.dropped_total,
+            "flush_count": self.flush_count,
+            "flush_errors": self.flush_errors,
+            "last_flush_rows": self.last_flush_rows,
+            "last_flush_seconds": round(self.last_flush_seconds, 4),
+            "avg_flush_seconds": round(self._flush_seconds_total / self.flush_count, 4) if self.flush_count else 0.0,
+            "max_flush_seconds": round(self.max_flush_seconds, 4),
+        }
+
+
+def publish_ingested(rows: list[dict]) -> None:
+    """
+    Hand accepted metrics rows to the in-memory consumers: latest-sample map,
+    live events (latest row per server), alert rules and anomaly baselines.
+    Rows are applied oldest first, as the stateful consumers expect.
+    """
+    rows = sorted(rows, key=lambda row: row["collected_at"])
+    latest_metrics.update_many(rows)
+    for server_id in {row["server_id"] for row in rows}:
+        event_hub.publish_metrics(latest_metrics.get(server_id))
+    for row in rows:
+        alert_engine.observe(row["server_id"], row, row["collected_at"])
+        anomaly_detector.observe(row)
+
+
+ingest_queue = MetricsIngestQueue(
+    max_size=settings.metrics_queue_max_size,
+    flush_max_rows=settings.metrics_flush_max_rows,
+    flush_interval=settings.metrics_flush_interval_seconds,
+)
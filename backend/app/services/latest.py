@@ -0,0 +1,94 @@
+"""
+In-memory "last sample per server" map
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+from app.config import settings
+from app.database import async_session
+from app.models import ServerMetrics
+from app.services.compression import read_latest_chunk_rows
+from app.services.metrics import METRIC_FIELDS
+
+
+# Fields returned by /metrics/current/all
+CURRENT_FIELDS = (
+    "cpu_percent",
+    "memory_percent",
+    "memory_used_mb",
+    "memory_total_mb",
+    "disk_percent",
+)
+
+
+class LatestMetricsCache:
+    """
+    Latest metrics row per server.
+    Updated on every ingest and warmed at startup with one DISTINCT ON query,
+    so the dashboard never needs a DB round trip for current values.
+    """
+
+    def __init__(self):
+        self._latest: dict[int, dict] = {}
+
+    def update(self, row: dict) -> None:
+        """Remember a metrics row if it is newer than the one we have"""
+        current = self._latest.get(row["server_id"])
+        if current is None or row["collected_at"] >= current["collected_at"]:
+            self._latest[row["server_id"]] = row
+
+    def update_many(self, rows: list[dict]) -> None:
+        for row in rows:
+            self.update(row)
+
+    def get(self, server_id: int) -> dict | None:
+        return self._latest.get(server_id)
+
+    def items(self):
+        return self._latest.items()
+
+    def remove(self, server_id: int) -> None:
+        self._latest.pop(server_id, None)
+
+    def clear(self) -> None:
+        self._latest.clear()
+
+    def current_all(self) -> dict[str, dict]:
+        """Latest metrics of all servers in /metrics/current/all format"""
+        result = {}
+        for server_id, row in self._latest.items():
+            current = {field: row[field] for field in CURRENT_FIELDS}
+            current["collected_at"] = row["collected_at"].isoformat()
+            result[str(server_id)] = current
+        return result
+
+    async def warm(self) -> int:
+        """
+        Load the latest sample of every server (from compressed chunks for servers
+        without recent raw samples). Returns number of servers loaded.
+        """
+        cutoff = datetime.utcnow() - timedelta(hours=settings.metrics_retention_hours)
+        columns = [getattr(ServerMetrics, field) for field in METRIC_FIELDS]
+
+        async with async_session() as db:
+            result = await db.execute(
+                select(ServerMetrics.server_id, ServerMetrics.collected_at, *columns)
+                .where(ServerMetrics.collected_at >= cutoff)
+                .distinct(ServerMetrics.server_id)
+                .order_by(ServerMetrics.server_id, ServerMetrics.collected_at.desc())
+            )
+            rows = [dict(row) for row in result.mappings().all()]
+            found = {row["server_id"] for row in rows}
+            for server_id, chunk_row in (await read_latest_chunk_rows(db, cutoff)).items():
+                if server_id not in found:
+                    rows.append({"server_id": server_id, **dict(zip(("collected_at", *METRIC_FIELDS), chunk_row))})
+
+        self.update_many(rows)
+        return len(rows)
+
+    def stats(self) -> dict:
+        return {"servers": len(self._latest)}
+
+
+latest_metrics = LatestMetricsCache()
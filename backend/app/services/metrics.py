@@ -0,0 +1,94 @@
+"""
+Metrics storage service - bulk writes of agent samples
+"""
+from datetime import datetime, timezone
+
+from sqlalchemy import insert, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Server, ServerMetrics
+
+
+# Numeric columns of ServerMetrics (everything except ids and timestamp)
+METRIC_FIELDS = (
+    "cpu_percent",
+    "memory_percent",
+    "memory_used_mb",
+    "memory_total_mb",
+    "disk_percent",
+    "disk_used_gb",
+    "disk_total_gb",
+    "uptime_seconds",
+    "load_avg_1",
+    "load_avg_5",
+    "load_avg_15",
+)
+
+# Rows per INSERT statement (13 bind params per row, Postgres allows 32767)
+INSERT_CHUNK_ROWS = 2000
+
+
+def to_naive_utc(ts: datetime) -> datetime:
+    """Timezone-aware datetime -> naive UTC (as stored in the DB), naive ones are kept"""
+    if ts.tzinfo is not None:
+        return ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts
+
+
+def build_metrics_row(server_id: int, sample, collected_at: datetime) -> dict:
+    """Build a server_metrics row from a validated MetricsSubmit-like sample"""
+    row = {field: getattr(sample, field) for field in METRIC_FIELDS}
+    row["server_id"] = server_id
+    row["collected_at"] = collected_at
+    return row
+
+
+async def insert_metrics(db: AsyncSession, rows: list[dict]) -> None:
+    """
+    Insert metrics rows with multi-row INSERT statements.
+    Does not commit - caller owns the transaction.
+    """
+    for start in range(0, len(rows), INSERT_CHUNK_ROWS):
+        chunk = rows[start:start + INSERT_CHUNK_ROWS]
+        await db.execute(insert(ServerMetrics.__table__).values(chunk))
+
+
+async def mark_servers_online(db: AsyncSession, server_ids: set[int], now: datetime) -> None:
+    """Mark servers that reported metrics as online with a single UPDATE"""
+    if not server_ids:
+        return
+
+    await db.execute(
+        update(Server)
+        .where(Server.id.in_(server_ids))
+        .values(status="online", last_check=now)
+    )
+
+
+class BackfillMark:
+    """
+    Earliest collected_at committed since the rollup job last took it.
+    Every write path notes its rows after commit, so rollups can re-aggregate
+    buckets that received late samples (batch backfill) and not only the newest ones.
+    """
+
+    def __init__(self):
+        self._oldest: datetime | None = None
+
+    def note(self, rows: list[dict]) -> None:
+        """Record committed rows"""
+        if rows:
+            self.restore(min(row["collected_at"] for row in rows))
+
+    def take(self) -> datetime | None:
+        """Earliest collected_at noted since the previous call (None if nothing was written)"""
+        oldest, self._oldest = self._oldest, None
+        return oldest
+
+    def restore(self, collected_at: datetime | None) -> None:
+        """Merge a collected_at back into the mark (e.g. after a failed rollup run)"""
+        if collected_at is not None and (self._oldest is None or collected_at < self._oldest):
+            self._oldest = collected_at
+
+
+backfill_mark = BackfillMark()
@@ -0,0 +1,143 @@
+"""
+Time partitions of the server_metrics table (Postgres declarative range partitioning)
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+PARENT_TABLE = "server_metrics"
+DEFAULT_PARTITION = "server_metrics_default"
+
+# Partition name suffix format per interval: server_metrics_p20260120 / server_metrics_p2026012013
+SUFFIX_FORMATS = {
+    "day": "%Y%m%d",
+    "hour": "%Y%m%d%H",
+}
+INTERVAL_DELTAS = {
+    "day": timedelta(days=1),
+    "hour": timedelta(hours=1),
+}
+
+
+def partition_start(ts: datetime, interval: str) -> datetime:
+    """Floor timestamp to the start of its partition"""
+    if interval == "hour":
+        return ts.replace(minute=0, second=0, microsecond=0)
+    return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def partition_name(start: datetime, interval: str) -> str:
+    return f"{PARENT_TABLE}_p{start.strftime(SUFFIX_FORMATS[interval])}"
+
+
+def parse_partition_name(name: str) -> tuple[datetime, datetime] | None:
+    """Get (start, end) bounds from a partition name, None for foreign tables"""
+    prefix = f"{PARENT_TABLE}_p"
+    if not name.startswith(prefix):
+        return None
+
+    suffix = name[len(prefix):]
+    for interval, fmt in SUFFIX_FORMATS.items():
+        try:
+            start = datetime.strptime(suffix, fmt)
+        except ValueError:
+            continue
+        return start, start + INTERVAL_DELTAS[interval]
+    return None
+
+
+async def is_partitioned(db: AsyncSession) -> bool:
+    """Check whether server_metrics is a partitioned table"""
+    result = await db.execute(
+        text("SELECT relkind::text FROM pg_class WHERE relname = :name"),
+        {"name": PARENT_TABLE},
+    )
+    return result.scalar_one_or_none() == "p"
+
+
+async def list_partitions(db: AsyncSession) -> dict[str, tuple[datetime, datetime]]:
+    """Get time partitions of server_metrics with their bounds (default partition excluded)"""
+    result = await db.execute(
+        text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = :name"
+        ),
+        {"name": PARENT_TABLE},
+    )
+    partitions = {}
+    for name in result.scalars():
+        bounds = parse_partition_name(name)
+        if bounds is not None:
+            partitions[name] = bounds
+    return partitions
+
+
+async def create_partition(db: AsyncSession, name: str, start: datetime, end: datetime) -> int:
+    """
+    Create the partition for [start, end).
+    Rows of that range already in the default partition would make
+    CREATE TABLE ... PARTITION OF fail, so in that case the partition is built
+    as a plain table, the rows are moved into it and it is attached afterwards.
+    Returns the number of rows moved. Does not commit.
+    """
+    bounds = f"FOR VALUES FROM ('{start.isoformat(sep=' ')}') TO ('{end.isoformat(sep=' ')}')"
+    in_range = {"start": start, "end": end}
+    result = await db.execute(
+        text(
+            f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} "
+            f"WHERE collected_at >= :start AND collected_at < :end)"
+        ),
+        in_range,
+    )
+    if not result.scalar_one():
+        await db.execute(text(f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {PARENT_TABLE} {bounds}"))
+        return 0
+
+    await db.execute(text(f"CREATE TABLE {name} (LIKE {PARENT_TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    result = await db.execute(
+        text(
+            f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} "
+            f"WHERE collected_at >= :start AND collected_at < :end RETURNING *) "
+            f"INSERT INTO {name} SELECT * FROM moved"
+        ),
+        in_range,
+    )
+    await db.execute(text(f"ALTER TABLE {PARENT_TABLE} ATTACH PARTITION {name} {bounds}"))
+    return result.rowcount
+
+
+async def ensure_partitions(db: AsyncSession, now: datetime, interval: str, ahead: int) -> list[str]:
+    """
+    Pre-create partitions from the current one up to `ahead` intervals into the future.
+    Ranges already covered by an existing partition (e.g. after switching interval) are skipped.
+    Returns names of created partitions. Does not commit.
+    """
+    existing = await list_partitions(db)
+    delta = INTERVAL_DELTAS[interval]
+    start = partition_start(now, interval)
+
+    created = []
+    for _ in range(ahead + 1):
+        end = start + delta
+        overlaps = any(s < end and start < e for s, e in existing.values())
+        if not overlaps:
+            name = partition_name(start, interval)
+            await create_partition(db, name, start, end)
+            existing[name] = (start, end)
+            created.append(name)
+        start = end
+    return created
+
+
+async def drop_expired_partitions(db: AsyncSession, cutoff: datetime) -> list[str]:
+    """Drop partitions whose whole range is older than cutoff. Does not commit."""
+    dropped = []
+    for name, (_, end) in sorted((await list_partitions(db)).items()):
+        if end <= cutoff:
+            await db.execute(text(f"DROP TABLE IF EXISTS {name}"))
+            dropped.append(name)
+    return dropped
@@ -2,15 +2,31 @@
 Server ping service using TCP connection
 """
 import asyncio
+import heapq
+import math
 import time
+from collections import deque
 from datetime import datetime
 
-from sqlalchemy import select
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 
 from app.database import async_session
-from app.models import Server
+from app.models import ProbeResult, Server
 from app.config import settings
+from app.services.alerts import alert_engine
+from app.services.events import event_hub
+from app.services.exposition import prometheus_exporter
+
+
+# Delay between starting probes of the next port (preferred ports get a head start)
+PROBE_STAGGER_SECONDS = 0.25
+
+# Latency classes grow by 25%
+LATENCY_BUCKET_LOG = math.log(1.25)
+
+# Rows per probe_results INSERT (Postgres allows 32767 bind params per statement)
+PROBE_INSERT_CHUNK_ROWS = 32767 // len(ProbeResult.__table__.columns)
 
 
 async def ping_server(ip: str, port: int = 22, timeout: float = None) -> tuple[bool, int | None]:
@@ -36,78 +52,483 @@ async def ping_server(ip: str, port: int = 22, timeout: float = None) -> tuple[b
         return False, None
 
 
-async def ping_server_multi_port(ip: str, ports: list[int] = None) -> tuple[bool, int | None]:
+async def ping_server_multi_port(
+    ip: str,
+    ports: list[int] = None,
+    stagger: float = PROBE_STAGGER_SECONDS,
+) -> tuple[bool, int | None]:
     """
-    Try to ping server on multiple ports.
+    Try to ping server on multiple ports (happy eyeballs style).
+    Probes are started stagger seconds apart in port order and run concurrently,
+    the first successful one wins and cancels the rest. An offline server takes
+    one timeout (plus the stagger) instead of one timeout per port.
     Returns first successful result or offline.
     """
     if ports is None:
         ports = [22, 80, 443, 8080]
 
-    for port in ports:
-        is_online, latency = await ping_server(ip, port)
-        if is_online:
-            return True, latency
+    async def probe(index: int, port: int) -> tuple[bool, int | None]:
+        if index:
+            await asyncio.sleep(index * stagger)
+        return await ping_server(ip, port)
+
+    tasks = [asyncio.create_task(probe(i, port)) for i, port in enumerate(ports)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            is_online, latency = await next_done
+            if is_online:
+                return True, latency
+        return False, None
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def latency_bucket(latency: int | None) -> int | None:
+    """Latency class (~25% wide); a new latency in the same class isn't worth a write"""
+    if latency is None:
+        return None
+    return int(math.log(latency + 1) / LATENCY_BUCKET_LOG)
+
+
+class PingResultWriter:
+    """
+    Applies probe results to the servers table.
+    Remembers what was last written per server and only writes rows whose
+    status or latency class changed, or whose last_check is older than
+    last_check_write_seconds - all of them with one executemany UPDATE.
+    The periodic rewrite also repairs rows changed elsewhere (agents mark servers online).
+    Every result is appended to probe_results in the same transaction.
+    Every result still reaches alert rules, the exporter and live dashboards.
+    """
+
+    def __init__(self, last_check_write_seconds: float):
+        self.last_check_write_seconds = last_check_write_seconds
+        self._written: dict[int, tuple[str, int | None, datetime | None]] = {}  # status, latency class, last_check
+
+        # Stats
+        self.results_total = 0
+        self.rows_written_total = 0
+        self.rows_skipped_total = 0
+        self.last_rows_written = 0
+
+    def retain(self, server_ids) -> None:
+        """Forget servers that no longer exist"""
+        self._written = {server_id: state for server_id, state in self._written.items() if server_id in server_ids}
+
+    async def apply(self, results: list[tuple[int, bool, int | None, datetime, bool, float | None]]) -> None:
+        """
+        Store (server_id, is_online, latency_ms, checked_at, probe_online, covered_seconds) results.
+        is_online is the confirmed status, probe_online the outcome of this probe,
+        covered_seconds the time since the server's previous probe (uptime weight).
+        """
+        if not results:
+            return
+
+        async with async_session() as db:
+            unknown = {r[0] for r in results} - self._written.keys()
+            if unknown:
+                result = await db.execute(
+                    select(Server.id, Server.status, Server.last_ping, Server.last_check).where(Server.id.in_(unknown))
+                )
+                for server_id, status, last_ping, last_check in result:
+                    self._written[server_id] = (status, latency_bucket(last_ping), last_check)
+
+            params = []
+            written = {}
+            changed = []
+            applied = []
+            history = []
+            for server_id, is_online, latency, checked_at, probe_online, covered in results:
+                previous = self._written.get(server_id)
+                if previous is None:
+                    continue  # deleted since the probe started
+                status = "online" if is_online else "offline"
+                bucket = latency_bucket(latency)
+                applied.append((server_id, status, latency, checked_at))
+                history.append({
+                    "server_id": server_id,
+                    "probed_at": checked_at,
+                    "online": probe_online,
+                    "latency_ms": latency,
+                    "covered_seconds": covered,
+                })
+                if status != previous[0]:
+                    changed.append((server_id, status, latency, checked_at))
+
+                stale = previous[2] is None or (checked_at - previous[2]).total_seconds() >= self.last_check_write_seconds
+                if status == previous[0] and bucket == previous[1] and not stale:
+                    self.rows_skipped_total += 1
+                    continue
+                params.append({"id": server_id, "status": status, "last_ping": latency, "last_check": checked_at})
+                written[server_id] = (status, bucket, checked_at)
+
+            # Every probe goes to the probe history (uptime / latency rollups)
+            for start in range(0, len(history), PROBE_INSERT_CHUNK_ROWS):
+                chunk = history[start:start + PROBE_INSERT_CHUNK_ROWS]
+                await db.execute(pg_insert(ProbeResult).values(chunk).on_conflict_do_nothing())
+            if params:
+                await db.execute(update(Server), params)  # ORM bulk UPDATE by primary key (executemany)
+            await db.commit()
+            self._written.update(written)
+
+        self.results_total += len(results)
+        self.rows_written_total += len(params)
+        self.last_rows_written = len(params)
+
+        for server_id, status, latency, checked_at in applied:
+            prometheus_exporter.update_status(server_id, status, latency, checked_at)
+            alert_engine.observe(server_id, {"offline": 0 if status == "online" else 1, "last_ping": latency}, checked_at)
+        for server_id, status, latency, checked_at in changed:
+            event_hub.publish("status", server_id, {
+                "status": status,
+                "last_ping": latency,
+                "last_check": checked_at.isoformat(),
+            })
+
+    def stats(self) -> dict:
+        return {
+            "tracked": len(self._written),
+            "results_total": self.results_total,
+            "rows_written_total": self.rows_written_total,
+            "rows_skipped_total": self.rows_skipped_total,
+            "last_rows_written": self.last_rows_written,
+        }
+
+
+ping_result_writer = PingResultWriter(last_check_write_seconds=settings.ping_last_check_write_seconds)
+
+
+class ProbeState:
+    """Probe state of one server (see ProbePolicy)"""
 
-    return False, None
+    __slots__ = ("status", "interval", "successes", "failures", "transitions", "flapping", "last_probe_at")
 
+    def __init__(self, status: str, interval: float):
+        self.status = status  # confirmed status: online / offline / unknown
+        self.interval = interval  # regular probe interval, grows while stable
+        self.successes = 0  # consecutive successful probes
+        self.failures = 0  # consecutive failed probes
+        self.transitions: deque[float] = deque()  # times of confirmed status changes
+        self.flapping = False
+        self.last_probe_at: float | None = None
 
-async def update_server_status(db: AsyncSession, server: Server) -> None:
-    """Update a single server's status in the database"""
-    is_online, latency = await ping_server_multi_port(server.ip)
 
-    server.status = "online" if is_online else "offline"
-    server.last_ping = latency
-    server.last_check = datetime.utcnow()
+class ProbePolicy:
+    """
+    Adaptive probe intervals with hysteresis.
+    - online: after stable_after straight successes the interval doubles per
+      success up to max_interval
+    - online, probe failed (suspect): confirmation probes every confirm_interval,
+      offline after confirm_failures straight failures
+    - offline: probed every interval, online again after confirm_successes
+      straight successes (confirmations every confirm_interval)
+    - flapping: flap_enter or more status changes within flap_window; confirmations
+      are doubled and the interval doesn't grow until changes drop to flap_exit
+    """
+
+    def __init__(
+        self,
+        interval: float,
+        max_interval: float,
+        stable_after: int,
+        confirm_interval: float,
+        confirm_failures: int,
+        confirm_successes: int,
+        flap_window: float,
+        flap_enter: int,
+        flap_exit: int,
+    ):
+        self.interval = interval
+        self.max_interval = max(interval, max_interval)
+        self.stable_after = stable_after
+        self.confirm_interval = confirm_interval
+        self.confirm_failures = confirm_failures
+        self.confirm_successes = confirm_successes
+        self.flap_window = flap_window
+        self.flap_enter = flap_enter
+        self.flap_exit = flap_exit
+
+        # Stats
+        self.transitions_total = 0
+        self.suppressed_failures = 0  # failed probes of online servers that didn't confirm
+
+    def new_state(self, status: str) -> ProbeState:
+        return ProbeState(status, self.interval)
+
+    def _transition(self, state: ProbeState, status: str, now: float) -> None:
+        state.status = status
+        state.interval = self.interval
+        state.successes = state.failures = 0
+        state.transitions.append(now)
+        self.transitions_total += 1
+
+    def observe(self, state: ProbeState, ok: bool, now: float) -> float:
+        """Apply a probe outcome; returns the delay until the server's next probe"""
+        while state.transitions and state.transitions[0] < now - self.flap_window:
+            state.transitions.popleft()
+        if state.flapping:
+            state.flapping = len(state.transitions) > self.flap_exit
+        else:
+            state.flapping = len(state.transitions) >= self.flap_enter
+        confirmations = 2 if state.flapping else 1
+
+        if ok:
+            state.successes += 1
+            state.failures = 0
+        else:
+            state.failures += 1
+            state.successes = 0
+
+        if state.status == "unknown":
+            # Nothing to confirm against yet
+            state.status = "online" if ok else "offline"
+            return self.interval
+
+        if state.status == "online":
+            if ok:
+                if state.successes >= self.stable_after and not state.flapping:
+                    state.interval = min(self.max_interval, state.interval * 2)
+                return state.interval
+            if state.failures >= self.confirm_failures * confirmations:
+                self._transition(state, "offline", now)
+                return self.interval
+            if state.failures == 1:
+                state.interval = self.interval
+            return self.confirm_interval
+
+        # offline
+        if not ok:
+            return self.interval
+        if state.successes >= self.confirm_successes * confirmations:
+            self._transition(state, "online", now)
+            return self.interval
+        return self.confirm_interval
+
+
+class ProbeScheduler:
+    """
+    Probes every server on its own adaptive schedule (see ProbePolicy).
+    Each server starts at a fixed phase offset within the base interval (golden
+    ratio sequence of its id), next probe times sit in a min-heap and at most
+    max_concurrency probes run at once. Servers report their confirmed status;
+    results are applied in batches every flush_interval seconds through
+    ping_result_writer. The server list is reloaded once per base interval (one cycle).
+    """
+
+    def __init__(self, policy: ProbePolicy, max_concurrency: int, flush_interval: float = 1.0):
+        self.policy = policy
+        self.interval = policy.interval
+        self.max_concurrency = max_concurrency
+        self.flush_interval = flush_interval
+        self._heap: list[tuple[float, int]] = []  # (due, server_id), time.monotonic() based
+        self._targets: dict[int, str] = {}  # server_id -> ip
+        self._states: dict[int, ProbeState] = {}
+        self._results: list[tuple[int, bool, int | None, datetime, bool, float | None]] = []
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._wakeup = asyncio.Event()
+        self._probes: set[asyncio.Task] = set()
+        self._task: asyncio.Task | None = None
 
-    await db.commit()
+        # Stats
+        self.cycles = 0
+        self.errors = 0
+        self.probes_total = 0
+        self.probes_in_cycle = 0
+        self.last_cycle_probes = 0
+        self.last_cycle_seconds = 0.0
+        self.last_lateness = 0.0
+        self.max_lateness = 0.0
+        self._lateness_total = 0.0
+        self.max_inflight = 0
+        self.last_flush_rows = 0
+        self.last_flush_seconds = 0.0
 
+    def phase(self, server_id: int) -> float:
+        """Offset of a server's first probe within the interval"""
+        return (server_id * 0.6180339887498949) % 1.0 * self.interval
 
-async def ping_all_servers() -> dict:
-    """Ping all servers and update their status"""
-    async with async_session() as db:
-        result = await db.execute(select(Server))
-        servers = result.scalars().all()
+    async def refresh(self) -> None:
+        """Reload the server list, schedule new servers at their phase"""
+        async with async_session() as db:
+            result = await db.execute(select(Server))
+            servers = result.scalars().all()
 
-        results = {"total": len(servers), "online": 0, "offline": 0}
+        self._targets = {server.id: server.ip for server in servers}
+        prometheus_exporter.update_servers(servers)
+        ping_result_writer.retain(self._targets)
 
-        # Ping all servers concurrently
-        tasks = []
+        now = time.monotonic()
         for server in servers:
-            tasks.append(ping_server_multi_port(server.ip))
+            if server.id not in self._states:
+                # Continue from the stored status, first probe the next time the clock passes the phase
+                self._states[server.id] = self.policy.new_state(server.status)
+                heapq.heappush(self._heap, (now + (self.phase(server.id) - now) % self.interval, server.id))
+        for server_id in self._states.keys() - self._targets.keys():
+            del self._states[server_id]
+
+    async def _probe(self, server_id: int, ip: str, due: float) -> None:
+        try:
+            ok, latency = await ping_server_multi_port(ip)
+        except Exception:
+            ok, latency = False, None
+        finally:
+            self._semaphore.release()
+
+        state = self._states.get(server_id)
+        if state is None:
+            return  # deleted
+
+        now = time.monotonic()
+        # Time this probe stands for in uptime (bounded, e.g. after the backend was down)
+        covered = now - state.last_probe_at if state.last_probe_at is not None else state.interval
+        covered = min(covered, 2 * self.policy.max_interval)
+        state.last_probe_at = now
+
+        delay = self.policy.observe(state, ok, now)
+        self._results.append((server_id, state.status == "online", latency, datetime.utcnow(), ok, covered))
+        if not ok and state.status == "online":
+            self.policy.suppressed_failures += 1
 
-        ping_results = await asyncio.gather(*tasks, return_exceptions=True)
+        heapq.heappush(self._heap, (max(due + delay, now), server_id))
+        self._wakeup.set()
 
-        # Update database
-        for server, ping_result in zip(servers, ping_results):
-            if isinstance(ping_result, Exception):
-                server.status = "offline"
-                server.last_ping = None
-                results["offline"] += 1
-            else:
-                is_online, latency = ping_result
-                server.status = "online" if is_online else "offline"
-                server.last_ping = latency
-                if is_online:
-                    results["online"] += 1
-                else:
-                    results["offline"] += 1
+    async def flush(self) -> None:
+        """Apply buffered probe results"""
+        results, self._results = self._results, []
+        start_time = time.perf_counter()
+        await ping_result_writer.apply(results)
+        self.last_flush_rows = len(results)
+        self.last_flush_seconds = time.perf_counter() - start_time
 
-            server.last_check = datetime.utcnow()
+    async def _start_due(self, now: float) -> None:
+        """
+        Start probes of every server that is due (rescheduled when the probe completes).
+        Never waits for a slot: with max_concurrency probes running, due servers stay
+        in the heap and the loop is woken when a probe completes.
+        """
+        while self._heap and self._heap[0][0] <= now and not self._semaphore.locked():
+            due, server_id = heapq.heappop(self._heap)
+            ip = self._targets.get(server_id)
+            if ip is None or server_id not in self._states:
+                continue  # deleted
 
-        await db.commit()
+            await self._semaphore.acquire()  # a slot is free, returns at once
+            lateness = time.monotonic() - due
+            self.last_lateness = lateness
+            self.max_lateness = max(self.max_lateness, lateness)
+            self._lateness_total += lateness
+            self.probes_total += 1
+            self.probes_in_cycle += 1
 
-        return results
+            task = asyncio.create_task(self._probe(server_id, ip, due))
+            self._probes.add(task)
+            task.add_done_callback(self._probes.discard)
+            self.max_inflight = max(self.max_inflight, len(self._probes))
 
+    async def run(self) -> None:
+        """Scheduling loop"""
+        print(
+            f"Starting probe scheduler (interval: {self.interval}-{self.policy.max_interval}s, "
+            f"concurrency: {self.max_concurrency})"
+        )
+        cycle_start = next_refresh = next_flush = time.monotonic()
+        while True:
+            try:
+                now = time.monotonic()
+                if now >= next_refresh:
+                    if self.cycles or self.probes_in_cycle:
+                        self.last_cycle_probes = self.probes_in_cycle
+                        self.last_cycle_seconds = now - cycle_start
+                        self.cycles += 1
+                    cycle_start, self.probes_in_cycle = now, 0
+                    next_refresh = now + self.interval
+                    await self.refresh()
+
+                await self._start_due(now)
+
+                if now >= next_flush:
+                    next_flush = now + self.flush_interval
+                    await self.flush()
+            except Exception as e:
+                self.errors += 1
+                print(f"Probe scheduler error: {e}")
+
+            # Sleep until the next due probe, flush or refresh (completed probes may schedule earlier ones).
+            # With every slot taken, only a completing probe (wakeup) can start the next one.
+            next_due = self._heap[0][0] if self._heap and not self._semaphore.locked() else next_refresh
+            wake_at = min(next_refresh, next_flush, next_due)
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=max(0.0, wake_at - time.monotonic()))
+            except asyncio.TimeoutError:
+                pass
 
-async def ping_loop():
-    """Background task that pings all servers periodically"""
-    print(f"Starting ping loop (interval: {settings.ping_interval_seconds}s)")
-    while True:
+    def start(self) -> None:
+        """Start the background scheduler"""
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        """Cancel the scheduler and running probes, store results collected so far"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        for task in list(self._probes):
+            task.cancel()
+        await asyncio.gather(self._task, *self._probes, return_exceptions=True)
+        self._task = None
         try:
-            results = await ping_all_servers()
-            print(f"Ping complete: {results['online']}/{results['total']} servers online")
+            await self.flush()
         except Exception as e:
-            print(f"Ping error: {e}")
+            print(f"Probe scheduler flush error: {e}")
+
+    def stats(self) -> dict:
+        states = list(self._states.values())
+        return {
+            "servers": len(self._targets),
+            "interval": self.interval,
+            "max_interval": self.policy.max_interval,
+            "max_concurrency": self.max_concurrency,
+            "inflight": len(self._probes),
+            "max_inflight": self.max_inflight,
+            "cycles": self.cycles,
+            "errors": self.errors,
+            "probes_total": self.probes_total,
+            "last_cycle_probes": self.last_cycle_probes,
+            "last_cycle_seconds": round(self.last_cycle_seconds, 3),
+            "last_lateness_seconds": round(self.last_lateness, 4),
+            "avg_lateness_seconds": round(self._lateness_total / self.probes_total, 4) if self.probes_total else 0.0,
+            "max_lateness_seconds": round(self.max_lateness, 4),
+            "states": {
+                "online": sum(1 for s in states if s.status == "online" and not s.failures),
+                "stable": sum(1 for s in states if s.status == "online" and s.interval > self.interval),
+                "suspect": sum(1 for s in states if s.status == "online" and s.failures),
+                "offline": sum(1 for s in states if s.status == "offline" and not s.successes),
+                "recovering": sum(1 for s in states if s.status == "offline" and s.successes),
+                "flapping": sum(1 for s in states if s.flapping),
+            },
+            "avg_interval_seconds": round(sum(s.interval for s in states) / len(states), 1) if states else 0.0,
+            "transitions_total": self.policy.transitions_total,
+            "suppressed_failures": self.policy.suppressed_failures,
+            "pending_results": len(self._results),
+            "writes": ping_result_writer.stats(),
+            "last_flush_rows": self.last_flush_rows,
+            "last_flush_seconds": round(self.last_flush_seconds, 4),
+        }
+
 
-        await asyncio.sleep(settings.ping_interval_seconds)
+probe_scheduler = ProbeScheduler(
+    policy=ProbePolicy(
+        interval=settings.ping_interval_seconds,
+        max_interval=settings.ping_max_interval_seconds,
+        stable_after=settings.ping_stable_after,
+        confirm_interval=settings.ping_confirm_interval_seconds,
+        confirm_failures=settings.ping_confirm_failures,
+        confirm_successes=settings.ping_confirm_successes,
+        flap_window=settings.ping_flap_window_seconds,
+        flap_enter=settings.ping_flap_enter_transitions,
+        flap_exit=settings.ping_flap_exit_transitions,
+    ),
+    max_concurrency=settings.ping_max_concurrency,
+)
@@ -0,0 +1,189 @@
+"""
+Scheduled metrics retention and partition maintenance
+"""
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import column, delete, select, table
+
+from app.config import settings
+from app.database import async_session
+from app.services.partitions import (
+    DEFAULT_PARTITION,
+    PARENT_TABLE,
+    drop_expired_partitions,
+    ensure_partitions,
+    is_partitioned,
+)
+
+
+class MetricsRetention:
+    """
+    Background job that removes server_metrics rows older than the retention period.
+    On a partitioned table it pre-creates future partitions and drops expired ones
+    whole; only rows that landed in the default partition are deleted row by row.
+    Rows are deleted in chunks of chunk_rows, each in its own short transaction,
+    so a large backlog never holds long locks.
+    """
+
+    def __init__(
+        self,
+        retention_hours: int,
+        interval: float,
+        chunk_rows: int,
+        partition_interval: str,
+        partitions_ahead: int,
+    ):
+        self.retention_hours = retention_hours
+        self.interval = interval
+        self.chunk_rows = chunk_rows
+        self.partition_interval = partition_interval
+        self.partitions_ahead = partitions_ahead
+        self._task: asyncio.Task | None = None
+
+        # Stats
+        self.runs = 0
+        self.errors = 0
+        self.rows_purged_total = 0
+        self.last_run_at: datetime | None = None
+        self.last_rows_purged = 0
+        self.last_run_seconds = 0.0
+        self.partitioned = False
+        self.partitions_created_total = 0
+        self.partitions_dropped_total = 0
+        self.last_partitions_dropped = 0
+
+    async def ensure_partitions(self) -> list[str]:
+        """
+        Pre-create upcoming partitions in their own transaction (no-op on a plain table).
+        Called at startup before ingest starts and on every retention run.
+        """
+        async with async_session() as db:
+            self.partitioned = await is_partitioned(db)
+            if not self.partitioned:
+                return []
+            created = await ensure_partitions(db, datetime.utcnow(), self.partition_interval, self.partitions_ahead)
+            await db.commit()
+        self.partitions_created_total += len(created)
+        return created
+
+    async def purge_expired(self) -> dict:
+        """Delete all expired rows. Returns rows purged, partitions dropped and time spent."""
+        start_time = time.perf_counter()
+        cutoff = datetime.utcnow() - timedelta(hours=self.retention_hours)
+
+        # Separate transactions, so a failing partition creation never blocks retention
+        try:
+            await self.ensure_partitions()
+        except Exception as e:
+            self.errors += 1
+            print(f"Metrics partition creation error: {e}")
+
+        dropped = []
+        if self.partitioned:
+            async with async_session() as db:
+                dropped = await drop_expired_partitions(db, cutoff)
+                await db.commit()
+            self.partitions_dropped_total += len(dropped)
+            table_name = DEFAULT_PARTITION
+        else:
+            table_name = PARENT_TABLE
+
+        purged = await self._delete_rows(table_name, cutoff)
+
+        elapsed = time.perf_counter() - start_time
+        self.runs += 1
+        self.rows_purged_total += purged
+        self.last_run_at = datetime.utcnow()
+        self.last_rows_purged = purged
+        self.last_partitions_dropped = len(dropped)
+        self.last_run_seconds = elapsed
+
+        return {
+            "rows_purged": purged,
+            "partitions_dropped": len(dropped),
+            "seconds": round(elapsed, 3),
+        }
+
+    async def _delete_rows(self, table_name: str, cutoff: datetime) -> int:
+        """Delete expired rows of one table in chunks"""
+        metrics = table(table_name, column("id"), column("collected_at"))
+        purged = 0
+
+        while True:
+            async with async_session() as db:
+                expired_ids = (
+                    select(metrics.c.id)
+                    .where(metrics.c.collected_at < cutoff)
+                    .limit(self.chunk_rows)
+                )
+                result = await db.execute(
+                    delete(metrics).where(metrics.c.id.in_(expired_ids))
+                )
+                await db.commit()
+
+            purged += result.rowcount
+            if result.rowcount < self.chunk_rows:
+                break
+            await asyncio.sleep(0)  # let request handlers run between chunks
+
+        return purged
+
+    async def run(self) -> None:
+        """Retention loop"""
+        print(
+            f"Starting metrics retention (keep: {self.retention_hours}h, "
+            f"interval: {self.interval}s, chunk: {self.chunk_rows} rows)"
+        )
+        while True:
+            try:
+                result = await self.purge_expired()
+                print(
+                    f"Metrics retention: purged {result['rows_purged']} rows, "
+                    f"dropped {result['partitions_dropped']} partitions in {result['seconds']}s"
+                )
+            except Exception as e:
+                self.errors += 1
+                print(f"Metrics retention error: {e}")
+
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        """Start the background retention job"""
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        """Cancel the background retention job"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "retention_hours": self.retention_hours,
+            "runs": self.runs,
+            "errors": self.errors,
+            "rows_purged_total": self.rows_purged_total,
+            "last_run_at": self.last_run_at.isoformat() if self.last_run_at else None,
+            "last_rows_purged": self.last_rows_purged,
+            "last_run_seconds": round(self.last_run_seconds, 3),
+            "partitioned": self.partitioned,
+            "partitions_created_total": self.partitions_created_total,
+            "partitions_dropped_total": self.partitions_dropped_total,
+            "last_partitions_dropped": self.last_partitions_dropped,
+        }
+
+
+metrics_retention = MetricsRetention(
+    retention_hours=settings.metrics_retention_hours,
+    interval=settings.metrics_retention_interval_seconds,
+    chunk_rows=settings.metrics_retention_chunk_rows,
+    partition_interval=settings.metrics_partition_interval,
+    partitions_ahead=settings.metrics_partitions_ahead,
+)
@@ -0,0 +1,226 @@
+"""
+Multi-resolution metrics rollups - avg/min/max per server per time bucket
+"""
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, func, literal_column, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import async_session
+from app.models import ServerMetrics, ServerMetricsRollup
+from app.services.metrics import METRIC_FIELDS, backfill_mark
+
+
+# Resolution of raw samples in tier selection
+RAW_RESOLUTION = 0
+
+# Integer fields of MetricsResponse (rollup averages are rounded back)
+INTEGER_FIELDS = {"memory_used_mb", "memory_total_mb", "uptime_seconds"}
+
+# Aggregate columns of server_metrics_rollups
+AGGREGATE_COLUMNS = [f"{field}_{agg}" for field in METRIC_FIELDS for agg in ("avg", "min", "max")]
+
+
+def bucket_expression(column, resolution_seconds: int):
+    """date_bin() of a timestamp column into buckets of resolution_seconds"""
+    return func.date_bin(
+        literal_column(f"interval '{int(resolution_seconds)} seconds'"),
+        column,
+        literal_column("timestamp '2000-01-01'"),
+    )
+
+
+def floor_to_resolution(ts: datetime, resolution_seconds: int) -> datetime:
+    """Floor a timestamp to its bucket start (same origin as bucket_expression)"""
+    origin = datetime(2000, 1, 1)
+    offset = int((ts - origin).total_seconds()) // resolution_seconds * resolution_seconds
+    return origin + timedelta(seconds=offset)
+
+
+class MetricsRollups:
+    """
+    Background job that maintains rollup tiers incrementally.
+    Every run aggregates raw samples of closed buckets since the previous run
+    (plus one bucket of overlap for late samples) and upserts them, then
+    removes rollups older than the tier's retention. Batch submits may carry
+    samples up to the raw retention old, so runs start from the bucket of the
+    oldest sample written since the previous run (backfill_mark) if that is earlier.
+    """
+
+    def __init__(self, tiers: dict[int, int], interval: float):
+        self.tiers = tiers  # resolution_seconds -> retention_hours
+        self.interval = interval
+        self._done_until: dict[int, datetime] = {}
+        self._task: asyncio.Task | None = None
+
+        # Stats
+        self.runs = 0
+        self.errors = 0
+        self.last_run_at: datetime | None = None
+        self.last_run_seconds = 0.0
+        self.last_rows_upserted: dict[int, int] = {}
+        self.last_rows_purged: dict[int, int] = {}
+
+    def select_resolution(self, hours: int, resolution_seconds: int | None = None, read_chunks: bool = True) -> int:
+        """
+        Pick the cheapest tier for a history window: the coarsest one that still
+        has the requested resolution (by default, enough for target_points points)
+        among tiers whose retention covers the window.
+        Readers that can't decode compressed chunks pass read_chunks=False, raw
+        samples then only cover the uncompressed window.
+        """
+        raw_hours = settings.metrics_retention_hours
+        if settings.metrics_compression_enabled:
+            if read_chunks:
+                raw_hours = max(raw_hours, settings.metrics_chunk_retention_days * 24)
+            else:
+                raw_hours = min(raw_hours, settings.metrics_compress_after_hours)
+        tiers = [(RAW_RESOLUTION, raw_hours)] + sorted(self.tiers.items())
+        if resolution_seconds is None:
+            resolution_seconds = hours * 3600 / settings.metrics_history_target_points
+
+        eligible = [tier for tier in tiers if tier[1] >= hours]
+        if not eligible:
+            eligible = [max(tiers, key=lambda tier: tier[1])]
+
+        fitting = [res for res, _ in eligible if res <= resolution_seconds]
+        return max(fitting) if fitting else min(res for res, _ in eligible)
+
+    async def rollup_tier(self, db: AsyncSession, resolution: int, start: datetime, end: datetime) -> int:
+        """Aggregate raw samples in [start, end) into buckets of one tier. Does not commit."""
+        bucket = bucket_expression(ServerMetrics.collected_at, resolution)
+        aggregates = []
+        for field in METRIC_FIELDS:
+            column = getattr(ServerMetrics, field)
+            aggregates += [func.avg(column), func.min(column), func.max(column)]
+
+        aggregated = (
+            select(
+                ServerMetrics.server_id,
+                literal_column(str(int(resolution))),
+                bucket,
+                func.count(),
+                *aggregates,
+            )
+            .where(ServerMetrics.collected_at >= start, ServerMetrics.collected_at < end)
+            .group_by(ServerMetrics.server_id, bucket)
+        )
+
+        stmt = pg_insert(ServerMetricsRollup).from_select(
+            ["server_id", "resolution_seconds", "bucket_start", "sample_count", *AGGREGATE_COLUMNS],
+            aggregated,
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["server_id", "resolution_seconds", "bucket_start"],
+            set_={name: stmt.excluded[name] for name in ["sample_count", *AGGREGATE_COLUMNS]},
+        )
+        result = await db.execute(stmt)
+        return result.rowcount
+
+    async def run_once(self) -> dict:
+        """Update every tier up to the last closed bucket and apply tier retention"""
+        start_time = time.perf_counter()
+        oldest_written = backfill_mark.take()
+        try:
+            upserted, purged = await self._update_tiers(oldest_written)
+        except Exception:
+            backfill_mark.restore(oldest_written)  # re-aggregate those buckets next run
+            raise
+
+        self.runs += 1
+        self.last_run_at = datetime.utcnow()
+        self.last_run_seconds = time.perf_counter() - start_time
+        self.last_rows_upserted = upserted
+        self.last_rows_purged = purged
+
+        return {"upserted": upserted, "purged": purged, "seconds": round(self.last_run_seconds, 3)}
+
+    async def _update_tiers(self, oldest_written: datetime | None) -> tuple[dict[int, int], dict[int, int]]:
+        now = datetime.utcnow()
+        raw_start = now - timedelta(hours=settings.metrics_retention_hours)
+        if oldest_written is not None:
+            backfill_limit = raw_start
+            if settings.metrics_compression_enabled:
+                # Older raw rows are packed into chunks, re-aggregating there would drop them
+                compressed_until = now - timedelta(hours=settings.metrics_compress_after_hours)
+                backfill_limit = max(backfill_limit, floor_to_resolution(compressed_until, settings.metrics_chunk_hours * 3600))
+            oldest_written = max(oldest_written, backfill_limit)
+
+        upserted: dict[int, int] = {}
+        purged: dict[int, int] = {}
+        async with async_session() as db:
+            for resolution, retention_hours in sorted(self.tiers.items()):
+                end = floor_to_resolution(now, resolution)
+                done_until = self._done_until.get(resolution, floor_to_resolution(raw_start, resolution))
+                start = done_until - timedelta(seconds=resolution)  # re-aggregate last bucket for late samples
+                if oldest_written is not None:
+                    start = min(start, floor_to_resolution(oldest_written, resolution))
+
+                upserted[resolution] = 0
+                if start < end:
+                    upserted[resolution] = await self.rollup_tier(db, resolution, start, end)
+
+                result = await db.execute(
+                    delete(ServerMetricsRollup).where(
+                        ServerMetricsRollup.resolution_seconds == resolution,
+                        ServerMetricsRollup.bucket_start < now - timedelta(hours=retention_hours),
+                    )
+                )
+                purged[resolution] = result.rowcount
+                await db.commit()
+                self._done_until[resolution] = max(end, done_until)
+
+        return upserted, purged
+
+    async def run(self) -> None:
+        """Rollup loop"""
+        tiers = ", ".join(f"{res}s for {hours}h" for res, hours in sorted(self.tiers.items()))
+        print(f"Starting metrics rollups (tiers: {tiers}, interval: {self.interval}s)")
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                self.errors += 1
+                print(f"Metrics rollup error: {e}")
+
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        """Start the background rollup job"""
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        """Cancel the background rollup job"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "tiers": {str(res): hours for res, hours in sorted(self.tiers.items())},
+            "runs": self.runs,
+            "errors": self.errors,
+            "last_run_at": self.last_run_at.isoformat() if self.last_run_at else None,
+            "last_run_seconds": round(self.last_run_seconds, 3),
+            "last_rows_upserted": {str(res): rows for res, rows in self.last_rows_upserted.items()},
+            "last_rows_purged": {str(res): rows for res, rows in self.last_rows_purged.items()},
+            "done_until": {str(res): ts.isoformat() for res, ts in self._done_until.items()},
+        }
+
+
+metrics_rollups = MetricsRollups(
+    tiers={
+        300: settings.metrics_rollup_5m_retention_days * 24,
+        3600: settings.metrics_rollup_1h_retention_days * 24,
+    },
+    interval=settings.metrics_rollup_interval_seconds,
+)
@@ -0,0 +1,97 @@
+"""
+Windowed aggregate statistics of a metric, computed in Postgres
+"""
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import Float, cast, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import ServerMetrics
+from app.services.compression import read_chunk_rows
+from app.services.metrics import METRIC_FIELDS
+from app.services.rollups import bucket_expression, floor_to_resolution
+
+
+# Percentiles reported by metric_stats
+PERCENTILES = {"p50": 0.5, "p95": 0.95, "p99": 0.99}
+
+
+def _aggregates(column) -> list:
+    """count/avg/min/max and percentiles of a column (same ORDER BY, so Postgres sorts once)"""
+    return [
+        func.count(column).label("count"),
+        func.avg(column).label("avg"),
+        func.min(column).label("min"),
+        func.max(column).label("max"),
+        *(func.percentile_cont(q).within_group(column).label(name) for name, q in PERCENTILES.items()),
+    ]
+
+
+def _summarize(values: np.ndarray) -> dict:
+    """Same numbers as _aggregates, for samples decoded from compressed chunks"""
+    values = values[~np.isnan(values)]
+    if not len(values):
+        return {"count": 0, "avg": None, "min": None, "max": None, **{name: None for name in PERCENTILES}}
+    quantiles = np.quantile(values, list(PERCENTILES.values()))  # linear, like percentile_cont
+    return {
+        "count": len(values),
+        "avg": float(values.mean()),
+        "min": float(values.min()),
+        "max": float(values.max()),
+        **{name: float(q) for name, q in zip(PERCENTILES, quantiles)},
+    }
+
+
+async def metric_stats(
+    db: AsyncSession,
+    server_id: int,
+    metric: str,
+    start: datetime,
+    end: datetime,
+    bucket_seconds: int | None = None,
+) -> tuple[dict, list[dict]]:
+    """
+    Aggregate statistics of one metric over raw samples in [start, end).
+    Returns the stats of the whole window and, with bucket_seconds, per time bucket
+    (date_bin buckets, oldest first). Only a few numbers leave the database,
+    unless part of the window is in compressed chunks: then the samples are
+    decoded and aggregated with NumPy.
+    """
+    value = cast(getattr(ServerMetrics, metric), Float)
+    window = (
+        ServerMetrics.server_id == server_id,
+        ServerMetrics.collected_at >= start,
+        ServerMetrics.collected_at < end,
+    )
+
+    # Older samples may be packed into chunks, those windows are aggregated here
+    chunk_rows = await read_chunk_rows(db, server_id, start, end)
+    if chunk_rows:
+        column = METRIC_FIELDS.index(metric) + 1
+        result = await db.execute(select(ServerMetrics.collected_at, value).where(*window))
+        samples = [(row[0], row[column]) for row in chunk_rows] + [tuple(row) for row in result.all()]
+        values = np.array([sample[1] for sample in samples], dtype=np.float64)  # None -> nan
+
+        buckets = []
+        if bucket_seconds is not None:
+            keys = np.array([floor_to_resolution(sample[0], bucket_seconds) for sample in samples])
+            for bucket_start in sorted(set(keys)):
+                buckets.append({"bucket_start": bucket_start, **_summarize(values[keys == bucket_start])})
+        return _summarize(values), buckets
+
+    result = await db.execute(select(*_aggregates(value)).where(*window))
+    overall = dict(result.mappings().one())
+
+    buckets = []
+    if bucket_seconds is not None:
+        bucket = bucket_expression(ServerMetrics.collected_at, bucket_seconds).label("bucket_start")
+        result = await db.execute(
+            select(bucket, *_aggregates(value))
+            .where(*window)
+            .group_by(bucket)
+            .order_by(bucket)
+        )
+        buckets = [dict(row) for row in result.mappings().all()]
+
+    return overall, buckets
@@ -0,0 +1,108 @@
+"""
+In-memory agent token -> server id cache for metrics submit auth
+"""
+import time
+
+from sqlalchemy import select
+
+from app.config import settings
+from app.database import async_session
+from app.models import Server
+
+
+# Upper bound for the negative cache so random tokens can't grow it forever
+MAX_INVALID_TOKENS = 10000
+
+
+class AgentTokenCache:
+    """
+    TTL cache of agent_token -> server_id.
+    Unknown tokens are remembered for a shorter negative TTL so a misconfigured
+    agent doesn't hit the database on every submit.
+    """
+
+    def __init__(self, ttl: float, negative_ttl: float):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._tokens: dict[str, tuple[int, float]] = {}  # token -> (server_id, expires_at)
+        self._server_tokens: dict[int, str] = {}         # server_id -> token
+        self._invalid: dict[str, float] = {}             # token -> expires_at
+        self._generation = 0  # bumped on every invalidation
+
+        self.hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+
+    async def resolve(self, token: str) -> int | None:
+        """Return server id for token, None if token is invalid"""
+        now = time.monotonic()
+
+        cached = self._tokens.get(token)
+        if cached is not None and cached[1] > now:
+            self.hits += 1
+            return cached[0]
+
+        expires_at = self._invalid.get(token)
+        if expires_at is not None and expires_at > now:
+            self.negative_hits += 1
+            return None
+
+        self.misses += 1
+        generation = self._generation
+        async with async_session() as db:
+            result = await db.execute(select(Server.id).where(Server.agent_token == token))
+            server_id = result.scalar_one_or_none()
+
+        # A token was rotated/revoked while we were querying - don't cache a possibly stale answer
+        if generation != self._generation:
+            return server_id
+
+        if server_id is None:
+            self._tokens.pop(token, None)
+            if len(self._invalid) >= MAX_INVALID_TOKENS:
+                self._prune_invalid(now)
+            self._invalid[token] = now + self.negative_ttl
+        else:
+            self._invalid.pop(token, None)
+            self._tokens[token] = (server_id, now + self.ttl)
+            self._server_tokens[server_id] = token
+        return server_id
+
+    def _prune_invalid(self, now: float) -> None:
+        """Drop expired negative entries, or all of them if a flood of bad tokens keeps it full"""
+        self._invalid = {t: exp for t, exp in self._invalid.items() if exp > now}
+        if len(self._invalid) >= MAX_INVALID_TOKENS:
+            self._invalid.clear()
+
+    def invalidate_server(self, server_id: int) -> None:
+        """Forget the cached token of a server (token rotated/revoked or server deleted)"""
+        self._generation += 1
+        token = self._server_tokens.pop(server_id, None)
+        if token is not None:
+            self._tokens.pop(token, None)
+
+    def invalidate_token(self, token: str) -> None:
+        """Drop a token from the negative cache (e.g. it has just been issued)"""
+        self._generation += 1
+        self._invalid.pop(token, None)
+
+    def clear(self) -> None:
+        self._generation += 1
+        self._tokens.clear()
+        self._server_tokens.clear()
+        self._invalid.clear()
+
+    def stats(self) -> dict:
+        return {
+            "cached_tokens": len(self._tokens),
+            "cached_invalid_tokens": len(self._invalid),
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+        }
+
+
+agent_token_cache = AgentTokenCache(
+    ttl=settings.agent_token_cache_ttl_seconds,
+    negative_ttl=settings.agent_token_negative_ttl_seconds,
+)
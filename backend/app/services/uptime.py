@@ -0,0 +1,257 @@
+"""
+Probe history - hourly uptime and latency histogram rollups of ping probes
+"""
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import Float, and_, cast, delete, func, literal_column, select
+from sqlalchemy.dialects.postgresql import array
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import async_session
+from app.models import ProbeResult, ProbeRollup, Server
+from app.services.rollups import floor_to_resolution
+
+
+ROLLUP_SECONDS = 3600
+
+# Upper bounds of the latency histogram buckets; one more bucket holds everything slower
+LATENCY_HISTOGRAM_BOUNDS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+# Uptime windows of the API
+UPTIME_WINDOWS = {"24h": 24, "7d": 24 * 7, "30d": 24 * 30}
+
+PERCENTILES = (("p50", 0.5), ("p95", 0.95), ("p99", 0.99))
+
+
+def histogram_percentile(counts: list[int], q: float, max_ms: float | None) -> float | None:
+    """Percentile from bucket counts, interpolated linearly inside the bucket"""
+    total = sum(counts)
+    if not total:
+        return None
+
+    target = q * total
+    cumulative = 0
+    for i, count in enumerate(counts):
+        if count and cumulative + count >= target:
+            low = LATENCY_HISTOGRAM_BOUNDS_MS[i - 1] if i else 0
+            high = LATENCY_HISTOGRAM_BOUNDS_MS[i] if i < len(LATENCY_HISTOGRAM_BOUNDS_MS) else (max_ms or low)
+            if max_ms is not None:
+                high = max(low, min(high, max_ms))  # the slowest probe bounds the top bucket
+            return low + (high - low) * (target - cumulative) / count
+        cumulative += count
+    return max_ms
+
+
+async def probe_stats(
+    db: AsyncSession,
+    hours: int,
+    server_id: int | None = None,
+    folder_id: int | None = None,
+) -> list[dict]:
+    """
+    Uptime and latency stats per server over the last hours, from hourly rollups
+    (one grouped query for any number of servers). The window starts at the first
+    bucket that begins within it, so it never covers more than the hours asked for.
+    """
+    window_start = datetime.utcnow() - timedelta(hours=hours)
+    start = floor_to_resolution(window_start, ROLLUP_SECONDS)
+    if start < window_start:
+        start += timedelta(seconds=ROLLUP_SECONDS)
+    bucket_sums = [
+        func.sum(ProbeRollup.latency_histogram[i + 1])
+        for i in range(len(LATENCY_HISTOGRAM_BOUNDS_MS) + 1)
+    ]
+    stmt = (
+        select(
+            ProbeRollup.server_id,
+            func.sum(ProbeRollup.probes),
+            func.sum(ProbeRollup.successes),
+            func.sum(ProbeRollup.seconds),
+            func.sum(ProbeRollup.seconds_online),
+            func.sum(ProbeRollup.latency_sum_ms),
+            func.max(ProbeRollup.latency_max_ms),
+            *bucket_sums,
+        )
+        .where(ProbeRollup.bucket_start >= start)
+        .group_by(ProbeRollup.server_id)
+        .order_by(ProbeRollup.server_id)
+    )
+    if server_id is not None:
+        stmt = stmt.where(ProbeRollup.server_id == server_id)
+    if folder_id is not None:
+        stmt = stmt.where(ProbeRollup.server_id.in_(select(Server.id).where(Server.folder_id == folder_id)))
+
+    stats = []
+    for row in (await db.execute(stmt)).all():
+        row_server_id, probes, successes, seconds, seconds_online, latency_sum, latency_max = row[:7]
+        counts = [int(count or 0) for count in row[7:]]
+        if seconds:
+            uptime = 100 * seconds_online / seconds  # probes aren't evenly spaced, weight by covered time
+        else:
+            uptime = 100 * successes / probes if probes else None
+        item = {
+            "server_id": row_server_id,
+            "probes": int(probes),
+            "successes": int(successes),
+            "uptime_percent": round(uptime, 3) if uptime is not None else None,
+            "latency_avg_ms": round(latency_sum / successes, 1) if successes else None,
+            "latency_max_ms": latency_max,
+        }
+        for name, q in PERCENTILES:
+            value = histogram_percentile(counts, q, latency_max)
+            item[f"latency_{name}_ms"] = round(value, 1) if value is not None else None
+        stats.append(item)
+    return stats
+
+
+class ProbeRollups:
+    """
+    Background job that aggregates probe_results into hourly probe_rollups.
+    Every run re-aggregates the previous and the current (open) hour, so
+    uptime windows include the latest probes. Uptime is weighted by the time
+    each probe covers, since adaptive probing spaces probes unevenly. Raw
+    results and rollups are purged after their retention.
+    """
+
+    def __init__(self, raw_retention_hours: int, retention_days: int, interval: float):
+        self.raw_retention_hours = raw_retention_hours
+        self.retention_days = retention_days
+        self.interval = interval
+        self._done_until: datetime | None = None
+        self._task: asyncio.Task | None = None
+
+        # Stats
+        self.runs = 0
+        self.errors = 0
+        self.last_run_at: datetime | None = None
+        self.last_run_seconds = 0.0
+        self.last_rows_upserted = 0
+        self.raw_purged_total = 0
+        self.rollups_purged_total = 0
+
+    async def rollup(self, db: AsyncSession, start: datetime, end: datetime) -> int:
+        """Aggregate probe results in [start, end) into hourly rollups. Does not commit."""
+        bucket = func.date_trunc("hour", ProbeResult.probed_at)
+        latency = ProbeResult.latency_ms
+        histogram = []
+        low = None
+        for high in (*LATENCY_HISTOGRAM_BOUNDS_MS, None):
+            conditions = [ProbeResult.online, latency.is_not(None)]
+            if low is not None:
+                conditions.append(latency > low)
+            if high is not None:
+                conditions.append(latency <= high)
+            histogram.append(func.count().filter(and_(*conditions)))
+            low = high
+
+        aggregated = (
+            select(
+                ProbeResult.server_id,
+                bucket,
+                func.count(),
+                func.count().filter(ProbeResult.online),
+                func.coalesce(func.sum(ProbeResult.covered_seconds), literal_column("0")),
+                func.coalesce(func.sum(ProbeResult.covered_seconds).filter(ProbeResult.online), literal_column("0")),
+                func.coalesce(cast(func.sum(latency).filter(ProbeResult.online), Float), literal_column("0")),
+                func.max(latency).filter(ProbeResult.online),
+                array(histogram),
+            )
+            .where(ProbeResult.probed_at >= start, ProbeResult.probed_at < end)
+            .group_by(ProbeResult.server_id, bucket)
+        )
+
+        columns = [
+            "server_id", "bucket_start", "probes", "successes", "seconds", "seconds_online",
+            "latency_sum_ms", "latency_max_ms", "latency_histogram",
+        ]
+        stmt = pg_insert(ProbeRollup).from_select(columns, aggregated)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["server_id", "bucket_start"],
+            set_={name: stmt.excluded[name] for name in columns[2:]},
+        )
+        result = await db.execute(stmt)
+        return result.rowcount
+
+    async def run_once(self) -> dict:
+        """Update rollups up to now and apply retention"""
+        start_time = time.perf_counter()
+        now = datetime.utcnow()
+        current_hour = floor_to_resolution(now, ROLLUP_SECONDS)
+        if self._done_until is None:
+            # First hour whose raw results are complete (rollups of older hours are final)
+            start = floor_to_resolution(now - timedelta(hours=self.raw_retention_hours), ROLLUP_SECONDS)
+            start += timedelta(seconds=ROLLUP_SECONDS)
+        else:
+            start = self._done_until - timedelta(seconds=ROLLUP_SECONDS)  # previous hour again, for late results
+
+        async with async_session() as db:
+            upserted = await self.rollup(db, start, now + timedelta(seconds=1))
+
+            result = await db.execute(
+                delete(ProbeResult).where(ProbeResult.probed_at < now - timedelta(hours=self.raw_retention_hours))
+            )
+            self.raw_purged_total += result.rowcount
+            result = await db.execute(
+                delete(ProbeRollup).where(ProbeRollup.bucket_start < now - timedelta(days=self.retention_days))
+            )
+            self.rollups_purged_total += result.rowcount
+            await db.commit()
+
+        self._done_until = current_hour
+        self.runs += 1
+        self.last_run_at = datetime.utcnow()
+        self.last_run_seconds = time.perf_counter() - start_time
+        self.last_rows_upserted = upserted
+        return {"upserted": upserted, "seconds": round(self.last_run_seconds, 3)}
+
+    async def run(self) -> None:
+        """Rollup loop"""
+        print(
+            f"Starting probe rollups (raw: {self.raw_retention_hours}h, "
+            f"hourly: {self.retention_days}d, interval: {self.interval}s)"
+        )
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                self.errors += 1
+                print(f"Probe rollup error: {e}")
+
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        """Start the background rollup job"""
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        """Cancel the background rollup job"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "runs": self.runs,
+            "errors": self.errors,
+            "last_run_at": self.last_run_at.isoformat() if self.last_run_at else None,
+            "last_run_seconds": round(self.last_run_seconds, 3),
+            "last_rows_upserted": self.last_rows_upserted,
+            "raw_purged_total": self.raw_purged_total,
+            "rollups_purged_total": self.rollups_purged_total,
+        }
+
+
+probe_rollups = ProbeRollups(
+    raw_retention_hours=settings.probe_results_retention_hours,
+    retention_days=settings.probe_rollups_retention_days,
+    interval=settings.probe_rollup_interval_seconds,
+)
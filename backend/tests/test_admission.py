@@ -0,0 +1,68 @@
+import pytest
+
+from app.services.admission import IngestLimiter
+
+
+def make_limiter(**overrides) -> IngestLimiter:
+    options = dict(rate_per_minute=60, burst=5, max_inflight=2, max_queue_depth=100, queue_retry_after=2.0)
+    options.update(overrides)
+    return IngestLimiter(**options)
+
+
+def test_burst_then_refill():
+    limiter = make_limiter()  # 1 sample per second, burst 5
+    for _ in range(5):
+        assert limiter.take("a", now=0.0) is None
+    assert limiter.take("a", now=0.0) == pytest.approx(1.0)
+    assert limiter.take("a", now=0.5) == pytest.approx(0.5)
+    assert limiter.take("a", now=1.0) is None
+    assert limiter.rejected_rate == 2
+
+
+def test_tokens_have_their_own_buckets():
+    limiter = make_limiter()
+    assert limiter.take("a", 5, now=0.0) is None
+    assert limiter.take("a", now=0.0) is not None
+    assert limiter.take("b", now=0.0) is None
+
+
+def test_charged_by_sample_count():
+    limiter = make_limiter()
+    assert limiter.take("a", 3, now=0.0) is None
+    assert limiter.take("a", 3, now=0.0) == pytest.approx(1.0)  # 2 left, 3 needed
+    assert limiter.take("a", 2, now=0.0) is None
+
+
+def test_batch_larger_than_burst_leaves_debt():
+    limiter = make_limiter()
+    assert limiter.take("a", 20, now=0.0) is None  # admitted from a full bucket
+    assert limiter.take("a", now=0.0) == pytest.approx(16.0)  # -15 available, 1 needed
+    assert limiter.take("a", 20, now=10.0) == pytest.approx(10.0)  # -5 available, a full bucket needed
+    assert limiter.take("a", 20, now=20.0) is None
+
+
+def test_refill_is_capped_at_burst():
+    limiter = make_limiter()
+    assert limiter.take("a", now=0.0) is None
+    assert limiter.take("a", 5, now=1000.0) is None
+    assert limiter.take("a", now=1000.0) is not None
+
+
+def test_idle_buckets_are_evicted(monkeypatch):
+    monkeypatch.setattr("app.services.admission.MAX_TRACKED_TOKENS", 2)
+    limiter = make_limiter()
+    limiter.take("a", now=0.0)
+    limiter.take("b", 20, now=0.0)  # in debt for 20 s
+    limiter.take("c", now=10.0)  # a has refilled by now, b hasn't
+    assert set(limiter._buckets) == {"b", "c"}
+
+
+def test_global_limits():
+    limiter = make_limiter()
+    assert limiter.admit(queue_depth=0) is None
+    assert limiter.admit(queue_depth=0) is None
+    assert limiter.admit(queue_depth=0) == 1.0  # max_inflight
+    limiter.release()
+    assert limiter.admit(queue_depth=100) == 2.0  # queue over the high-water mark
+    assert limiter.admit(queue_depth=99) is None
+    assert (limiter.rejected_inflight, limiter.rejected_queue, limiter.admitted_total) == (1, 1, 3)
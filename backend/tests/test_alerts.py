@@ -0,0 +1,77 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+import httpx
+
+from app.models import AlertRule
+from app.services.alerts import AlertEngine, CompiledRule, WebhookNotifier
+
+
+T0 = datetime(2026, 1, 1)
+
+
+def make_engine(notifiers=()) -> AlertEngine:
+    engine = AlertEngine(notifiers=list(notifiers), queue_max_size=100)
+    rule = AlertRule(id=1, name="cpu high", metric="cpu_percent", operator=">", threshold=90, duration_seconds=60)
+    engine._rules_by_server = {7: [CompiledRule(rule)]}
+    return engine
+
+
+def transitions(engine: AlertEngine) -> list[tuple[str, float]]:
+    result = []
+    while not engine._transitions.empty():
+        state, _, _, value, _ = engine._transitions.get_nowait()
+        result.append((state, value))
+    return result
+
+
+def test_rule_fires_after_duration_and_resolves():
+    engine = make_engine()
+    engine.observe(7, {"cpu_percent": 95}, T0)
+    engine.observe(7, {"cpu_percent": 96}, T0 + timedelta(seconds=30))
+    assert transitions(engine) == []
+
+    engine.observe(7, {"cpu_percent": 97}, T0 + timedelta(seconds=60))
+    assert transitions(engine) == [("firing", 97.0)]
+    assert engine.stats()["firing"] == 1
+
+    engine.observe(7, {"cpu_percent": 98}, T0 + timedelta(seconds=90))
+    engine.observe(7, {"cpu_percent": 10}, T0 + timedelta(seconds=120))
+    assert transitions(engine) == [("resolved", 10.0)]
+    assert engine.stats()["firing"] == 0
+
+
+def test_rule_ignores_out_of_order_and_other_servers():
+    engine = make_engine()
+    engine.observe(7, {"cpu_percent": 95}, T0 + timedelta(seconds=60))
+    engine.observe(7, {"cpu_percent": 95}, T0)  # older than the last evaluated sample
+    engine.observe(8, {"cpu_percent": 95}, T0 + timedelta(seconds=120))
+    engine.observe(7, {"memory_percent": 95}, T0 + timedelta(seconds=120))
+    assert transitions(engine) == []
+    assert engine.evaluations == 1
+
+
+def test_webhook_notifier_posts_json():
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(204)
+
+    notifier = WebhookNotifier("http://hooks.test/alert", timeout=1, transport=httpx.MockTransport(handler))
+    engine = make_engine([notifier])
+    asyncio.run(engine.notify({"state": "firing", "rule_id": 1, "value": 97.0}))
+
+    assert len(requests) == 1
+    assert requests[0].method == "POST"
+    assert str(requests[0].url) == "http://hooks.test/alert"
+    assert json.loads(requests[0].content) == {"state": "firing", "rule_id": 1, "value": 97.0}
+    assert engine.notify_errors == 0
+
+
+def test_webhook_notifier_errors_are_counted():
+    notifier = WebhookNotifier("http://hooks.test/alert", timeout=1, transport=httpx.MockTransport(lambda _: httpx.Response(500)))
+    engine = make_engine([notifier])
+    asyncio.run(engine.notify({"state": "resolved"}))
+    assert engine.notify_errors == 1
@@ -0,0 +1,115 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.services.anomaly import DETECTED_FIELDS, AnomalyDetector
+
+
+T0 = datetime(2026, 1, 1)
+
+
+class Feed:
+    """Feeds one server's cpu_percent (other metrics stay flat) one minute apart"""
+
+    def __init__(self, detector: AnomalyDetector, server_id: int = 1):
+        self.detector = detector
+        self.server_id = server_id
+        self.minute = 0
+
+    def __call__(self, *cpu: float) -> list[dict]:
+        before = self.detector.anomalies_total
+        for value in cpu:
+            row = {field: 50.0 for field in DETECTED_FIELDS}
+            row.update(server_id=self.server_id, cpu_percent=value, collected_at=T0 + timedelta(minutes=self.minute))
+            self.detector.observe(row)
+            self.minute += 1
+        return self.detector.anomalies(limit=1000)[:self.detector.anomalies_total - before]
+
+
+def detector(**overrides) -> AnomalyDetector:
+    options = dict(alpha=0.1, z_threshold=4.0, warmup_samples=10, history_size=100)
+    options.update(overrides)
+    return AnomalyDetector(**options)
+
+
+def noisy(n: int) -> list[float]:
+    return [20.0 + (2.0 if i % 2 else -2.0) for i in range(n)]
+
+
+def test_baseline_converges_to_the_series():
+    d = detector()
+    Feed(d)(*noisy(200))
+    baseline = d.baseline(1)["cpu_percent"]
+    assert baseline["mean"] == pytest.approx(20.0, abs=0.3)
+    assert baseline["std"] == pytest.approx(2.0, abs=0.3)
+    assert baseline["samples"] == 200
+
+
+def test_spike_beyond_threshold_is_reported_once_per_excursion():
+    d = detector(alpha=0.02)  # slow baseline, so the excursion stays anomalous
+    feed = Feed(d)
+    assert feed(*noisy(300)) == []
+
+    opened = feed(60.0, 61.0, 62.0)  # far above the baseline, three samples long
+    assert [(a["metric"], a["value"]) for a in opened] == [("cpu_percent", 60.0)]
+    assert opened[0]["z_score"] > 4.0
+    assert d.baseline(1)["cpu_percent"]["anomalous"]
+
+    feed(*noisy(30))
+    assert not d.baseline(1)["cpu_percent"]["anomalous"]
+    assert len(feed(70.0)) == 1  # a new excursion
+
+
+def test_deviation_below_threshold_is_not_reported():
+    d = detector()
+    feed = Feed(d)
+    feed(*noisy(50))
+    assert feed(26.0) == []  # ~3 std
+    assert feed(14.5) == []
+
+
+def test_no_anomalies_during_warmup():
+    d = detector(warmup_samples=10)
+    assert Feed(d)(20.0, 20.0, 90.0, 20.0) == []
+
+
+def test_flat_series_uses_the_std_floor():
+    d = detector()
+    feed = Feed(d)
+    feed(*[50.0] * 30)  # zero variance: the floor is 1% of the mean (0.5)
+    assert feed(51.5) == []  # 3 floors
+    assert len(feed(53.0)) == 1  # 6 floors
+
+
+def test_servers_have_their_own_baselines():
+    d = detector()
+    Feed(d, server_id=1)(*noisy(50))
+    Feed(d, server_id=2)(*[80.0 + x for x in noisy(50)])
+    assert Feed(d, server_id=2)(100.0) == []  # normal for server 2
+    assert d.baseline(1)["cpu_percent"]["mean"] == pytest.approx(20.0, abs=0.5)
+
+
+def test_missing_values_leave_the_baseline_alone():
+    d = detector()
+    Feed(d)(*noisy(20))
+    samples = d.baseline(1)["load_avg_1"]["samples"]
+    d.observe({**{field: None for field in DETECTED_FIELDS}, "server_id": 1, "collected_at": T0})
+    assert d.baseline(1)["load_avg_1"]["samples"] == samples
+
+
+def test_removed_servers_free_their_row():
+    d = detector()
+    Feed(d, server_id=1)(*noisy(20), 90.0)
+    d.remove(1)
+    assert d.baseline(1) is None
+    assert d.anomalies(server_id=1) == []
+    Feed(d, server_id=2)(20.0)
+    assert d.stats()["servers"] == 1
+
+
+def test_state_grows_past_the_initial_capacity():
+    d = detector()
+    for server_id in range(100):
+        Feed(d, server_id=server_id)(20.0)
+    assert d.stats()["capacity"] == 128
+    assert d.baseline(99)["cpu_percent"]["samples"] == 1
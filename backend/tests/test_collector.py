@@ -0,0 +1,120 @@
+import asyncio
+
+import httpx
+
+from app.services.collector import NodeExporterCollector, NodeExporterParser, build_exporter_row
+
+
+GIB = 1024 ** 3
+
+
+def exposition(idle: float, user: float) -> str:
+    return "\n".join([
+        "# HELP node_cpu_seconds_total Seconds the CPUs spent in each mode.",
+        "# TYPE node_cpu_seconds_total counter",
+        f'node_cpu_seconds_total{{cpu="0",mode="idle"}} {idle}',
+        f'node_cpu_seconds_total{{cpu="0",mode="user"}} {user}',
+        f'node_cpu_seconds_total{{cpu="1",mode="idle"}} {idle}',
+        f'node_cpu_seconds_total{{cpu="1",mode="user"}} {user}',
+        f"node_memory_MemTotal_bytes {8 * GIB}",
+        f"node_memory_MemAvailable_bytes {6 * GIB}",
+        f'node_filesystem_size_bytes{{device="/dev/sda1",fstype="ext4",mountpoint="/"}} {100 * GIB}',
+        f'node_filesystem_free_bytes{{device="/dev/sda1",fstype="ext4",mountpoint="/"}} {60 * GIB}',
+        f'node_filesystem_avail_bytes{{device="/dev/sda1",fstype="ext4",mountpoint="/"}} {55 * GIB}',
+        f'node_filesystem_size_bytes{{device="tmpfs",fstype="tmpfs",mountpoint="/run"}} {1 * GIB}',
+        "node_load1 0.5",
+        "node_load5 0.25",
+        "node_load15 0.125",
+        "node_boot_time_seconds 1700000000",
+        "node_time_seconds 1700003600.5",
+        "node_network_receive_bytes_total{device=\"eth0\"} 123",
+        "",
+    ])
+
+
+class FakeExporter:
+    """node_exporter whose CPU counters advance on every scrape"""
+
+    def __init__(self):
+        self.scrapes = 0
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        if request.url.host == "down.test":
+            raise httpx.ConnectError("connection refused", request=request)
+        if request.url.host == "broken.test":
+            return httpx.Response(500)
+        self.scrapes += 1
+        # Each scrape: 30 s idle and 10 s user per CPU -> 25% busy
+        return httpx.Response(200, text=exposition(idle=1000 + 30 * self.scrapes, user=100 + 10 * self.scrapes))
+
+
+def scrape_all(collector: NodeExporterCollector, targets: list[tuple[int, str]]) -> list:
+    async def run():
+        semaphore = asyncio.Semaphore(collector.max_concurrency)
+        async with httpx.AsyncClient(transport=collector.transport) as client:
+            return await asyncio.gather(*(
+                collector._scrape_target(client, semaphore, server_id, url) for server_id, url in targets
+            ))
+    return asyncio.run(run())
+
+
+def test_parser_keeps_only_needed_families():
+    parser = NodeExporterParser()
+    for line in exposition(idle=100, user=50).splitlines():
+        parser.feed(line)
+    assert parser.cpu_total == 300
+    assert parser.cpu_idle == 200
+    assert parser.values["node_filesystem_size_bytes"] == 100 * GIB  # root mount only
+    assert "node_network_receive_bytes_total" not in parser.values
+
+
+def test_first_scrape_only_sets_cpu_baseline():
+    parser = NodeExporterParser()
+    for line in exposition(idle=100, user=50).splitlines():
+        parser.feed(line)
+    assert build_exporter_row(1, parser, None, None) is None
+
+
+def test_scrape_builds_row_from_counter_deltas():
+    collector = NodeExporterCollector(interval=60, timeout=1, max_concurrency=4, transport=httpx.MockTransport(FakeExporter()))
+    target = [(1, "http://node.test:9100/metrics")]
+    assert scrape_all(collector, target) == [None]
+
+    [row] = scrape_all(collector, target)
+    assert row["server_id"] == 1
+    assert row["cpu_percent"] == 25.0
+    assert row["memory_percent"] == 25.0
+    assert row["memory_total_mb"] == 8192
+    assert row["disk_percent"] == 42.1  # used / (used + avail), like psutil
+    assert row["disk_total_gb"] == 100.0
+    assert row["uptime_seconds"] == 3600
+    assert row["load_avg_15"] == 0.12
+    assert collector.scrape_errors == 0
+
+
+def test_failing_targets_do_not_abort_the_others():
+    collector = NodeExporterCollector(interval=60, timeout=1, max_concurrency=2, transport=httpx.MockTransport(FakeExporter()))
+    targets = [
+        (1, "http://node.test:9100/metrics"),
+        (2, "http://[::1"),
+        (3, "http://down.test/metrics"),
+        (4, "http://broken.test/metrics"),
+    ]
+    scrape_all(collector, targets)
+    rows = scrape_all(collector, targets)
+
+    assert rows[0] is not None and rows[0]["server_id"] == 1
+    assert rows[1:] == [None, None, None]
+    assert collector.scrape_errors == 6
+    assert set(collector.last_errors) == {2, 3, 4}
+
+
+def test_slow_target_times_out():
+    async def slow(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(1)
+        return httpx.Response(200, text="")
+
+    collector = NodeExporterCollector(interval=60, timeout=0.05, max_concurrency=1, transport=httpx.MockTransport(slow))
+    assert scrape_all(collector, [(1, "http://slow.test/metrics")]) == [None]
+    assert collector.timeouts == 1
+    assert collector.last_errors == {1: "timeout"}
@@ -0,0 +1,49 @@
+import numpy as np
+
+from app.services.downsample import lttb_indices
+
+
+def test_short_series_and_small_thresholds_are_untouched():
+    x = np.arange(10, dtype=np.float64)
+    y = np.sin(x)
+    assert lttb_indices(x, y, 10).tolist() == list(range(10))
+    assert lttb_indices(x, y, 50).tolist() == list(range(10))
+    assert lttb_indices(x, y, 2).tolist() == list(range(10))
+
+
+def test_keeps_endpoints_and_returns_threshold_ascending_indices():
+    x = np.arange(1000, dtype=np.float64)
+    y = np.random.default_rng(1).normal(size=1000)
+    for threshold in (3, 4, 10, 99, 500, 999):
+        indices = lttb_indices(x, y, threshold)
+        assert len(indices) == threshold
+        assert indices[0] == 0 and indices[-1] == 999
+        assert np.all(np.diff(indices) > 0)
+
+
+def test_one_point_per_bucket():
+    # threshold - 2 buckets over the inner points, each selected point lies in its own bucket
+    n, threshold = 103, 12
+    x = np.arange(n, dtype=np.float64)
+    indices = lttb_indices(x, np.cos(x / 7), threshold)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    for i, index in enumerate(indices[1:-1]):
+        assert edges[i] <= index < edges[i + 1]
+
+
+def test_keeps_spikes():
+    x = np.arange(500, dtype=np.float64)
+    y = np.zeros(500)
+    y[137] = 100.0
+    y[402] = -50.0
+    indices = lttb_indices(x, y, 20)
+    assert 137 in indices
+    assert 402 in indices
+
+
+def test_missing_values_count_as_zero():
+    x = np.arange(100, dtype=np.float64)
+    y = np.ones(100)
+    y[10:20] = np.nan
+    indices = lttb_indices(x, y, 10)
+    assert len(indices) == 10
@@ -0,0 +1,65 @@
+import asyncio
+
+import app.services.events as events
+from app.services.events import EventHub
+
+
+class FakeSession:
+    """AsyncSession stand-in returning (server_id, folder_id) rows"""
+
+    def __init__(self, server_folders: dict[int, int]):
+        self.server_folders = server_folders
+
+    async def execute(self, stmt):
+        rows = list(self.server_folders.items())
+        return type("Result", (), {"all": lambda self: rows})()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+def reload(monkeypatch, hub: EventHub, server_folders: dict[int, int]) -> None:
+    monkeypatch.setattr(events, "async_session", lambda: FakeSession(server_folders))
+    asyncio.run(hub.reload())
+
+
+def pending_servers(subscription) -> set[int]:
+    return {server_id for _, server_id in subscription._pending}
+
+
+def test_filters_by_server_and_folder(monkeypatch):
+    hub = EventHub(max_pending=10, keepalive=1.0)
+    reload(monkeypatch, hub, {1: 10, 2: 10, 3: 20, 4: 30})
+    everything = hub.subscribe()
+    by_server = hub.subscribe(server_ids={3})
+    by_folder = hub.subscribe(folder_ids={10})
+    both = hub.subscribe(server_ids={4}, folder_ids={10})
+
+    for server_id in (1, 2, 3, 4):
+        hub.publish("status", server_id, {"status": "online"})
+
+    assert pending_servers(everything) == {1, 2, 3, 4}
+    assert pending_servers(by_server) == {3}
+    assert pending_servers(by_folder) == {1, 2}
+    assert pending_servers(both) == {1, 2, 4}
+
+
+def test_folder_stream_follows_added_and_moved_servers(monkeypatch):
+    hub = EventHub(max_pending=10, keepalive=1.0)
+    reload(monkeypatch, hub, {1: 10, 2: 20})
+    subscription = hub.subscribe(folder_ids={10})
+
+    # Server 2 moves into the folder and server 3 is created in it after the client connected
+    reload(monkeypatch, hub, {1: 10, 2: 10, 3: 10})
+    for server_id in (1, 2, 3):
+        hub.publish("status", server_id, {"status": "online"})
+    assert pending_servers(subscription) == {1, 2, 3}
+
+    # Server 1 moves out
+    reload(monkeypatch, hub, {1: 20, 2: 10, 3: 10})
+    asyncio.run(subscription.next_batch(timeout=0))
+    hub.publish("status", 1, {"status": "offline"})
+    assert pending_servers(subscription) == set()
@@ -0,0 +1,97 @@
+import asyncio
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+
+import app.services.export as export
+from app.services.export import EXPORT_COLUMNS, stream_metrics
+
+
+T0 = datetime(2026, 1, 1)
+
+
+def rows(server_id: int, start: int, count: int) -> list[tuple]:
+    return [
+        (server_id, T0 + timedelta(minutes=i), 10.0 + i, 50.0, 1024, 2048, 30.0, 3.0, 10.0, 3600, None, None, None)
+        for i in range(start, start + count)
+    ]
+
+
+class CursorSession:
+    """
+    Session stand-in without compressed chunks: db.stream() hands out the
+    given partitions and logs when each one is fetched.
+    """
+
+    def __init__(self, partitions: list[list[tuple]], log: list[str]):
+        self.partitions = partitions
+        self.log = log
+        self.statements = []
+
+    async def execute(self, stmt):
+        return type("Result", (), {"scalar": lambda self: False})()  # no chunks in the range
+
+    async def stream(self, stmt):
+        self.statements.append(stmt)
+        session = self
+
+        class Result:
+            async def partitions(self):
+                for i, partition in enumerate(session.partitions):
+                    session.log.append(f"fetch {i}")
+                    yield partition
+
+        return Result()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+def export_all(monkeypatch, partitions: list[list[tuple]], format: str) -> tuple[list[str], list[str], CursorSession]:
+    log = []
+    session = CursorSession(partitions, log)
+    monkeypatch.setattr(export, "async_session", lambda: session)
+
+    async def consume():
+        pieces = []
+        async for piece in stream_metrics(None, T0, T0 + timedelta(days=1), format):
+            log.append("yield")
+            pieces.append(piece)
+        return pieces
+
+    return asyncio.run(consume()), log, session
+
+
+def test_ndjson_rows_are_yielded_per_cursor_partition(monkeypatch):
+    partitions = [rows(1, 0, 3), rows(1, 3, 2) + rows(2, 0, 1)]
+    pieces, log, session = export_all(monkeypatch, partitions, "ndjson")
+
+    # Every partition is written out before the next one is fetched
+    assert log == ["fetch 0", "yield", "fetch 1", "yield"]
+    records = [json.loads(line) for piece in pieces for line in piece.splitlines()]
+    assert [(r["server_id"], r["cpu_percent"]) for r in records] == [(1, 10.0), (1, 11.0), (1, 12.0), (1, 13.0), (1, 14.0), (2, 10.0)]
+    assert records[0]["collected_at"] == "2026-01-01T00:00:00"
+    assert records[0]["load_avg_1"] is None
+    assert list(records[0]) == list(EXPORT_COLUMNS)
+
+    # Server-side cursor in EXPORT_CHUNK_ROWS steps
+    assert session.statements[0].get_execution_options()["yield_per"] == export.EXPORT_CHUNK_ROWS
+
+
+def test_csv_starts_with_a_header(monkeypatch):
+    pieces, log, _ = export_all(monkeypatch, [rows(4, 0, 2)], "csv")
+    assert log == ["yield", "fetch 0", "yield"]  # header before the first fetch
+    table = list(csv.reader(io.StringIO("".join(pieces))))
+    assert table[0] == list(EXPORT_COLUMNS)
+    assert table[1][:3] == ["4", "2026-01-01T00:00:00", "10.0"]
+    assert table[2][-1] == ""  # NULL load average
+    assert len(table) == 3
+
+
+def test_empty_range(monkeypatch):
+    pieces, _, _ = export_all(monkeypatch, [], "ndjson")
+    assert pieces == []
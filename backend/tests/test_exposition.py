@@ -0,0 +1,93 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+import app.services.exposition as exposition
+from app.services.exposition import PrometheusExporter
+from app.services.latest import LatestMetricsCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+def exporter(monkeypatch, cache_seconds: float = 5.0) -> tuple[PrometheusExporter, Clock, LatestMetricsCache]:
+    clock, latest = Clock(), LatestMetricsCache()
+    monkeypatch.setattr(exposition, "time", clock)
+    monkeypatch.setattr(exposition, "latest_metrics", latest)
+    result = PrometheusExporter(cache_seconds=cache_seconds)
+    result.update_servers([
+        SimpleNamespace(id=1, name="web-1", status="online", last_ping=25, last_check=datetime(2026, 1, 1)),
+        SimpleNamespace(id=2, name='db "main"', status="offline", last_ping=None, last_check=None),
+        SimpleNamespace(id=3, name="new", status="unknown", last_ping=None, last_check=None),
+    ])
+    return result, clock, latest
+
+
+def samples(body: bytes) -> dict[str, str]:
+    """Sample lines as {name{labels}: value}"""
+    return dict(line.rsplit(" ", 1) for line in body.decode().splitlines() if line and not line.startswith("#"))
+
+
+def test_server_state_lines(monkeypatch):
+    prometheus, _, _ = exporter(monkeypatch)
+    lines = samples(prometheus.render())
+    assert lines['vps_server_up{server_id="1",server="web-1"}'] == "1"
+    assert lines['vps_server_up{server_id="2",server="db \\"main\\""}'] == "0"
+    assert not any(key.startswith("vps_server_up{server_id=\"3\"") for key in lines)  # never probed
+    assert lines['vps_server_ping_latency_seconds{server_id="1",server="web-1"}'] == "0.025"
+    assert lines['vps_server_last_check_timestamp_seconds{server_id="1",server="web-1"}'] == "1767225600.0"
+
+
+def test_host_metrics_in_base_units(monkeypatch):
+    prometheus, _, latest = exporter(monkeypatch)
+    latest.update({
+        "server_id": 1, "collected_at": datetime(2026, 1, 1), "cpu_percent": 12.5, "memory_percent": 50.0,
+        "memory_used_mb": 512, "memory_total_mb": 1024, "disk_percent": 10.0, "disk_used_gb": 2.0,
+        "disk_total_gb": 20.0, "uptime_seconds": 60, "load_avg_1": None, "load_avg_5": None, "load_avg_15": None,
+    })
+    latest.update({"server_id": 99, "collected_at": datetime(2026, 1, 1), "cpu_percent": 1.0})  # not in the registry
+    lines = samples(prometheus.render())
+    assert lines['vps_cpu_usage_percent{server_id="1",server="web-1"}'] == "12.5"
+    assert lines['vps_memory_used_bytes{server_id="1",server="web-1"}'] == str(512 * 1024 ** 2)
+    assert 'vps_load1{server_id="1",server="web-1"}' not in lines
+    assert not any('server_id="99"' in key for key in lines)
+
+
+def test_counter_names_per_format(monkeypatch):
+    prometheus, _, _ = exporter(monkeypatch)
+    text = prometheus.render().decode()
+    assert "# TYPE vps_alerts_fired_total counter" in text
+    assert not text.rstrip().endswith("# EOF")
+
+    openmetrics = prometheus.render(openmetrics=True).decode()
+    assert "# TYPE vps_alerts_fired counter" in openmetrics
+    assert "\nvps_alerts_fired_total " in openmetrics
+    assert openmetrics.endswith("# EOF\n")
+
+
+def test_render_is_cached_per_format(monkeypatch):
+    prometheus, clock, _ = exporter(monkeypatch, cache_seconds=5.0)
+    first = prometheus.render()
+    prometheus.update_status(1, "offline", None, datetime(2026, 1, 1, 0, 1))
+
+    clock.now += 4.9
+    assert prometheus.render() is first  # stale by design until the cache expires
+    prometheus.render(openmetrics=True)  # has its own cache entry
+    assert prometheus.renders == 2
+
+    clock.now += 0.1
+    refreshed = samples(prometheus.render())
+    assert refreshed['vps_server_up{server_id="1",server="web-1"}'] == "0"
+    assert prometheus.renders == 3
+    assert prometheus.scrapes == 4
+
+
+def test_status_of_unregistered_servers_is_ignored(monkeypatch):
+    prometheus, _, _ = exporter(monkeypatch, cache_seconds=0)
+    prometheus.update_status(42, "online", 10, datetime(2026, 1, 1))
+    assert prometheus.stats()["servers"] == 3
+    assert not any('server_id="42"' in key for key in samples(prometheus.render()))
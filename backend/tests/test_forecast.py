@@ -0,0 +1,49 @@
+import numpy as np
+
+from app.services.forecast import huber_trend
+
+
+def fit(xs: list[list[float]], ys: list[list[float]]) -> tuple[np.ndarray, np.ndarray]:
+    """Pad rows of different lengths into the matrices huber_trend takes"""
+    width = max(len(row) for row in xs)
+    x = np.zeros((len(xs), width))
+    y = np.zeros((len(xs), width))
+    mask = np.zeros((len(xs), width), dtype=bool)
+    for i, (row_x, row_y) in enumerate(zip(xs, ys)):
+        x[i, :len(row_x)] = row_x
+        y[i, :len(row_y)] = row_y
+        mask[i, :len(row_x)] = True
+    return huber_trend(x, y, mask)
+
+
+def test_exact_line():
+    x = np.arange(24, dtype=np.float64)
+    slope, intercept = fit([x], [40 + 0.5 * x])
+    assert np.allclose(slope, [0.5])
+    assert np.allclose(intercept, [40.0])
+
+
+def test_rows_are_fitted_independently_with_padding():
+    x1 = np.arange(48, dtype=np.float64)
+    x2 = np.arange(10, dtype=np.float64) * 3
+    slope, intercept = fit([x1, x2], [10 + 2 * x1, 90 - x2])
+    assert np.allclose(slope, [2.0, -1.0])
+    assert np.allclose(intercept, [10.0, 90.0])
+
+
+def test_outliers_barely_move_the_fit():
+    rng = np.random.default_rng(3)
+    x = np.arange(100, dtype=np.float64)
+    y = 20 + 0.3 * x + rng.normal(0, 0.2, size=100)
+    y[[10, 40, 70]] += 60  # e.g. a temporary dump that was deleted again
+
+    slope, intercept = fit([x], [y])
+    ols_slope = np.polyfit(x, y, 1)[0]
+    assert abs(slope[0] - 0.3) < 0.01
+    assert abs(slope[0] - 0.3) < abs(ols_slope - 0.3)
+    assert abs(intercept[0] - 20) < 0.5
+
+
+def test_degenerate_rows_are_nan():
+    slope, intercept = fit([[5.0], [3.0, 3.0, 3.0]], [[1.0], [1.0, 2.0, 3.0]])
+    assert np.isnan(slope).all()
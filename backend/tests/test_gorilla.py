@@ -0,0 +1,78 @@
+import math
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from app.services.gorilla import decode_chunk, encode_chunk
+
+
+T0 = datetime(2026, 1, 1, 12, 0, 0)
+
+
+def roundtrip(timestamps, columns):
+    decoded_timestamps, decoded_columns = decode_chunk(encode_chunk(timestamps, columns))
+    assert decoded_timestamps == timestamps
+    assert len(decoded_columns) == len(columns)
+    for decoded, original in zip(decoded_columns, columns):
+        assert len(decoded) == len(original)
+        for a, b in zip(decoded, original):
+            if b is None:
+                assert a is None
+            elif math.isnan(b):
+                assert math.isnan(a)
+            else:
+                assert a == b  # lossless, bit for bit
+    return decoded_columns
+
+
+def test_regular_series():
+    timestamps = [T0 + timedelta(seconds=60 * i) for i in range(500)]
+    roundtrip(timestamps, [
+        [12.5] * 500,
+        [float(i % 7) for i in range(500)],
+        [2048.0 + i for i in range(500)],
+    ])
+
+
+def test_irregular_timestamps_hit_every_delta_of_delta_bucket():
+    offsets_ms = [0, 1, 2, 1000, 1063, 1400, 3000, 200_000, 200_001, 5_000_000_000, 5_000_000_060, 9_000_000_000_000]
+    timestamps = [T0 + timedelta(milliseconds=ms) for ms in offsets_ms]
+    roundtrip(timestamps, [[float(i) for i in range(len(timestamps))]])
+
+
+def test_random_floats_and_special_values():
+    rng = np.random.default_rng(7)
+    values = rng.normal(50, 20, size=300).tolist()
+    values[10:13] = [0.0, -0.0, 1e-300]
+    values[100] = float("inf")
+    values[101] = float("-inf")
+    values[200] = float("nan")
+    timestamps = [T0 + timedelta(seconds=15 * i) for i in range(300)]
+    roundtrip(timestamps, [values])
+
+
+def test_missing_values():
+    timestamps = [T0 + timedelta(seconds=60 * i) for i in range(6)]
+    roundtrip(timestamps, [
+        [None, 1.0, None, 2.0, 2.0, None],
+        [None] * 6,
+        [0.5] * 6,
+    ])
+
+
+def test_single_and_empty_chunks():
+    roundtrip([T0], [[3.25], [None]])
+    assert decode_chunk(encode_chunk([], [[], []])) == ([], [[], []])
+
+
+def test_timestamps_keep_millisecond_precision():
+    timestamps, _ = decode_chunk(encode_chunk([T0 + timedelta(microseconds=123_456)], [[1.0]]))
+    assert timestamps == [T0 + timedelta(milliseconds=123)]
+
+
+def test_unknown_version_is_rejected():
+    data = bytearray(encode_chunk([T0], [[1.0]]))
+    data[0] = 99
+    with pytest.raises(ValueError):
+        decode_chunk(bytes(data))
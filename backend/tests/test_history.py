@@ -0,0 +1,66 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from app.services.history import SERIES_COLUMNS, pack_series, series_columns
+from app.services.metrics import METRIC_FIELDS
+
+
+T0 = datetime(2026, 1, 1)
+T0_EPOCH = 1767225600
+
+
+def series(n: int = 3, **overrides) -> dict[str, list]:
+    """n points one minute apart, metric i has the value i + point index / 10"""
+    result = {
+        "collected_at": [T0 + timedelta(minutes=i) for i in range(n)],
+        "sample_count": [1] * n,
+    }
+    for j, field in enumerate(METRIC_FIELDS):
+        result[field] = [j + i / 10 for i in range(n)]
+    result.update(overrides)
+    assert set(result) == set(SERIES_COLUMNS)
+    return result
+
+
+def unpack(data: bytes, n: int) -> tuple[np.ndarray, dict[str, np.ndarray]]:
+    timestamps = np.frombuffer(data, dtype="<u4", count=n)
+    metrics = {}
+    offset = 4 * n
+    for field in METRIC_FIELDS:
+        metrics[field] = np.frombuffer(data, dtype="<f4", count=n, offset=offset)
+        offset += 4 * n
+    assert offset == len(data)
+    return timestamps, metrics
+
+
+def test_columnar_has_epoch_timestamps_and_one_array_per_metric():
+    columns = series_columns(series())
+    assert columns["timestamps"] == [T0_EPOCH, T0_EPOCH + 60, T0_EPOCH + 120]
+    assert columns["sample_count"] == [1, 1, 1]
+    assert list(columns["metrics"]) == list(METRIC_FIELDS)
+    assert columns["metrics"]["disk_percent"] == series()["disk_percent"]
+
+
+def test_binary_layout():
+    data = pack_series(series())
+    assert len(data) == 3 * 4 * (1 + len(METRIC_FIELDS))
+
+    timestamps, metrics = unpack(data, 3)
+    assert timestamps.tolist() == [T0_EPOCH, T0_EPOCH + 60, T0_EPOCH + 120]
+    for j, field in enumerate(METRIC_FIELDS):
+        assert metrics[field] == pytest.approx([j, j + 0.1, j + 0.2], abs=1e-5)
+
+
+def test_binary_missing_values_are_nan():
+    data = pack_series(series(load_avg_1=[0.5, None, 1.5]))
+    _, metrics = unpack(data, 3)
+    assert np.isnan(metrics["load_avg_1"]).tolist() == [False, True, False]
+
+
+def test_empty_series():
+    empty = {name: [] for name in SERIES_COLUMNS}
+    assert pack_series(empty) == b""
+    assert series_columns(empty)["timestamps"] == []
+
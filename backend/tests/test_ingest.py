@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import app.routers.metrics as metrics_router
+import app.services.ingest as ingest
+from app.services.events import EventHub
+from app.services.latest import LatestMetricsCache
+
+
+class Recorder:
+    def __init__(self):
+        self.calls = []
+
+    def observe(self, *args):
+        self.calls.append(args)
+
+
+def row(server_id: int, collected_at: datetime, cpu: float) -> dict:
+    return {
+        "server_id": server_id, "collected_at": collected_at,
+        "cpu_percent": cpu, "memory_percent": 1.0, "memory_used_mb": 1, "memory_total_mb": 2,
+        "disk_percent": 1.0, "disk_used_gb": 1.0, "disk_total_gb": 2.0, "uptime_seconds": 1,
+        "load_avg_1": None, "load_avg_5": None, "load_avg_15": None,
+    }
+
+
+def test_publish_ingested_feeds_every_consumer_oldest_first(monkeypatch):
+    latest, hub, alerts, anomalies = LatestMetricsCache(), EventHub(max_pending=10, keepalive=1.0), Recorder(), Recorder()
+    monkeypatch.setattr(ingest, "latest_metrics", latest)
+    monkeypatch.setattr(ingest, "event_hub", hub)
+    monkeypatch.setattr(ingest, "alert_engine", alerts)
+    monkeypatch.setattr(ingest, "anomaly_detector", anomalies)
+    subscription = hub.subscribe()
+
+    now = datetime(2026, 1, 1)
+    rows = [row(1, now, 30.0), row(2, now, 50.0), row(1, now - timedelta(minutes=5), 10.0)]
+    ingest.publish_ingested(rows)
+
+    assert latest.get(1)["cpu_percent"] == 30.0
+    assert [at for _, _, at in alerts.calls] == [now - timedelta(minutes=5), now, now]
+    assert [r["cpu_percent"] for r, in anomalies.calls] == [10.0, 30.0, 50.0]
+    assert hub.published_total == 2  # latest row per server
+    assert {event for event, _ in subscription._pending} == {"metrics"}
+
+
+def test_full_queue_asks_agents_to_retry_later(monkeypatch):
+    async def resolve(token):
+        return 1
+
+    monkeypatch.setattr(metrics_router.agent_token_cache, "resolve", resolve)
+    monkeypatch.setattr(metrics_router.ingest_limiter, "queue_retry_after", 2.5)
+    monkeypatch.setattr(metrics_router.ingest_queue, "enqueue", lambda row: False)
+
+    app = FastAPI()
+    app.include_router(metrics_router.router)
+    sample = row(1, datetime(2026, 1, 1), 10.0)
+    del sample["server_id"], sample["collected_at"]
+    response = TestClient(app).post("/metrics/submit", json=sample, headers={"X-Agent-Token": "agent"})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "3"
@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import app.routers.servers as servers_router
+from app.database import get_db
+from app.services.latest import LatestMetricsCache
+
+
+T0 = datetime(2026, 1, 1, 12, 0)
+
+
+def row(server_id: int, collected_at: datetime, cpu: float = 10.0) -> dict:
+    return {
+        "server_id": server_id, "collected_at": collected_at,
+        "cpu_percent": cpu, "memory_percent": 40.0, "memory_used_mb": 800, "memory_total_mb": 2000,
+        "disk_percent": 55.0, "disk_used_gb": 11.0, "disk_total_gb": 20.0, "uptime_seconds": 3600,
+        "load_avg_1": 0.5, "load_avg_5": 0.4, "load_avg_15": 0.3,
+    }
+
+
+def test_older_samples_never_replace_newer_ones():
+    cache = LatestMetricsCache()
+    cache.update(row(1, T0, cpu=20.0))
+    cache.update(row(1, T0 - timedelta(minutes=1), cpu=99.0))  # late batch sample
+    assert cache.get(1)["cpu_percent"] == 20.0
+
+    cache.update_many([row(1, T0 + timedelta(minutes=1), cpu=30.0), row(2, T0)])
+    assert cache.get(1)["cpu_percent"] == 30.0
+    assert cache.stats() == {"servers": 2}
+
+
+def test_current_all_format():
+    cache = LatestMetricsCache()
+    cache.update(row(7, T0))
+    assert cache.current_all() == {
+        "7": {
+            "cpu_percent": 10.0, "memory_percent": 40.0, "memory_used_mb": 800,
+            "memory_total_mb": 2000, "disk_percent": 55.0, "collected_at": "2026-01-01T12:00:00",
+        }
+    }
+
+
+def test_remove_and_clear():
+    cache = LatestMetricsCache()
+    cache.update_many([row(1, T0), row(2, T0)])
+    cache.remove(1)
+    cache.remove(42)  # unknown servers are ignored
+    assert cache.get(1) is None and cache.get(2) is not None
+    cache.clear()
+    assert cache.current_all() == {}
+
+
+def test_deleting_a_server_evicts_its_sample(monkeypatch):
+    cache = LatestMetricsCache()
+    cache.update_many([row(1, T0), row(2, T0)])
+
+    class Session:
+        async def execute(self, stmt):
+            return type("Result", (), {"scalar_one_or_none": lambda self: object()})()
+
+        async def delete(self, instance):
+            pass
+
+        async def commit(self):
+            pass
+
+    async def fake_db():
+        yield Session()
+
+    async def reload():
+        pass
+
+    monkeypatch.setattr(servers_router, "latest_metrics", cache)
+    monkeypatch.setattr(servers_router.alert_engine, "reload", reload)
+    app = FastAPI()
+    app.include_router(servers_router.router)
+    app.dependency_overrides[get_db] = fake_db
+
+    assert TestClient(app).delete("/servers/1").status_code == 204
+    assert cache.get(1) is None
+    assert cache.get(2) is not None
@@ -0,0 +1,327 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import app.services.ping as ping
+from app.services.exposition import PrometheusExporter
+from app.services.ping import PingResultWriter, ProbePolicy, ProbeScheduler, ping_server_multi_port
+
+
+INTERVAL = 60.0
+CONFIRM = 5.0
+
+
+def make_policy(**overrides) -> ProbePolicy:
+    options = dict(
+        interval=INTERVAL,
+        max_interval=300.0,
+        stable_after=3,
+        confirm_interval=CONFIRM,
+        confirm_failures=3,
+        confirm_successes=2,
+        flap_window=3600.0,
+        flap_enter=4,
+        flap_exit=2,
+    )
+    options.update(overrides)
+    return ProbePolicy(**options)
+
+
+def feed(policy: ProbePolicy, state, outcomes: str, now: float = 0.0) -> list[tuple[str, float]]:
+    """Apply outcomes ("+" success, "-" failure) one second apart; (status, delay) after each"""
+    trace = []
+    for i, outcome in enumerate(outcomes):
+        delay = policy.observe(state, outcome == "+", now + i)
+        trace.append((state.status, delay))
+    return trace
+
+
+def test_unknown_takes_the_first_result():
+    policy = make_policy()
+    state = policy.new_state("unknown")
+    assert feed(policy, state, "-") == [("offline", INTERVAL)]
+    state = policy.new_state("unknown")
+    assert feed(policy, state, "+") == [("online", INTERVAL)]
+    assert policy.transitions_total == 0
+
+
+def test_interval_grows_while_stable_up_to_max():
+    policy = make_policy()
+    state = policy.new_state("online")
+    delays = [delay for _, delay in feed(policy, state, "++++++")]
+    assert delays == [60, 60, 120, 240, 300, 300]
+
+
+def test_offline_needs_confirmed_failures():
+    policy = make_policy()
+    state = policy.new_state("online")
+    feed(policy, state, "+++++")
+    assert feed(policy, state, "--") == [("online", CONFIRM), ("online", CONFIRM)]
+    assert state.interval == INTERVAL  # back to the base interval once suspect
+    assert feed(policy, state, "-") == [("offline", INTERVAL)]
+    assert policy.transitions_total == 1
+
+
+def test_single_failure_is_suppressed():
+    policy = make_policy()
+    state = policy.new_state("online")
+    assert feed(policy, state, "--+--+") == [
+        ("online", CONFIRM), ("online", CONFIRM), ("online", INTERVAL),
+        ("online", CONFIRM), ("online", CONFIRM), ("online", INTERVAL),
+    ]
+    assert policy.transitions_total == 0
+
+
+def test_recovery_needs_confirmed_successes():
+    policy = make_policy()
+    state = policy.new_state("offline")
+    assert feed(policy, state, "-+-++") == [
+        ("offline", INTERVAL), ("offline", CONFIRM), ("offline", INTERVAL),
+        ("offline", CONFIRM), ("online", INTERVAL),
+    ]
+
+
+def test_flapping_doubles_confirmations_until_it_settles():
+    policy = make_policy()
+    state = policy.new_state("online")
+    # Four status changes within the window
+    feed(policy, state, "---" "++" "---" "++")
+    assert policy.transitions_total == 4
+    assert not state.flapping  # evaluated on the next probe
+
+    # Flapping now: three failures are not enough any more, six are
+    assert feed(policy, state, "---")[-1] == ("online", CONFIRM)
+    assert state.flapping
+    assert feed(policy, state, "---")[-1] == ("offline", INTERVAL)
+
+    # No growth of the interval while flapping
+    feed(policy, state, "++++", now=100)
+    assert feed(policy, state, "+++++", now=200)[-1] == ("online", INTERVAL)
+
+
+def test_flapping_ends_when_changes_leave_the_window():
+    policy = make_policy(flap_window=100.0)
+    state = policy.new_state("online")
+    feed(policy, state, "---" "++" "---" "++" "+")
+    assert state.flapping
+
+    # Much later all changes are out of the window (below flap_exit)
+    feed(policy, state, "+", now=1000)
+    assert not state.flapping
+    assert feed(policy, state, "---", now=1001)[-1] == ("offline", INTERVAL)
+
+
+class FakeProbes:
+    """ping_server stand-in: port -> (delay seconds, online); records finished and cancelled probes"""
+
+    def __init__(self, ports: dict[int, tuple[float, bool]]):
+        self.ports = ports
+        self.finished: list[int] = []
+        self.cancelled: list[int] = []
+
+    async def __call__(self, ip: str, port: int) -> tuple[bool, int | None]:
+        delay, online = self.ports[port]
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            self.cancelled.append(port)
+            raise
+        self.finished.append(port)
+        return online, int(delay * 1000) if online else None
+
+
+def race(monkeypatch, ports: dict[int, tuple[float, bool]], stagger: float = 0.0):
+    probes = FakeProbes(ports)
+    monkeypatch.setattr(ping, "ping_server", probes)
+    return asyncio.run(ping_server_multi_port("192.0.2.1", list(ports), stagger=stagger)), probes
+
+
+def test_first_success_wins_and_cancels_the_rest(monkeypatch):
+    result, probes = race(monkeypatch, {22: (0.5, True), 80: (0.05, True), 443: (0.5, False)})
+    assert result == (True, 50)
+    assert probes.finished == [80]
+    assert sorted(probes.cancelled) == [22, 443]
+
+
+def test_failures_do_not_end_the_race(monkeypatch):
+    result, probes = race(monkeypatch, {22: (0.01, False), 80: (0.05, True), 443: (0.5, True)})
+    assert result == (True, 50)
+    assert probes.cancelled == [443]
+
+
+def test_all_failing_returns_offline(monkeypatch):
+    result, probes = race(monkeypatch, {22: (0.03, False), 80: (0.01, False), 443: (0.02, False)})
+    assert result == (False, None)
+    assert sorted(probes.finished) == [22, 80, 443]
+    assert probes.cancelled == []
+
+
+def test_later_ports_start_after_the_stagger(monkeypatch):
+    # Port 22 answers before port 80's stagger delay is over, so 80 never runs
+    result, probes = race(monkeypatch, {22: (0.01, True), 80: (0.01, True)}, stagger=0.5)
+    assert result == (True, 10)
+    assert probes.finished == [22]
+    assert probes.cancelled == []
+
+
+class Clock:
+    def __init__(self, now: float):
+        self.now = now
+
+    def monotonic(self) -> float:
+        return self.now
+
+    perf_counter = monotonic
+
+
+class ServerList:
+    """async_session stand-in for ProbeScheduler.refresh: select(Server) returns the current list"""
+
+    def __init__(self, *server_ids: int):
+        self.servers = [SimpleNamespace(id=i, ip=f"192.0.2.{i}", name=f"s{i}", status="unknown", last_ping=None, last_check=None) for i in server_ids]
+
+    async def execute(self, stmt):
+        servers = self.servers
+        return SimpleNamespace(scalars=lambda: SimpleNamespace(all=lambda: servers))
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+def scheduler(monkeypatch, server_list: ServerList, max_concurrency: int = 10, now: float = 1000.0) -> tuple[ProbeScheduler, Clock]:
+    clock = Clock(now)
+    monkeypatch.setattr(ping, "time", clock)
+    monkeypatch.setattr(ping, "async_session", lambda: server_list)
+    monkeypatch.setattr(ping, "prometheus_exporter", PrometheusExporter(cache_seconds=0))
+    monkeypatch.setattr(ping, "ping_result_writer", PingResultWriter(last_check_write_seconds=300))
+    return ProbeScheduler(make_policy(), max_concurrency=max_concurrency), clock
+
+
+def test_phases_spread_over_the_interval():
+    probes = ProbeScheduler(make_policy(), max_concurrency=1)
+    for n in (10, 100, 1000):
+        phases = sorted(probes.phase(server_id) for server_id in range(1, n + 1))
+        assert 0 <= phases[0] and phases[-1] < INTERVAL
+        gaps = [b - a for a, b in zip(phases, phases[1:])] + [INTERVAL - phases[-1] + phases[0]]
+        assert max(gaps) < 3 * INTERVAL / n  # no clumps, whatever the server count
+
+
+def test_refresh_schedules_new_servers_at_their_phase(monkeypatch):
+    server_list = ServerList(1, 2, 3)
+
+    async def run():
+        probes, clock = scheduler(monkeypatch, server_list)
+        await probes.refresh()
+        for due, server_id in probes._heap:
+            assert clock.now <= due < clock.now + INTERVAL
+            cycles = (due - probes.phase(server_id)) / INTERVAL
+            assert cycles == pytest.approx(round(cycles))  # a whole number of intervals after the phase
+
+        # Known servers keep their place, deleted ones lose their state
+        clock.now += 10
+        server_list.servers = server_list.servers[1:] + ServerList(4).servers
+        await probes.refresh()
+        assert sorted(server_id for _, server_id in probes._heap) == [1, 2, 3, 4]
+        assert sorted(probes._states) == [2, 3, 4]
+        assert sorted(probes._targets) == [2, 3, 4]
+
+    asyncio.run(run())
+
+
+def test_start_due_never_exceeds_max_concurrency(monkeypatch):
+    server_list = ServerList(*range(1, 6))
+    release = None
+    started = []
+
+    async def blocked_probe(ip):
+        started.append(ip)
+        await release.wait()
+        return True, 10
+
+    monkeypatch.setattr(ping, "ping_server_multi_port", blocked_probe)
+
+    async def run():
+        nonlocal release
+        release = asyncio.Event()
+        probes, clock = scheduler(monkeypatch, server_list, max_concurrency=2)
+        await probes.refresh()
+        clock.now += INTERVAL  # everyone is due
+
+        await asyncio.wait_for(probes._start_due(clock.now), timeout=1)  # returns with every slot taken
+        await asyncio.sleep(0)
+        assert len(started) == 2 and len(probes._probes) == 2
+        assert len(probes._heap) == 3
+
+        await asyncio.wait_for(probes._start_due(clock.now), timeout=1)
+        assert len(probes._probes) == 2
+
+        release.set()
+        await asyncio.gather(*probes._probes)
+        await probes._start_due(clock.now)
+        await asyncio.sleep(0)
+        assert len(started) == 4
+        assert probes.max_inflight == 2
+        await asyncio.gather(*probes._probes)
+
+    asyncio.run(run())
+
+
+def test_completed_probe_is_rescheduled_after_the_policy_delay(monkeypatch):
+    server_list = ServerList(7)
+
+    async def probe(ip):
+        return False, None
+
+    monkeypatch.setattr(ping, "ping_server_multi_port", probe)
+
+    async def run():
+        probes, clock = scheduler(monkeypatch, server_list)
+        await probes.refresh()
+        (due, _), = probes._heap
+        clock.now = due + 2.0  # started late
+
+        await probes._start_due(clock.now)
+        await asyncio.gather(*probes._probes)
+        assert probes.last_lateness == 2.0
+        # unknown -> offline takes the base interval, counted from the due time
+        assert probes._heap == [(due + INTERVAL, 7)]
+        assert probes._states[7].status == "offline"
+        assert [r[:3] for r in probes._results] == [(7, False, None)]
+
+        # A due time already in the past is not kept: the next probe is not earlier than now
+        (due, _), = probes._heap
+        clock.now = due + 2 * INTERVAL
+        await probes._start_due(clock.now)
+        await asyncio.gather(*probes._probes)
+        assert probes._heap == [(clock.now, 7)]
+
+    asyncio.run(run())
+
+
+def test_deleted_servers_are_dropped_from_the_heap(monkeypatch):
+    server_list = ServerList(1, 2)
+    started = []
+
+    async def probe(ip):
+        started.append(ip)
+        return True, 10
+
+    monkeypatch.setattr(ping, "ping_server_multi_port", probe)
+
+    async def run():
+        probes, clock = scheduler(monkeypatch, server_list)
+        await probes.refresh()
+        server_list.servers = server_list.servers[:1]
+        await probes.refresh()
+        clock.now += INTERVAL
+
+        await probes._start_due(clock.now)
+        await asyncio.gather(*probes._probes)
+        assert started == ["192.0.2.1"]
+        assert [server_id for _, server_id in probes._heap] == [1]
+
+    asyncio.run(run())
@@ -0,0 +1,130 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from sqlalchemy import Insert, Select, Update
+from sqlalchemy.dialects import postgresql
+
+import app.services.ping as ping
+from app.services.ping import PingResultWriter
+
+
+class FakeSession:
+    """AsyncSession stand-in for PingResultWriter: servers are read from a dict, writes are recorded"""
+
+    def __init__(self, servers: dict[int, tuple]):
+        self.servers = servers  # server_id -> (status, last_ping, last_check)
+        self.inserts: list[int] = []  # rows per INSERT
+        self.updates: list[list[dict]] = []
+
+    async def execute(self, stmt, params=None):
+        if isinstance(stmt, Select):
+            return [(server_id, *self.servers[server_id]) for server_id in sorted(self.servers)]
+        if isinstance(stmt, Insert):
+            params = stmt.compile(dialect=postgresql.dialect()).params
+            self.inserts.append(len(params) // len(ping.ProbeResult.__table__.columns))
+        elif isinstance(stmt, Update):
+            self.updates.append(params)
+
+    async def commit(self):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+def make_writer(monkeypatch, servers: dict[int, tuple]) -> tuple[PingResultWriter, FakeSession]:
+    session = FakeSession(servers)
+    monkeypatch.setattr(ping, "async_session", lambda: session)
+    return PingResultWriter(last_check_write_seconds=300), session
+
+
+def result(server_id: int, at: datetime, online: bool = True, latency: int | None = 20) -> tuple:
+    return (server_id, online, latency if online else None, at, online, 60.0)
+
+
+def test_probe_history_is_inserted_in_chunks(monkeypatch):
+    monkeypatch.setattr(ping, "PROBE_INSERT_CHUNK_ROWS", 4)
+    now = datetime(2026, 1, 1)
+    writer, session = make_writer(monkeypatch, {i: ("online", 20, now) for i in range(10)})
+
+    asyncio.run(writer.apply([result(i, now + timedelta(seconds=1)) for i in range(10)]))
+    assert session.inserts == [4, 4, 2]
+    assert writer.results_total == 10
+
+
+def test_chunk_size_fits_the_bind_parameter_limit():
+    columns = len(ping.ProbeResult.__table__.columns)
+    assert ping.PROBE_INSERT_CHUNK_ROWS * columns <= 32767
+
+
+class Published:
+    def __init__(self):
+        self.events = []
+
+    def publish(self, kind, server_id, data):
+        self.events.append((kind, server_id, data["status"]))
+
+
+def apply(monkeypatch, writer: PingResultWriter, results: list[tuple]) -> list[tuple]:
+    published = Published()
+    monkeypatch.setattr(ping, "event_hub", published)
+    asyncio.run(writer.apply(results))
+    return published.events
+
+
+def test_unchanged_results_are_not_written(monkeypatch):
+    now = datetime(2026, 1, 1)
+    writer, session = make_writer(monkeypatch, {1: ("online", 20, now), 2: ("online", 100, now)})
+
+    # 21 ms and 105 ms fall into the same ~25% latency classes as 20 and 100
+    events = apply(monkeypatch, writer, [result(1, now + timedelta(seconds=60), latency=21), result(2, now + timedelta(seconds=60), latency=105)])
+    assert session.updates == []
+    assert session.inserts == [2]  # the probe history still gets every result
+    assert events == []
+    assert writer.stats()["rows_skipped_total"] == 2
+
+
+def test_status_and_latency_class_changes_are_written_in_one_update(monkeypatch):
+    now = datetime(2026, 1, 1)
+    writer, session = make_writer(monkeypatch, {1: ("online", 20, now), 2: ("online", 20, now), 3: ("online", 20, now)})
+    later = now + timedelta(seconds=60)
+
+    events = apply(monkeypatch, writer, [result(1, later, online=False), result(2, later, latency=40), result(3, later)])
+    assert session.updates == [[
+        {"id": 1, "status": "offline", "last_ping": None, "last_check": later},
+        {"id": 2, "status": "online", "last_ping": 40, "last_check": later},
+    ]]
+    assert events == [("status", 1, "offline")]  # only status changes reach live dashboards
+    assert writer.last_rows_written == 2
+
+    # What was written is the new reference
+    events = apply(monkeypatch, writer, [result(1, later + timedelta(seconds=60), online=False), result(2, later + timedelta(seconds=60), latency=41)])
+    assert len(session.updates) == 1
+    assert events == []
+
+
+def test_stale_last_check_is_rewritten(monkeypatch):
+    now = datetime(2026, 1, 1)
+    writer, session = make_writer(monkeypatch, {1: ("online", 20, now), 2: ("online", 20, None)})
+
+    apply(monkeypatch, writer, [result(1, now + timedelta(seconds=299)), result(2, now)])
+    assert [[p["id"] for p in params] for params in session.updates] == [[2]]  # never checked
+
+    apply(monkeypatch, writer, [result(1, now + timedelta(seconds=300))])  # last_check_write_seconds
+    assert session.updates[-1] == [{"id": 1, "status": "online", "last_ping": 20, "last_check": now + timedelta(seconds=300)}]
+
+
+def test_deleted_servers_are_skipped(monkeypatch):
+    now = datetime(2026, 1, 1)
+    writer, session = make_writer(monkeypatch, {1: ("offline", None, now)})
+
+    events = apply(monkeypatch, writer, [result(1, now), result(2, now)])  # 2 was deleted while probing
+    assert [p["id"] for p in session.updates[0]] == [1]
+    assert session.inserts == [1]
+    assert events == [("status", 1, "online")]
+
+    writer.retain({2})
+    assert writer.stats()["tracked"] == 0
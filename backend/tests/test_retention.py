@@ -0,0 +1,92 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from sqlalchemy.dialects import postgresql
+
+import app.services.retention as retention
+from app.services.retention import MetricsRetention
+
+
+class ExpiredRows:
+    """
+    Stand-in for the database: a number of expired rows that every chunked
+    DELETE takes from. Each session is one transaction.
+    """
+
+    def __init__(self, expired: int):
+        self.expired = expired
+        self.deletes: list[tuple[str, int]] = []  # (table, rows) per DELETE
+        self.commits = 0
+
+    def session(self):
+        rows = self
+
+        class Session:
+            async def execute(self, stmt):
+                params = stmt.compile(dialect=postgresql.dialect()).params
+                limit = next(value for value in params.values() if isinstance(value, int))  # chunk LIMIT
+                deleted = min(limit, rows.expired)
+                rows.expired -= deleted
+                rows.deletes.append((stmt.table.name, deleted))
+                return type("Result", (), {"rowcount": deleted})()
+
+            async def commit(self):
+                rows.commits += 1
+
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *exc):
+                return False
+
+        return Session()
+
+
+def purge(monkeypatch, expired: int, chunk_rows: int) -> tuple[dict, ExpiredRows, MetricsRetention]:
+    rows = ExpiredRows(expired)
+    job = MetricsRetention(retention_hours=24, interval=3600, chunk_rows=chunk_rows, partition_interval="day", partitions_ahead=2)
+
+    async def plain_table():
+        return []
+
+    monkeypatch.setattr(retention, "async_session", rows.session)
+    monkeypatch.setattr(job, "ensure_partitions", plain_table)
+    return asyncio.run(job.purge_expired()), rows, job
+
+
+def test_deletes_in_chunks_with_one_transaction_each(monkeypatch):
+    result, rows, job = purge(monkeypatch, expired=2500, chunk_rows=1000)
+    assert rows.deletes == [("server_metrics", 1000), ("server_metrics", 1000), ("server_metrics", 500)]
+    assert rows.commits == 3
+    assert result["rows_purged"] == 2500
+    assert (job.rows_purged_total, job.last_rows_purged, job.runs) == (2500, 2500, 1)
+
+
+def test_full_last_chunk_needs_one_more_round(monkeypatch):
+    _, rows, _ = purge(monkeypatch, expired=2000, chunk_rows=1000)
+    assert [deleted for _, deleted in rows.deletes] == [1000, 1000, 0]
+
+
+def test_nothing_expired(monkeypatch):
+    result, rows, _ = purge(monkeypatch, expired=0, chunk_rows=1000)
+    assert rows.deletes == [("server_metrics", 0)]
+    assert result["rows_purged"] == 0
+
+
+def test_cutoff_is_the_retention_period(monkeypatch):
+    cutoffs = []
+
+    async def delete_rows(table_name, cutoff):
+        cutoffs.append(cutoff)
+        return 0
+
+    job = MetricsRetention(retention_hours=24, interval=3600, chunk_rows=1000, partition_interval="day", partitions_ahead=2)
+
+    async def plain_table():
+        return []
+
+    monkeypatch.setattr(job, "ensure_partitions", plain_table)
+    monkeypatch.setattr(job, "_delete_rows", delete_rows)
+    before = datetime.utcnow()
+    asyncio.run(job.purge_expired())
+    assert before - timedelta(hours=24) <= cutoffs[0] <= datetime.utcnow() - timedelta(hours=24)
@@ -0,0 +1,129 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import app.routers.metrics as metrics_router
+import app.services.rollups as rollups
+from app.database import get_db
+from app.services.metrics import backfill_mark
+from app.services.rollups import MetricsRollups, floor_to_resolution
+
+
+TIERS = {300: 24 * 7, 3600: 24 * 90}
+
+
+class FakeSession:
+    """AsyncSession stand-in: statements are recorded, nothing is executed"""
+
+    def __init__(self):
+        self.executed = []
+
+    async def execute(self, stmt):
+        self.executed.append(stmt)
+        return type("Result", (), {"rowcount": 0})()
+
+    async def commit(self):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+def make_rollups(monkeypatch, now: datetime) -> tuple[MetricsRollups, list]:
+    """Rollups that are up to date as of now, recording (resolution, start, end) of every rollup_tier call"""
+    job = MetricsRollups(TIERS, interval=60)
+    job._done_until = {resolution: floor_to_resolution(now, resolution) for resolution in TIERS}
+    calls = []
+
+    async def rollup_tier(db, resolution, start, end):
+        calls.append((resolution, start, end))
+        return 0
+
+    monkeypatch.setattr(job, "rollup_tier", rollup_tier)
+    monkeypatch.setattr(rollups, "async_session", FakeSession)
+    return job, calls
+
+
+def sample(collected_at: datetime) -> dict:
+    return {
+        "cpu_percent": 10, "memory_percent": 20, "memory_used_mb": 512, "memory_total_mb": 2048,
+        "disk_percent": 30, "disk_used_gb": 3, "disk_total_gb": 10, "uptime_seconds": 100,
+        "collected_at": collected_at.isoformat(),
+    }
+
+
+def submit_batch(monkeypatch, samples: list[dict]) -> dict:
+    async def resolve(token):
+        return 7 if token == "agent" else None
+
+    async def noop(*args):
+        pass
+
+    async def fake_db():
+        yield FakeSession()
+
+    monkeypatch.setattr(metrics_router.agent_token_cache, "resolve", resolve)
+    monkeypatch.setattr(metrics_router, "insert_metrics", noop)
+    monkeypatch.setattr(metrics_router, "mark_servers_online", noop)
+
+    app = FastAPI()
+    app.include_router(metrics_router.router)
+    app.dependency_overrides[get_db] = fake_db
+    response = TestClient(app).post("/metrics/submit/batch", json={"samples": samples}, headers={"X-Agent-Token": "agent"})
+    assert response.status_code == 200
+    return response.json()
+
+
+def run_tiers(job: MetricsRollups) -> None:
+    asyncio.run(job._update_tiers(backfill_mark.take()))
+
+
+def test_steady_state_re_rolls_only_the_last_bucket(monkeypatch):
+    now = datetime.utcnow()
+    backfill_mark.take()
+    job, calls = make_rollups(monkeypatch, now)
+    run_tiers(job)
+    for resolution, start, _ in calls:
+        assert start == floor_to_resolution(now, resolution) - timedelta(seconds=resolution)
+
+
+def test_batch_backfill_re_rolls_old_buckets(monkeypatch):
+    now = datetime.utcnow()
+    backfilled = now - timedelta(hours=3, minutes=7)
+    backfill_mark.take()
+
+    result = submit_batch(monkeypatch, [sample(backfilled), sample(now - timedelta(minutes=1))])
+    assert result["accepted"] == 2
+
+    job, calls = make_rollups(monkeypatch, now)
+    run_tiers(job)
+    starts = {resolution: start for resolution, start, _ in calls}
+    assert starts == {resolution: floor_to_resolution(backfilled, resolution) for resolution in TIERS}
+
+    # The mark is consumed: the next run is back to the last bucket
+    calls.clear()
+    run_tiers(job)
+    assert all(start >= floor_to_resolution(now, resolution) - timedelta(seconds=resolution) for resolution, start, _ in calls)
+
+
+def test_failed_run_keeps_the_mark(monkeypatch):
+    now = datetime.utcnow()
+    backfilled = now - timedelta(hours=2)
+    backfill_mark.take()
+    backfill_mark.note([{"collected_at": backfilled}])
+
+    job, _ = make_rollups(monkeypatch, now)
+
+    async def failing(oldest_written):
+        raise RuntimeError("db down")
+
+    monkeypatch.setattr(job, "_update_tiers", failing)
+    with pytest.raises(RuntimeError):
+        asyncio.run(job.run_once())
+    assert backfill_mark.take() == backfilled
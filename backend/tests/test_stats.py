@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import Float, cast, select
+from sqlalchemy.dialects import postgresql
+
+import app.routers.metrics as metrics_router
+from app.database import get_db
+from app.models import ServerMetrics
+from app.services.stats import PERCENTILES, _aggregates
+
+
+def compile_sql(stmt) -> str:
+    return str(stmt.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+def test_percentiles_are_ordered_set_aggregates_over_the_same_column():
+    sql = compile_sql(select(*_aggregates(cast(ServerMetrics.cpu_percent, Float))))
+    for name, q in PERCENTILES.items():
+        assert f"percentile_cont({q}) WITHIN GROUP (ORDER BY CAST(server_metrics.cpu_percent AS FLOAT)) AS {name}" in sql
+    assert "count(CAST(server_metrics.cpu_percent AS FLOAT)) AS count" in sql  # NULLs are not counted
+
+
+class StatsCall:
+    """Stands in for metric_stats, recording the window it was asked for"""
+
+    def __init__(self):
+        self.calls = []
+
+    async def __call__(self, db, server_id, metric, start, end, bucket_seconds=None):
+        self.calls.append((metric, start, end, bucket_seconds))
+        stats = {"count": 4, "avg": 25.0, "min": 10.0, "max": 40.0, "p50": 25.0, "p95": 38.5, "p99": 39.7}
+        buckets = [{"bucket_start": start, **stats}] if bucket_seconds else []
+        return stats, buckets
+
+
+def client(monkeypatch) -> tuple[TestClient, StatsCall]:
+    class Session:
+        async def execute(self, stmt):
+            return type("Result", (), {"scalar_one_or_none": lambda self: 1})()
+
+    async def fake_db():
+        yield Session()
+
+    stats = StatsCall()
+    monkeypatch.setattr(metrics_router, "metric_stats", stats)
+    app = FastAPI()
+    app.include_router(metrics_router.router)
+    app.dependency_overrides[get_db] = fake_db
+    return TestClient(app), stats
+
+
+def test_stats_response(monkeypatch):
+    http, stats = client(monkeypatch)
+    response = http.get("/metrics/1/stats", params={
+        "metric": "disk_percent", "start": "2026-01-01T00:00:00", "end": "2026-01-01T06:00:00", "bucket_seconds": 3600,
+    })
+    assert response.status_code == 200
+    body = response.json()
+    assert body["overall"]["p95"] == 38.5
+    assert body["buckets"][0]["bucket_start"] == "2026-01-01T00:00:00"
+    assert stats.calls == [("disk_percent", datetime(2026, 1, 1), datetime(2026, 1, 1, 6), 3600)]
+
+
+def test_window_defaults_to_12_hours_and_timezones_are_converted(monkeypatch):
+    http, stats = client(monkeypatch)
+    assert http.get("/metrics/1/stats", params={"end": "2026-01-01T12:00:00+02:00"}).status_code == 200
+    _, start, end, bucket_seconds = stats.calls[0]
+    assert end == datetime(2026, 1, 1, 10)
+    assert end - start == timedelta(hours=12)
+    assert bucket_seconds is None
+
+
+def test_invalid_windows_are_rejected(monkeypatch):
+    http, stats = client(monkeypatch)
+    window = {"start": "2026-01-02T00:00:00", "end": "2026-01-01T00:00:00"}
+    assert http.get("/metrics/1/stats", params=window).status_code == 400
+
+    too_many = {"start": "2025-01-01T00:00:00", "end": "2026-01-01T00:00:00", "bucket_seconds": 60}
+    assert http.get("/metrics/1/stats", params=too_many).status_code == 400
+    assert http.get("/metrics/1/stats", params={"bucket_seconds": 30}).status_code == 422
+    assert stats.calls == []
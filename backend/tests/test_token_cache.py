@@ -0,0 +1,118 @@
+import asyncio
+
+import app.services.token_cache as token_cache
+from app.services.token_cache import AgentTokenCache
+
+
+class FakeDatabase:
+    """Servers by agent token; counts lookups and can run a hook while a query is in flight"""
+
+    def __init__(self, tokens: dict[str, int]):
+        self.tokens = tokens
+        self.queries = 0
+        self.during_query = None
+
+    def session(self):
+        database = self
+
+        class Session:
+            async def execute(self, stmt):
+                database.queries += 1
+                (token,) = stmt.compile().params.values()
+                if database.during_query is not None:
+                    database.during_query()
+                server_id = database.tokens.get(token)
+                return type("Result", (), {"scalar_one_or_none": lambda self: server_id})()
+
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *exc):
+                return False
+
+        return Session()
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+def setup(monkeypatch, tokens: dict[str, int]) -> tuple[AgentTokenCache, FakeDatabase, Clock]:
+    database, clock = FakeDatabase(tokens), Clock()
+    monkeypatch.setattr(token_cache, "async_session", database.session)
+    monkeypatch.setattr(token_cache, "time", clock)
+    return AgentTokenCache(ttl=60, negative_ttl=10), database, clock
+
+
+def resolve(cache: AgentTokenCache, token: str) -> int | None:
+    return asyncio.run(cache.resolve(token))
+
+
+def test_valid_token_is_cached_for_the_ttl(monkeypatch):
+    cache, database, clock = setup(monkeypatch, {"good": 7})
+    assert resolve(cache, "good") == 7
+    clock.now += 59
+    assert resolve(cache, "good") == 7
+    assert database.queries == 1
+
+    clock.now += 1
+    assert resolve(cache, "good") == 7
+    assert database.queries == 2
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_unknown_token_uses_the_shorter_negative_ttl(monkeypatch):
+    cache, database, clock = setup(monkeypatch, {})
+    assert resolve(cache, "bad") is None
+    clock.now += 9
+    assert resolve(cache, "bad") is None
+    assert (database.queries, cache.negative_hits) == (1, 1)
+
+    # The token has been issued in the meantime
+    database.tokens["bad"] = 3
+    clock.now += 1
+    assert resolve(cache, "bad") == 3
+
+
+def test_invalidate_server_forgets_its_token(monkeypatch):
+    cache, database, _ = setup(monkeypatch, {"old": 7})
+    assert resolve(cache, "old") == 7
+
+    # Token rotated
+    database.tokens = {"new": 7}
+    cache.invalidate_server(7)
+    assert resolve(cache, "old") is None
+    assert resolve(cache, "new") == 7
+
+
+def test_invalidate_token_drops_a_negative_entry(monkeypatch):
+    cache, database, _ = setup(monkeypatch, {})
+    assert resolve(cache, "fresh") is None
+
+    database.tokens["fresh"] = 5
+    cache.invalidate_token("fresh")
+    assert resolve(cache, "fresh") == 5
+
+
+def test_answer_is_not_cached_if_invalidated_during_the_query(monkeypatch):
+    cache, database, _ = setup(monkeypatch, {"good": 7})
+    database.during_query = lambda: cache.invalidate_server(7)
+    assert resolve(cache, "good") == 7
+
+    database.during_query = None
+    assert resolve(cache, "good") == 7
+    assert database.queries == 2
+
+
+def test_negative_cache_is_bounded(monkeypatch):
+    monkeypatch.setattr(token_cache, "MAX_INVALID_TOKENS", 3)
+    cache, _, clock = setup(monkeypatch, {})
+    for token in ("a", "b", "c"):
+        resolve(cache, token)
+    clock.now += 11  # a, b, c expired
+    resolve(cache, "d")
+    assert set(cache._invalid) == {"d"}
@@ -0,0 +1,46 @@
+import pytest
+
+from app.services.uptime import LATENCY_HISTOGRAM_BOUNDS_MS, histogram_percentile
+
+
+BUCKETS = len(LATENCY_HISTOGRAM_BOUNDS_MS) + 1
+
+
+def counts(**by_index) -> list[int]:
+    result = [0] * BUCKETS
+    for index, count in by_index.items():
+        result[int(index[1:])] = count
+    return result
+
+
+def test_empty_histogram():
+    assert histogram_percentile([0] * BUCKETS, 0.5, None) is None
+
+
+def test_interpolates_inside_the_bucket():
+    # 100 probes in (20, 50] ms
+    histogram = counts(b5=100)
+    assert histogram_percentile(histogram, 0.5, 50) == pytest.approx(35.0)
+    assert histogram_percentile(histogram, 0.99, 50) == pytest.approx(49.7)
+
+
+def test_first_bucket_starts_at_zero():
+    assert histogram_percentile(counts(b0=10), 0.5, 1) == pytest.approx(0.5)
+
+
+def test_boundary_between_buckets():
+    # 50 probes in (5, 10], 50 in (10, 20]: the median is the end of the first bucket
+    histogram = counts(b3=50, b4=50)
+    assert histogram_percentile(histogram, 0.5, 20) == pytest.approx(10.0)
+    assert histogram_percentile(histogram, 0.51, 20) == pytest.approx(10.2)
+
+
+def test_slowest_probe_bounds_the_bucket():
+    # Everything in (100, 200] but the slowest probe took 120 ms
+    assert histogram_percentile(counts(b7=10), 1.0, 120) == pytest.approx(120.0)
+
+
+def test_overflow_bucket_uses_the_max():
+    histogram = counts(b12=4)  # slower than the last bound (5000 ms)
+    assert histogram_percentile(histogram, 0.5, 9000) == pytest.approx(7000.0)
+    assert histogram_percentile(histogram, 1.0, None) == pytest.approx(5000.0)